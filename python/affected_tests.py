@@ -0,0 +1,396 @@
+#! /usr/bin/env python3
+# Script is responsible for finding the unit tests affected by a list of changed files
+#
+# Every build statement of the ninja file (explicit and implicit inputs) and the header
+# dependencies recorded by ninja in .ninja_deps are read into one graph. For each source file the
+# index records which test executables depend on it, as a bit mask over the executables of the
+# ninja test index (see ninja_index.py). Source files with the same mask share one entry, so the
+# index stays small even though most headers reach nearly every test.
+#
+# The index is saved beside the ninja file as <ninja>.mongodev_deps.json and is rebuilt when the
+# ninja file or .ninja_deps change, so querying it between builds only costs loading the JSON.
+#
+# Usage:
+#   affected_tests.py build.ninja src/mongo/db/query/planner.cpp   - print the +test targets
+#   affected_tests.py --git build.ninja                              - use the files changed in git
+#   ninja -f build.ninja $(python3 affected_tests.py --git build.ninja)
+#
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import ninja_index
+
+INDEX_SUFFIX = ".mongodev_deps.json"
+
+INDEX_VERSION = 1
+
+NINJA_DEPS_FILE = ".ninja_deps"
+
+NINJA_DEPS_SIGNATURE = b"# ninjadeps\n"
+
+# High bit of a .ninja_deps record size marks a dependency record, otherwise it is a path record
+DEPS_RECORD_FLAG = 0x80000000
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def unescape_paths(text):
+    """Split the paths of a build statement part, handling "$ ", "$:" and "$$"."""
+    if "$" not in text:
+        return text.split()
+
+    paths = []
+    current = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == "$" and i + 1 < len(text):
+            current.append(text[i + 1])
+            i += 2
+            continue
+
+        if c.isspace():
+            if current:
+                paths.append("".join(current))
+                current = []
+        else:
+            current.append(c)
+        i += 1
+
+    if current:
+        paths.append("".join(current))
+
+    return paths
+
+
+def find_unescaped(text, char):
+    """Get the index of the first char in text not escaped by $, -1 if there is none."""
+    pos = text.find(char)
+    while pos != -1:
+        escapes = 0
+        while pos - escapes > 0 and text[pos - escapes - 1] == "$":
+            escapes += 1
+        if escapes % 2 == 0:
+            return pos
+        pos = text.find(char, pos + 1)
+
+    return -1
+
+
+def parse_build_statement(statement):
+    """Get (outputs, inputs) of "build outs | implicit_outs: rule ins | implicit || order_only".
+
+    Order only inputs do not cause a rebuild, so they are left out.
+    """
+    colon = find_unescaped(statement, ":")
+    if colon == -1:
+        return ([], [])
+
+    outputs = [p for p in unescape_paths(statement[len("build "):colon]) if p != "|"]
+
+    inputs_part = statement[colon + 1:]
+    for separator in (" || ", " |@ "):
+        pos = inputs_part.find(separator)
+        if pos != -1:
+            inputs_part = inputs_part[:pos]
+
+    # The first word is the rule
+    inputs = [p for p in unescape_paths(inputs_part)[1:] if p != "|"]
+
+    return (outputs, inputs)
+
+
+def read_statements(ninja_file, variables):
+    """Yield the build statements of a ninja file and the files it includes, continuations joined.
+
+    Top level variable assignments are stored in variables, i.e. builddir.
+    """
+    base_dir = os.path.dirname(ninja_file)
+    with open(ninja_file, "r", errors="replace") as rfh:
+        pending = None
+        for line in rfh:
+            line = line.rstrip("\n")
+            if pending is not None:
+                line = pending + line.lstrip()
+                pending = None
+
+            stripped = line.rstrip()
+            if stripped.endswith("$") and (len(stripped) - len(stripped.rstrip("$"))) % 2 == 1:
+                pending = stripped[:-1]
+                continue
+
+            if line.startswith("build "):
+                yield line
+            elif line.startswith(("include ", "subninja ")):
+                included = line.split(None, 1)[1].strip()
+                yield from read_statements(os.path.join(base_dir, included), variables)
+            elif line and not line[0].isspace() and "=" in line and not line.startswith(("rule ", "pool ")):
+                (name, _, value) = line.partition("=")
+                variables[name.strip()] = value.strip()
+
+
+def read_ninja_deps(deps_file):
+    """Get a dict of output to the dependencies recorded for it in a .ninja_deps log."""
+    try:
+        with open(deps_file, "rb") as rfh:
+            data = rfh.read()
+    except OSError:
+        return {}
+
+    if not data.startswith(NINJA_DEPS_SIGNATURE):
+        eprint("Not a ninja deps log: %s" % deps_file)
+        return {}
+
+    pos = len(NINJA_DEPS_SIGNATURE)
+    (version,) = struct.unpack_from("<i", data, pos)
+    pos += 4
+    if version not in (3, 4):
+        eprint("Unsupported ninja deps log version %d: %s" % (version, deps_file))
+        return {}
+
+    # Version 4 stores the mtime of the output in 64 bits
+    header_size = 12 if version == 4 else 8
+
+    paths = []
+    deps = {}
+    while pos + 4 <= len(data):
+        (size,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        is_deps = size & DEPS_RECORD_FLAG
+        size &= ~DEPS_RECORD_FLAG
+        if pos + size > len(data):
+            # Truncated by an interrupted build
+            break
+
+        if is_deps:
+            (out_id,) = struct.unpack_from("<i", data, pos)
+            count = (size - header_size) // 4
+            ids = struct.unpack_from("<%di" % count, data, pos + header_size)
+            if out_id < len(paths):
+                # Later records replace earlier ones for the same output
+                deps[paths[out_id]] = [paths[i] for i in ids if i < len(paths)]
+        else:
+            # Path padded with NULs to 4 bytes, then a checksum of its id
+            paths.append(data[pos:pos + size - 4].rstrip(b"\0").decode("utf-8", "replace"))
+
+        pos += size
+
+    return deps
+
+
+def normalize(path):
+    return os.path.normpath(path)
+
+
+def build_index(ninja_file, tests):
+    """Build the index for the test executables of the ninja test index."""
+    nodes = {}
+
+    def node_id(path):
+        path = normalize(path)
+        found = nodes.get(path)
+        if found is None:
+            found = nodes[path] = len(nodes)
+        return found
+
+    # Node id to a list of input node ids
+    inputs_of = {}
+    variables = {}
+    for statement in read_statements(ninja_file, variables):
+        (outputs, inputs) = parse_build_statement(statement)
+        input_ids = [node_id(i) for i in inputs]
+        for output in outputs:
+            inputs_of[node_id(output)] = input_ids
+
+    build_dir = os.path.dirname(os.path.abspath(ninja_file))
+    deps_file = os.path.join(build_dir, variables.get("builddir", ""), NINJA_DEPS_FILE)
+    for (output, deps) in read_ninja_deps(deps_file).items():
+        output_id = node_id(output)
+        inputs_of[output_id] = inputs_of.get(output_id, []) + [node_id(d) for d in deps]
+
+    executables = sorted(set(e for e in tests.values() if e != "unknown"))
+    mask = {}
+    for (bit, executable) in enumerate(executables):
+        exe_id = node_id(executable)
+        mask[exe_id] = mask.get(exe_id, 0) | (1 << bit)
+
+    # Depth first post order from the executables, reversed it lists every output before its inputs
+    order = []
+    visited = set()
+    for root in list(mask):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(inputs_of.get(root, ())))]
+        while stack:
+            (node, children) = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(inputs_of.get(child, ()))))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+
+    for node in reversed(order):
+        node_mask = mask.get(node, 0)
+        for child in inputs_of.get(node, ()):
+            mask[child] = mask.get(child, 0) | node_mask
+
+    # Only the files nothing builds are kept, they are the ones that can be edited
+    paths = {i: p for (p, i) in nodes.items()}
+    masks = {}
+    files = {}
+    for (node, node_mask) in mask.items():
+        if node not in inputs_of and node_mask:
+            files[paths[node]] = masks.setdefault(node_mask, len(masks))
+
+    return {
+        "executables": executables,
+        "masks": ["%x" % m for m in sorted(masks, key=masks.get)],
+        "files": files,
+        "deps_file": deps_file,
+    }
+
+
+def get_stat_key(file_name):
+    try:
+        st = os.stat(file_name)
+        return [st.st_size, st.st_mtime]
+    except OSError:
+        return None
+
+
+def load_index(ninja_file):
+    """Load the dependency index for a ninja file, rebuilding it if the ninja file or deps log changed."""
+    index_file = ninja_file + INDEX_SUFFIX
+    ninja_key = get_stat_key(ninja_file)
+
+    cached = None
+    try:
+        with open(index_file) as rfh:
+            cached = json.load(rfh)
+        if cached.get("version") != INDEX_VERSION:
+            cached = None
+    except (OSError, ValueError):
+        pass
+
+    if cached is not None and cached["ninja"] == ninja_key and cached["deps"] == get_stat_key(cached["deps_file"]):
+        return cached
+
+    start = time.monotonic()
+    index = build_index(ninja_file, ninja_index.load_index(ninja_file))
+    index.update({"version": INDEX_VERSION, "ninja": ninja_key, "deps": get_stat_key(index["deps_file"])})
+    eprint("Indexed %d files for %d test executables in %.1fs" % (len(index["files"]), len(index["executables"]),
+                                                                  time.monotonic() - start))
+
+    try:
+        with open(index_file, "w") as wfh:
+            json.dump(index, wfh)
+    except OSError as e:
+        eprint("Failed to save dependency index %s: %s" % (index_file, e))
+
+    return index
+
+
+def get_git_changes(root):
+    """Get the files changed in the working tree compared to HEAD, including untracked files."""
+    changed = []
+    for command in (["git", "diff", "--name-only", "HEAD"], ["git", "ls-files", "--others", "--exclude-standard"]):
+        proc = subprocess.run(command, cwd=root, stdout=subprocess.PIPE, universal_newlines=True, check=True)
+        changed.extend(proc.stdout.split())
+    return changed
+
+
+def to_ninja_path(path, root):
+    """Convert a path to how the ninja file names it, relative to the build root."""
+    if os.path.isabs(path):
+        relative = os.path.relpath(path, root)
+        if not relative.startswith(".."):
+            return normalize(relative)
+    return normalize(path)
+
+
+def find_affected_executables(index, changed):
+    """Get a dict of affected executable to the changed files it depends on."""
+    masks = [int(m, 16) for m in index["masks"]]
+    affected = {}
+    for path in changed:
+        found = index["files"].get(path)
+        if found is None:
+            continue
+
+        m = masks[found]
+        bit = 0
+        while m:
+            if m & 1:
+                affected.setdefault(index["executables"][bit], []).append(path)
+            m >>= 1
+            bit += 1
+
+    return affected
+
+
+def select_targets(tests, affected):
+    """Get the +test targets to run the affected executables.
+
+    When the only changed files of an executable are test sources, i.e. fle_crud_test.cpp, just
+    those tests are selected, otherwise every test of the executable is.
+    """
+    names_of = {}
+    for (name, executable) in tests.items():
+        names_of.setdefault(executable, set()).add(name)
+
+    targets = set()
+    for (executable, files) in affected.items():
+        names = names_of.get(executable, set())
+        # Drop "db_unittest_test-fle_crud_test" when its alias "fle_crud_test" is there too
+        names = {n for n in names if n.partition("-")[2] not in names}
+
+        changed_tests = {os.path.splitext(os.path.basename(f))[0] for f in files}
+        if changed_tests <= names:
+            names = changed_tests
+        targets.update(names)
+
+    return sorted("+" + n for n in targets)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Find the unit tests affected by changed files.')
+    parser.add_argument('--git', action='store_true', help='Add the files changed in git to the list')
+    parser.add_argument('--stdin', action='store_true', help='Read the changed files from stdin')
+    parser.add_argument('--executables', action='store_true', help='Print the test executables instead')
+    parser.add_argument('--json', action='store_true', help='Print JSON')
+    parser.add_argument('ninja_file', help='ninja file')
+    parser.add_argument('files', nargs='*', help='changed files')
+    args = parser.parse_args()
+
+    build_root = os.path.dirname(os.path.abspath(args.ninja_file))
+
+    changed_files = list(args.files)
+    if args.git:
+        changed_files.extend(get_git_changes(build_root))
+    if args.stdin:
+        changed_files.extend(sys.stdin.read().split())
+
+    deps_index = load_index(args.ninja_file)
+    affected_executables = find_affected_executables(deps_index, [to_ninja_path(f, build_root) for f in changed_files])
+    test_targets = select_targets(ninja_index.load_index(args.ninja_file), affected_executables)
+
+    if args.json:
+        print(json.dumps({"executables": affected_executables, "targets": test_targets}, indent=2))
+    elif args.executables:
+        for exe in sorted(affected_executables):
+            print(exe)
+    else:
+        for target in test_targets:
+            print(target)
@@ -0,0 +1,67 @@
+"""Read the notes of 64-bit little endian ELF files without any tools or modules.
+
+Used for the GNU build ID of executables by unittest_catalog.py and symbolize_stacktraces.py,
+and for the process info of core files by lldb_triage.py.
+"""
+
+import struct
+
+# ELF program header type of a note segment
+PT_NOTE = 4
+
+# Note type of the GNU build ID
+NT_GNU_BUILD_ID = 3
+
+
+def read_header(rfh):
+    """Get (e_type, program header offset, program header size, program header count).
+
+    Raises ValueError if the file is not a 64-bit little endian ELF file.
+    """
+    header = rfh.read(64)
+    if len(header) < 64 or header[:4] != b"\x7fELF" or header[4] != 2 or header[5] != 1:
+        raise ValueError("Not a 64-bit little endian ELF file: %s" % rfh.name)
+
+    (e_type,) = struct.unpack_from("<H", header, 0x10)
+    (phoff,) = struct.unpack_from("<Q", header, 0x20)
+    (phentsize, phnum) = struct.unpack_from("<HH", header, 0x36)
+
+    return (e_type, phoff, phentsize, phnum)
+
+
+def iter_notes(rfh):
+    """Yield (note type, name, desc) for each note in the note segments of an open ELF file.
+
+    Raises ValueError if the file is not a 64-bit little endian ELF file.
+    """
+    (_, phoff, phentsize, phnum) = read_header(rfh)
+
+    rfh.seek(phoff)
+    program_headers = rfh.read(phentsize * phnum)
+    for i in range(phnum):
+        (p_type, _, p_offset, _, _, p_filesz) = struct.unpack_from("<IIQQQQ", program_headers, i * phentsize)
+        if p_type != PT_NOTE:
+            continue
+
+        rfh.seek(p_offset)
+        notes = rfh.read(p_filesz)
+        pos = 0
+        while pos + 12 <= len(notes):
+            (namesz, descsz, note_type) = struct.unpack_from("<III", notes, pos)
+            name_start = pos + 12
+            desc_start = name_start + ((namesz + 3) & ~3)
+            yield (note_type, notes[name_start:name_start + namesz], notes[desc_start:desc_start + descsz])
+            pos = desc_start + ((descsz + 3) & ~3)
+
+
+def get_build_id(file_name):
+    """Get the GNU build ID of a 64-bit little endian ELF file as hex, None if it has none."""
+    try:
+        with open(file_name, "rb") as rfh:
+            for (note_type, name, desc) in iter_notes(rfh):
+                if note_type == NT_GNU_BUILD_ID and name == b"GNU\0":
+                    return desc.hex()
+    except (OSError, ValueError):
+        return None
+
+    return None
@@ -2,8 +2,15 @@
 # Script is responsible for mapping a test file to the test suite to run it with
 #
 import argparse
+import functools
+import glob
+import json
+import multiprocessing
+import os
 import os.path
+import re
 import sys
+import time
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
@@ -21,6 +28,324 @@ def camel_to_snake(suite):
 
     return suite
 
+SUITES_DIR = os.path.join("buildscripts", "resmokeconfig", "suites")
+
+# Index of test file to suites, stored in the build directory of the mongo repo
+SUITE_INDEX_FILE = os.path.join("build", "mongodev_suite_index.json")
+
+SUITE_INDEX_VERSION = 3
+
+# Keys of a resmoke suite selector the index uses
+SELECTOR_KEYS = ["roots", "exclude_files", "include_with_any_tags", "exclude_with_any_tags"]
+
+TAGS_REGEX = re.compile(r"@tags\s*:\s*\[(.*?)\]", re.DOTALL)
+
+# Tags are always declared in the comment at the top of a test
+TAGS_MAX_BYTES = 16 * 1024
+
+
+def find_mongo_root(file_name):
+    """Find the root of the mongo repo that contains file_name or the current directory."""
+    for start in [os.path.dirname(os.path.abspath(file_name)), os.getcwd()]:
+        path = start
+        while True:
+            if os.path.isdir(os.path.join(path, SUITES_DIR)):
+                return path
+
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    return None
+
+
+def get_test_tags(file_name):
+    """Get the resmoke @tags of a jstest."""
+    try:
+        with open(file_name, encoding="utf-8", errors="replace") as rfh:
+            header = rfh.read(TAGS_MAX_BYTES)
+    except OSError:
+        return []
+
+    m = TAGS_REGEX.search(header)
+    if m is None:
+        return []
+
+    tags = []
+    for line in m.group(1).splitlines():
+        # Tags are YAML inside a comment, strip the comment markers and YAML comments
+        line = line.strip().lstrip("*/").split("#")[0]
+        tags.extend(t.strip() for t in line.split(",") if t.strip())
+
+    return tags
+
+
+def expand_globs(root, patterns):
+    files = set()
+    for pattern in patterns or []:
+        files.update(os.path.relpath(f, root) for f in glob.glob(os.path.join(root, pattern), recursive=True))
+    return files
+
+
+def get_selector(config):
+    """Get the selector of a parsed suite file with every key present."""
+    selector = config.get("selector") if isinstance(config, dict) else None
+    if not isinstance(selector, dict):
+        selector = {}
+
+    return {key: list(selector.get(key) or []) for key in SELECTOR_KEYS}
+
+
+def parse_suite(args):
+    """Expand the selector of one suite file, returns (suite, files, selector)."""
+    import yaml
+
+    (root, suite_file) = args
+    suite = os.path.splitext(os.path.basename(suite_file))[0]
+
+    try:
+        with open(suite_file) as rfh:
+            config = yaml.safe_load(rfh)
+    except (OSError, yaml.YAMLError) as e:
+        eprint("Failed to parse suite %s: %s" % (suite_file, e))
+        config = None
+
+    selector = get_selector(config)
+    files = expand_globs(root, selector["roots"])
+    excluded = expand_globs(root, selector["exclude_files"])
+    files = sorted(files - excluded)
+
+    return (suite, files, selector)
+
+
+def parse_tags(args):
+    (root, file_name) = args
+    return (file_name, get_test_tags(os.path.join(root, file_name)))
+
+
+def get_suite_files_mtimes(root):
+    suites_dir = os.path.join(root, SUITES_DIR)
+    return {f: os.path.getmtime(f) for f in glob.glob(os.path.join(suites_dir, "*.yml"))}
+
+
+def tags_selected(selector, file_tags):
+    include_tags = selector["include_with_any_tags"]
+    if include_tags and set(include_tags).isdisjoint(file_tags):
+        return False
+
+    exclude_tags = selector["exclude_with_any_tags"]
+    if exclude_tags and not set(exclude_tags).isdisjoint(file_tags):
+        return False
+
+    return True
+
+
+def build_suite_index(root, mtimes):
+    """Build the index of test file to candidate suites from all the suite files.
+
+    Returns (index, dict of suite to selector).
+    """
+    with multiprocessing.Pool() as pool:
+        suites = pool.map(parse_suite, [(root, f) for f in sorted(mtimes)], chunksize=16)
+
+        tagged_files = set()
+        for (_, files, selector) in suites:
+            if selector["include_with_any_tags"] or selector["exclude_with_any_tags"]:
+                tagged_files.update(files)
+
+        tags = dict(pool.map(parse_tags, [(root, f) for f in sorted(tagged_files)], chunksize=64))
+
+    index = {}
+    for (suite, files, selector) in suites:
+        for file_name in files:
+            if tags_selected(selector, tags.get(file_name, [])):
+                index.setdefault(file_name, []).append(suite)
+
+    return (index, {suite: selector for (suite, _, selector) in suites})
+
+
+@functools.lru_cache(maxsize=None)
+def compile_glob(pattern):
+    """Compile a selector glob to a regex that matches the paths glob.glob(recursive=True) finds."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            regex += "[" + chars.replace("\\", "\\\\") + "]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    return re.compile(regex + r"\Z")
+
+
+def glob_selects(patterns, file_name):
+    return any(compile_glob(os.path.normpath(p)).match(file_name) for p in patterns)
+
+
+def select_suites(root, selectors, file_name):
+    """Get the suites whose selectors select file_name, a path relative to root."""
+    suites = []
+    file_tags = None
+    for suite, selector in sorted(selectors.items()):
+        if not glob_selects(selector["roots"], file_name) or glob_selects(selector["exclude_files"], file_name):
+            continue
+
+        if selector["include_with_any_tags"] or selector["exclude_with_any_tags"]:
+            if file_tags is None:
+                file_tags = get_test_tags(os.path.join(root, file_name))
+            if not tags_selected(selector, file_tags):
+                continue
+
+        suites.append(suite)
+
+    return suites
+
+
+def save_suite_index(root, suite_index):
+    index_file = os.path.join(root, SUITE_INDEX_FILE)
+    try:
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        with open(index_file, "w") as wfh:
+            json.dump(suite_index, wfh)
+    except OSError as e:
+        eprint("Failed to save suite index %s: %s" % (index_file, e))
+
+
+def rebuild_suite_index(root, mtimes):
+    """Build the suite index from all the suite files and save it."""
+    built = time.time()
+    eprint("Building suite index for %d suites" % len(mtimes))
+    (index, selectors) = build_suite_index(root, mtimes)
+
+    suite_index = {
+        "version": SUITE_INDEX_VERSION,
+        "mtimes": mtimes,
+        "built": built,
+        # Test file to the time it was last checked against the selectors, if after the build
+        "checked": {},
+        "selectors": selectors,
+        "index": index,
+    }
+    save_suite_index(root, suite_index)
+
+    return suite_index
+
+
+def read_suite_index(root):
+    """Read the saved suite index, rebuilding it if any of the suite files changed."""
+    mtimes = get_suite_files_mtimes(root)
+
+    try:
+        with open(os.path.join(root, SUITE_INDEX_FILE)) as rfh:
+            cached = json.load(rfh)
+        if cached.get("version") == SUITE_INDEX_VERSION and cached.get("mtimes") == mtimes:
+            return cached
+    except (OSError, ValueError):
+        pass
+
+    return rebuild_suite_index(root, mtimes)
+
+
+# mongo root to the suite index, kept for the life of the process
+SUITE_INDEXES = {}
+
+
+def load_suite_index(root):
+    """Load the suite index, a dict with the test file to suites "index" and the "selectors"."""
+    suite_index = SUITE_INDEXES.get(root)
+    if suite_index is None:
+        suite_index = SUITE_INDEXES[root] = read_suite_index(root)
+    return suite_index
+
+
+def get_suite_index(root, file_name):
+    """Get the suite index to look up file_name in, checking file_name again if it changed since.
+
+    The suite files do not change when a test is added, moved or has its @tags edited, but the
+    suites that select it do. Only that test is checked against the saved selectors, the whole
+    index is rebuilt when a suite file changes.
+    """
+    suite_index = load_suite_index(root)
+    index = suite_index["index"]
+
+    path = os.path.abspath(file_name)
+    relative = os.path.relpath(path, root)
+    try:
+        changed = os.path.getmtime(path)
+        if relative not in index:
+            # Moving a file keeps its mtime, the directory it was moved to gets a new one
+            changed = max(changed, os.path.getmtime(os.path.dirname(path)))
+    except OSError:
+        return index
+
+    if changed > max(suite_index["built"], suite_index["checked"].get(relative, 0)):
+        suite_index["checked"][relative] = time.time()
+        suites = select_suites(root, suite_index["selectors"], relative)
+        if suites:
+            index[relative] = suites
+        else:
+            index.pop(relative, None)
+        save_suite_index(root, suite_index)
+
+    return index
+
+
+def get_preferred_suites(file_name, candidates):
+    """Get the suites pick_suite chooses between for file_name, the one it picks first.
+
+    There is more than one only when neither the guessed suite nor the directory's suite selects it.
+    """
+    guess = guess_suite(file_name)
+    if guess in candidates:
+        return [guess]
+
+    # Prefer the suite named after the test directory, i.e. jstests/auth -> auth
+    parts = file_name[file_name.find("jstests"):].split("/")
+    if len(parts) > 1:
+        directory = camel_to_snake(parts[1])
+        if directory in candidates:
+            return [directory]
+
+    return sorted(candidates, key=lambda s: (len(s), s))
+
+
+def pick_suite(file_name, candidates):
+    """Pick the best suite to run file_name with from the suites that select it."""
+    return get_preferred_suites(file_name, candidates)[0]
+
+
+def resolve_suite(file_name):
+    """Find the suite for file_name from the resmoke suite selectors, None if not found."""
+    root = find_mongo_root(file_name)
+    if root is None:
+        return None
+
+    candidates = get_suite_index(root, file_name).get(os.path.relpath(os.path.abspath(file_name), root))
+    if not candidates:
+        return None
+
+    return pick_suite(file_name, candidates)
+
+
 def get_suite(file_name):
 
     if file_name.endswith("test1.log"):
@@ -39,8 +364,19 @@ def get_suite(file_name):
 
             return "failed_to_find_suite_in_test1.log"
 
+    suite = resolve_suite(file_name)
+    if suite is None:
+        suite = guess_suite(file_name)
+
+    if suite is None:
+        return None
+
+    return '--suite=%s %s' %(suite, file_name)
 
 
+def guess_suite(file_name):
+    """Guess the suite for a test from its path."""
+
     # Handle enterprise
     if "enterprise" in file_name:
         idx = file_name.find("jstests")
@@ -60,7 +396,7 @@ def get_suite(file_name):
         # suite = suite.replace("fle2", "sharded_collections_jscore_passthrough")
         suite = suite.replace("concurrency", "concurrency_replication")
 
-        return '--suite=%s %s' %(suite, file_name)
+        return suite
 
     if "jstests" in file_name:
         idx = file_name.find("jstests")
@@ -92,12 +428,94 @@ def get_suite(file_name):
         # if suite not in ["auth", "no_passthrough"]:
         #     suite += "_auth"
 
-        return '--suite=%s %s' %(suite, file_name)
+        return suite
+
+    return None
+
+
+
+def get_suite_candidates(file_name):
+    """Get the suites get_suite could equally run file_name with, the one it picks first."""
+    root = find_mongo_root(file_name)
+    if root is not None:
+        index = get_suite_index(root, file_name)
+        candidates = index.get(os.path.relpath(os.path.abspath(file_name), root))
+        if candidates:
+            return get_preferred_suites(file_name, candidates)
+
+    suite = guess_suite(file_name)
+    return [suite] if suite is not None else []
 
 
+def group_by_suite(file_names):
+    """Group test files by the suite get_suite picks for each, returns a dict of suite to files.
+
+    Files with no single preferred suite join a suite already being run, or else the suite that
+    covers the most of them, so the fewest fixtures are started.
+    """
+    groups = {}
+    tied = {}
+    for file_name in file_names:
+        suites = get_suite_candidates(file_name)
+        if not suites:
+            eprint("Could not find suite for %s, skipping" % file_name)
+        elif len(suites) == 1:
+            groups.setdefault(suites[0], []).append(file_name)
+        else:
+            tied[file_name] = suites
+
+    remaining = list(tied)
+    while remaining:
+        covers = {}
+        for file_name in remaining:
+            for suite in tied[file_name]:
+                covers[suite] = covers.get(suite, 0) + 1
+
+        # Ties are broken like pick_suite
+        suite = min(covers, key=lambda s: (s not in groups, -covers[s], len(s), s))
+        groups.setdefault(suite, []).extend(f for f in remaining if suite in tied[f])
+        remaining = [f for f in remaining if suite not in tied[f]]
+
+    return groups
+
+
+def get_batch_commands(file_names, jobs=None):
+    """Get one set of resmoke arguments per suite so each suite's fixture is started once.
+
+    jobs is passed to resmoke as --jobs, 0 runs up to one job per file and CPU, None leaves it
+    to resmoke.
+    """
+    commands = []
+    for suite, files in sorted(group_by_suite(file_names).items()):
+        jobs_arg = ""
+        if jobs is not None:
+            jobs_arg = "--jobs=%d " % (jobs or min(len(files), multiprocessing.cpu_count()))
+        commands.append('--suite=%s %s%s' % (suite, jobs_arg, " ".join(files)))
+
+    return commands
+
 
 if __name__ == "__main__":
 
-    relative_test_file = sys.argv[1]
-    print(get_suite(relative_test_file))
+    parser = argparse.ArgumentParser(description='Map test files to the resmoke suite to run them with.')
+    parser.add_argument('--batch', action='store_true',
+                        help='Print one line of resmoke arguments per suite for all the files')
+    parser.add_argument('--stdin', action='store_true', help='Read the list of test files from stdin')
+    parser.add_argument('--jobs', type=int,
+                        help='Pass --jobs to resmoke with --batch, 0 for one job per file up to the CPU count')
+    parser.add_argument('files', nargs='*', help='test files')
+    args = parser.parse_args()
+
+    files = args.files
+    if args.stdin:
+        files = files + [line.strip() for line in sys.stdin if line.strip()]
+
+    if not files:
+        parser.error("no test files given")
+
+    if args.batch or len(files) > 1:
+        for command in get_batch_commands(files, args.jobs):
+            print(command)
+    else:
+        print(get_suite(files[0]))
 
@@ -0,0 +1,205 @@
+"""Attach LLDB to every process of a resmoke fixture with one command.
+
+To attach from inside lldb, run:
+
+   command script import python/lldb_attach.py
+   mongodb-attach-fixture --mongod
+
+Or headless, to attach, run some commands against every process and detach:
+
+   python3 python/lldb_attach.py --all --command "bt all"
+
+All the mongods in a fixture run the same executable, so the executable is loaded into a
+target once before attaching. LLDB shares modules between targets, so the symbols and types are
+parsed once for each executable instead of once for each process. The caches in
+lldb_commands_more.py are keyed by module UUID and are shared the same way.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import shlex
+import sys
+import time
+
+import lldb
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import mongo_process  # pylint: disable=wrong-import-position
+
+# Type that is looked up to make LLDB index the debug info of an executable
+WARM_UP_TYPE = "mongo::ServiceContext"
+
+
+def __lldb_init_module(debugger, *_args):
+    """Register custom commands."""
+    debugger.HandleCommand(
+        "command script add -o -f lldb_attach.AttachFixture mongodb-attach-fixture")
+
+
+def find_processes(program_types):
+    """Get a list of (pid, description) for the running processes of the given types."""
+    found = mongo_process.to_json(mongo_process.scan())
+
+    pids = []
+    for mongod in found[mongo_process.MONGOD] if mongo_process.MONGOD in program_types else []:
+        pids.append((mongod["pid"], "mongod %d %s" % (mongod["port"], mongod["replica_set_name"])))
+    for mongos in found[mongo_process.MONGOS] if mongo_process.MONGOS in program_types else []:
+        pids.append((mongos["pid"], "mongos %d" % mongos["port"]))
+
+    return pids
+
+
+def get_executable(pid):
+    return os.readlink("/proc/%d/exe" % pid)
+
+
+def warm_up_executable(debugger, executable):
+    """Load an executable and its debug info once so later targets for it share the module."""
+    start = time.monotonic()
+    target = debugger.CreateTarget(executable)
+    if target.IsValid():
+        target.FindFirstType(WARM_UP_TYPE)
+    return (executable, target, time.monotonic() - start)
+
+
+def attach(debugger, pid, executable):
+    """Attach to one process, returns (target, error, seconds)."""
+    start = time.monotonic()
+    target = debugger.CreateTarget(executable)
+    error = lldb.SBError()
+    if target.IsValid():
+        target.AttachToProcessWithID(debugger.GetListener(), pid, error)
+    else:
+        error.SetErrorString("Failed to create target for %s" % executable)
+
+    return (target, error, time.monotonic() - start)
+
+
+def get_executables(processes, jobs=None):
+    """Get a dict of pid to executable, looked up in parallel."""
+    def lookup(pid):
+        try:
+            return (pid, get_executable(pid))
+        except OSError as e:
+            print("Skipping pid %d: %s" % (pid, e))
+            return (pid, None)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        return {pid: executable for (pid, executable) in pool.map(lookup, [pid for (pid, _) in processes])
+                if executable is not None}
+
+
+def attach_all(debugger, processes, jobs=None):
+    """Attach to all the processes, returns a list of result dicts.
+
+    The SB API is not safe to call from several threads on one debugger, so only finding the
+    executables runs in parallel and the targets are created and attached one at a time.
+    """
+    executables = get_executables(processes, jobs)
+
+    # Parse each distinct executable once before attaching
+    warm_up = {}
+    warm_up_targets = []
+    for executable in sorted(set(executables.values())):
+        (_, target, seconds) = warm_up_executable(debugger, executable)
+        warm_up[executable] = seconds
+        warm_up_targets.append(target)
+
+    results = []
+    for (pid, description) in processes:
+        if pid not in executables:
+            continue
+
+        (target, error, seconds) = attach(debugger, pid, executables[pid])
+        results.append({
+            "pid": pid,
+            "description": description,
+            "executable": executables[pid],
+            "target": target,
+            "error": error.GetCString() if error.Fail() else None,
+            "load_seconds": warm_up[executables[pid]],
+            "attach_seconds": seconds,
+        })
+
+    # The warm up targets keep the modules loaded until every attach has its own target
+    for target in warm_up_targets:
+        debugger.DeleteTarget(target)
+
+    return results
+
+
+def print_report(results):
+    print("%8s  %-24s %10s %10s  %s" % ("PID", "Process", "Load (s)", "Attach (s)", "Status"))
+    for r in results:
+        print("%8d  %-24s %10.2f %10.2f  %s" % (r["pid"], r["description"], r["load_seconds"],
+                                               r["attach_seconds"], r["error"] or "attached"))
+
+
+def parse_args(arg_strs, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Attach to all the processes of a fixture.')
+    parser.add_argument('--mongod', action='store_true', help='Attach to all mongod processes')
+    parser.add_argument('--mongos', action='store_true', help='Attach to all mongos processes')
+    parser.add_argument('--all', action='store_true', help='Attach to all mongod and mongos processes')
+    parser.add_argument('--jobs', type=int, help='Number of threads finding the executables of the processes')
+    parser.add_argument('--command', action='append', default=[], help='Command to run on each process')
+    parser.add_argument('pids', metavar='PID', type=int, nargs='*', help='process ids to attach to')
+    return parser.parse_args(arg_strs)
+
+
+def get_processes(args):
+    program_types = set()
+    if args.mongod or args.all:
+        program_types.add(mongo_process.MONGOD)
+    if args.mongos or args.all:
+        program_types.add(mongo_process.MONGOS)
+
+    processes = find_processes(program_types)
+    processes.extend((pid, "pid %d" % pid) for pid in args.pids)
+    return processes
+
+
+def AttachFixture(debugger, command, _exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Attach to all the mongod and mongos processes of a fixture."""
+    args = parse_args(shlex.split(command), prog='mongodb-attach-fixture')
+
+    results = attach_all(debugger, get_processes(args), args.jobs)
+    print_report(results)
+
+    run_commands(debugger, results, args.command)
+
+
+def run_commands(debugger, results, commands):
+    """Run commands against each attached process."""
+    for r in results:
+        if r["error"] is not None:
+            continue
+
+        debugger.SetSelectedTarget(r["target"])
+        print("=== %d %s ===" % (r["pid"], r["description"]))
+        for command in commands:
+            debugger.HandleCommand(command)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+
+    debugger = lldb.SBDebugger.Create()
+    debugger.SetAsync(False)
+    for script in ["lldb_commands_more.py", "lldb_printers_more.py"]:
+        debugger.HandleCommand("command script import %s" % os.path.join(os.path.dirname(os.path.abspath(__file__)), script))
+
+    results = attach_all(debugger, get_processes(args), args.jobs)
+    print_report(results)
+
+    run_commands(debugger, results, args.command)
+
+    for r in results:
+        if r["error"] is None:
+            r["target"].GetProcess().Detach()
+
+    lldb.SBDebugger.Destroy(debugger)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#! /usr/bin/env python3
+# Script is responsible for benchmarking the LLDB printers and commands without a debugger
+#
+# lldb_fake.py is installed as the lldb module and serves memory, types and symbols from a
+# snapshot, either generated here or loaded from JSON (see lldb_fake.py for the format). Each
+# benchmark is run once cold, with all the caches empty, and then warm, where each iteration is a
+# new stop so only the caches that survive a step are used.
+#
+# Usage:
+#   lldb_bench.py                                - run all benchmarks against a generated snapshot
+#   lldb_bench.py --latency-us 200               - simulate a remote lldb-dap connection
+#   lldb_bench.py --benchmark OIDPrinter --calls - run one benchmark and print its SB API calls
+#   lldb_bench.py --save-snapshot snap.json      - write the generated snapshot
+#   lldb_bench.py --snapshot snap.json --json    - replay a snapshot and print JSON results
+#
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import lldb_fake  # pylint: disable=wrong-import-position
+
+sys.modules["lldb"] = lldb_fake
+
+import lldb_commands_more  # pylint: disable=wrong-import-position
+import lldb_printers_more  # pylint: disable=wrong-import-position
+import lldb_profiler  # pylint: disable=wrong-import-position
+import lldb_resolver  # pylint: disable=wrong-import-position
+
+HEAP_BASE = 0x10000000
+
+DECORABLE_NAME = "mongo::Decorable<mongo::ServiceContext>"
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+class SnapshotBuilder:
+    """Lays out objects in a single heap region and records their types."""
+
+    def __init__(self):
+        self.heap = bytearray()
+        self.types = {}
+        self.symbols = {}
+        self.globals = {}
+        self.values = {}
+
+    def alloc(self, size, align=8):
+        self.heap.extend(b"\0" * (-len(self.heap) % align))
+        addr = HEAP_BASE + len(self.heap)
+        self.heap.extend(b"\0" * size)
+        return addr
+
+    def write(self, addr, data):
+        self.heap[addr - HEAP_BASE:addr - HEAP_BASE + len(data)] = data
+
+    def write_u64(self, addr, value):
+        self.write(addr, struct.pack("<Q", value))
+
+    def add_bytes(self, data):
+        addr = self.alloc(len(data) + 1)
+        self.write(addr, data)
+        return addr
+
+    def add_struct(self, name, size, fields, bases=(), template_args=()):
+        self.types[name] = {
+            "kind": "struct",
+            "size": size,
+            "fields": [{"name": n, "type": t, "offset": o} for (n, t, o) in fields],
+            "bases": [{"type": t, "offset": o} for (t, o) in bases],
+            "template_args": list(template_args),
+        }
+
+    def add_value(self, type_name, addr):
+        self.values.setdefault(type_name, []).append(addr)
+
+    def to_dict(self):
+        # Pad to whole pages so the page cache in lldb_printers_more.py can read them
+        self.heap.extend(b"\0" * (-len(self.heap) % lldb_printers_more.PAGE_SIZE))
+        return {
+            "executable": "/fake/mongod",
+            "uuid": "6d6f6e67-6f64-6576-2d62-656e63680000",
+            "memory": [{"address": HEAP_BASE, "data": base64.b64encode(bytes(self.heap)).decode()}],
+            "types": self.types,
+            "symbols": self.symbols,
+            "globals": self.globals,
+            "values": self.values,
+        }
+
+
+def add_basic_types(b):
+    for (name, size, signed) in [("long", 8, True), ("unsigned long", 8, False), ("int", 4, True),
+                                 ("bool", 1, False), ("char", 1, True), ("unsigned char", 1, False)]:
+        b.types[name] = {"kind": "basic", "size": size, "signed": signed}
+
+    # libstdc++ layouts
+    b.add_struct("std::string::_Alloc_hider", 8, [("_M_p", "char *", 0)])
+    b.add_struct("std::string", 32, [("_M_dataplus", "std::string::_Alloc_hider", 0),
+                                     ("_M_string_length", "unsigned long", 8)])
+    b.add_struct("std::string_view", 16, [("_M_len", "unsigned long", 0), ("_M_str", "const char *", 8)])
+    b.add_struct("std::type_info", 16, [("__vptr", "void *", 0), ("__name", "const char *", 8)])
+
+    b.add_struct("mongo::NamespaceString", 32, [("_data", "std::string", 0)])
+    b.add_struct("mongo::StringData", 16, [("_sv", "std::string_view", 0)])
+    b.add_struct("mongo::OID", 12, [("_oid", "unsigned char[12]", 0)])
+
+
+def add_namespace_string(b, ns, addr=None):
+    data = bytes([ns.index(".")]) + ns.encode()
+    if addr is None:
+        addr = b.alloc(32)
+    b.write_u64(addr, b.add_bytes(data))
+    b.write_u64(addr + 8, len(data))
+    return addr
+
+
+def add_oid(b, i, addr=None):
+    if addr is None:
+        addr = b.alloc(12, 4)
+    b.write(addr, struct.pack(">IQ", 0x65000000 + i, i))
+    return addr
+
+
+def add_string_data(b, s):
+    addr = b.alloc(16)
+    b.write_u64(addr, len(s))
+    b.write_u64(addr + 8, b.add_bytes(s.encode()))
+    return addr
+
+
+def add_decorable(b, num_decorations):
+    """Add a ServiceContext with a registry of num_decorations decorations."""
+    entry_type = "mongo::decorable_detail::Registry::Entry"
+    b.add_struct(entry_type, 24, [("_typeInfo", "const std::type_info *", 0), ("_offset", "unsigned long", 8)])
+    b.types["std::vector<%s>" % entry_type] = {"kind": "vector", "element": entry_type}
+    b.add_struct("mongo::decorable_detail::Registry", 24, [("_entries", "std::vector<%s>" % entry_type, 0)])
+
+    decorations = []
+    offset = 0
+    for i in range(num_decorations):
+        if i % 2:
+            name = "CollectionState%d" % i
+            b.add_struct("mongo::bench::" + name, 56, [("nss", "mongo::NamespaceString", 0),
+                                                       ("epoch", "mongo::OID", 32), ("version", "long", 48)])
+            size = 56
+        else:
+            name = "Counter%d" % i
+            b.add_struct("mongo::bench::" + name, 16, [("count", "long", 0), ("enabled", "bool", 8)])
+            size = 16
+        decorations.append((name, offset, size))
+        offset += size
+
+    # The decorations live in a heap buffer that the Decorable points to, not in the object itself
+    container_type = "mongo::DecorationContainer<mongo::ServiceContext>"
+    b.add_struct(container_type, 16, [("_registry", "const mongo::decorable_detail::Registry *", 0),
+                                      ("_decorationData", "unsigned char *", 8)])
+    b.add_struct(DECORABLE_NAME, 16, [("_decorations", container_type, 0)],
+                 template_args=["mongo::ServiceContext"])
+    b.add_struct("mongo::ServiceContext", 16, [], bases=[(DECORABLE_NAME, 0)])
+
+    service_context = b.alloc(16)
+    decoration_data = b.alloc(offset)
+    b.write_u64(service_context + 8, decoration_data)
+
+    entries = b.alloc(24 * num_decorations)
+    for i, (name, dec_offset, size) in enumerate(decorations):
+        # Internal type_info names, i.e. N5mongo5bench9Counter12E
+        mangled = "N5mongo5bench%d%sE" % (len(name), name)
+        type_info = b.alloc(16)
+        b.write_u64(type_info + 8, b.add_bytes(mangled.encode()))
+        b.write_u64(entries + 24 * i, type_info)
+        b.write_u64(entries + 24 * i + 8, dec_offset)
+
+        addr = decoration_data + dec_offset
+        if size == 16:
+            b.write(addr, struct.pack("<qB", i * 1000, 1))
+        else:
+            add_namespace_string(b, "db%d.coll%d" % (i, i), addr)
+            add_oid(b, i, addr + 32)
+            b.write(addr + 48, struct.pack("<q", i))
+
+    registry = b.alloc(24)
+    b.write_u64(registry, entries)
+    b.write_u64(registry + 8, entries + 24 * num_decorations)
+    b.write_u64(registry + 16, entries + 24 * num_decorations)
+
+    registry_pointer = b.alloc(8)
+    b.write_u64(registry_pointer, registry)
+    b.symbols["mongo::decorable_detail::gdbRegistry<mongo::ServiceContext>"] = registry_pointer
+
+    global_pointer = b.alloc(8)
+    b.write_u64(global_pointer, service_context)
+    b.globals["globalServiceContext"] = {"type": "mongo::ServiceContext *", "address": global_pointer}
+
+    b.add_value(DECORABLE_NAME, service_context)
+
+
+def generate_snapshot(num_values, num_decorations):
+    b = SnapshotBuilder()
+    add_basic_types(b)
+
+    for i in range(num_values):
+        b.add_value("mongo::NamespaceString", add_namespace_string(b, "test%d.coll%d" % (i % 7, i)))
+        b.add_value("mongo::OID", add_oid(b, i))
+        b.add_value("mongo::StringData", add_string_data(b, "field_name_%d" % i))
+
+    add_decorable(b, num_decorations)
+
+    return b.to_dict()
+
+
+class Context:
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.target = lldb_fake.SBTarget()
+        self.exec_ctx = lldb_fake.SBExecutionContext(self.target)
+        self.debugger = lldb_fake.SBDebugger()
+
+    def values(self, type_name):
+        type_obj = self.target.FindFirstType(type_name)
+        return [self.target.CreateValueFromAddress("v", lldb_fake.SBAddress(addr), type_obj)
+                for addr in self.snapshot.values.get(type_name, [])]
+
+
+def bench_namespace_string(ctx):
+    for v in ctx.values("mongo::NamespaceString"):
+        lldb_printers_more.NamespaceStringPrinter(v)
+
+
+def bench_oid(ctx):
+    for v in ctx.values("mongo::OID"):
+        lldb_printers_more.OIDPrinter(v)
+
+
+def bench_string_data(ctx):
+    for v in ctx.values("mongo::StringData"):
+        lldb_printers_more.StringDataPrinter(v)
+
+
+def bench_decorable(ctx):
+    for v in ctx.values(DECORABLE_NAME):
+        provider = lldb_commands_more.DecorablePrinter(v)
+        provider.update()
+        for i in range(provider.num_children()):
+            provider.get_child_at_index(i)
+
+
+def bench_dump_client(ctx):
+    with contextlib.redirect_stdout(io.StringIO()):
+        lldb_commands_more.DumpClient(ctx.debugger, "", ctx.exec_ctx, None, None)
+
+
+BENCHMARKS = [
+    ("NamespaceStringPrinter", bench_namespace_string),
+    ("OIDPrinter", bench_oid),
+    ("StringDataPrinter", bench_string_data),
+    ("DecorablePrinter", bench_decorable),
+    ("DumpClient", bench_dump_client),
+]
+
+
+def clear_caches():
+    lldb_resolver.clear()
+    lldb_commands_more.DECORABLE_LAYOUT_CACHE.clear()
+    lldb_commands_more.DECORABLE_MODULE_UUIDS.clear()
+    lldb_commands_more.PENDING_DECORABLE_REGISTRIES.clear()
+    lldb_commands_more.DEMANGLE_CACHE.clear()
+
+
+def measure(ctx, func, iterations):
+    """Run func iterations times, each after a new stop, returns the per iteration costs."""
+    lldb_fake.reset_stats()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        ctx.target.process.resume()
+        func(ctx)
+    seconds = time.perf_counter() - start
+
+    return {
+        "sb_calls": sum(lldb_fake.CALLS.values()) / iterations,
+        "read_memory_calls": lldb_fake.CALLS["SBProcess.ReadMemory"] / iterations,
+        "bytes_read": lldb_fake.BYTES_READ[0] / iterations,
+        "ms": seconds * 1000 / iterations,
+        "calls": {name: count / iterations for name, count in lldb_fake.CALLS.most_common()},
+    }
+
+
+def run(ctx, benchmarks, iterations):
+    results = []
+    for (name, func) in benchmarks:
+        clear_caches()
+        results.append(dict(benchmark=name, phase="cold", **measure(ctx, func, 1)))
+        results.append(dict(benchmark=name, phase="warm", **measure(ctx, func, iterations)))
+
+    return results
+
+
+def print_results(results, show_calls):
+    print("%-24s %-5s %12s %12s %12s %12s" % ("Benchmark", "Phase", "SB calls", "ReadMemory", "KB read", "ms"))
+    for r in results:
+        print("%-24s %-5s %12.1f %12.1f %12.1f %12.2f" % (r["benchmark"], r["phase"], r["sb_calls"],
+                                                          r["read_memory_calls"], r["bytes_read"] / 1024, r["ms"]))
+        if show_calls:
+            for (call, count) in r["calls"].items():
+                print("    %-40s %10.1f" % (call, count))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the LLDB printers and commands against a snapshot.')
+    parser.add_argument('--snapshot', help='JSON snapshot to replay instead of generating one')
+    parser.add_argument('--save-snapshot', help='Write the generated snapshot to this file and exit')
+    parser.add_argument('--values', type=int, default=256, help='Values of each printed type to generate')
+    parser.add_argument('--decorations', type=int, default=200, help='Decorations on the generated ServiceContext')
+    parser.add_argument('--latency-us', type=float, default=0, help='Microseconds added to every SB API call')
+    parser.add_argument('--read-latency-us', type=float, default=0, help='Microseconds added to every ReadMemory')
+    parser.add_argument('--iterations', type=int, default=10, help='Warm iterations of each benchmark')
+    parser.add_argument('--benchmark', action='append', help='Benchmarks to run, default all')
+    parser.add_argument('--calls', action='store_true', help='Print the SB API calls of each benchmark')
+    parser.add_argument('--profile', action='store_true', help='Print the formatter profile, see lldb_profiler.py')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    if args.snapshot:
+        with open(args.snapshot) as rfh:
+            snapshot_data = json.load(rfh)
+    else:
+        snapshot_data = generate_snapshot(args.values, args.decorations)
+
+    if args.save_snapshot:
+        with open(args.save_snapshot, "w") as wfh:
+            json.dump(snapshot_data, wfh)
+        sys.exit(0)
+
+    context = Context(lldb_fake.load_snapshot(snapshot_data))
+    lldb_printers_more.__lldb_init_module(context.debugger)
+    lldb_commands_more.__lldb_init_module(context.debugger)
+
+    if args.profile:
+        lldb_profiler.enable(context.debugger)
+
+    lldb_fake.LATENCY = args.latency_us / 1e6
+    lldb_fake.READ_LATENCY = args.read_latency_us / 1e6
+
+    selected = [b for b in BENCHMARKS if not args.benchmark or b[0] in args.benchmark]
+    unknown = set(args.benchmark or []) - {b[0] for b in BENCHMARKS}
+    if unknown:
+        eprint("Unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+        sys.exit(1)
+
+    bench_results = run(context, selected, args.iterations)
+
+    if args.json:
+        print(json.dumps(bench_results, indent=2))
+    else:
+        print_results(bench_results, args.calls)
+
+    if args.profile:
+        print()
+        for line in lldb_profiler.report():
+            print(line)
@@ -1,10 +1,22 @@
 """Add user-defined commands to MongoDB."""
 
 import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import re
 import shlex
+import struct
+import subprocess
+import threading
 import lldb
 import cxxfilt
 
+import lldb_printers_more
+import lldb_profiler
+import lldb_resolver
+
 def __lldb_init_module(debugger, *_args):
     """Register custom commands."""
     # debugger.HandleCommand(
@@ -13,9 +25,21 @@ def __lldb_init_module(debugger, *_args):
     debugger.HandleCommand(
         "command script add -o -f lldb_commands_more.DumpClient mongodb-dc")
     debugger.HandleCommand(
-        "command script add -o -f lldb_commands.BreakpointOnMAssert mongodb-breakpoint-massert")
+        "command script add -o -f lldb_commands_more.BreakpointOnMAssert mongodb-breakpoint-massert")
+    debugger.HandleCommand(
+        "command script add -o -f lldb_commands_more.BreakpointOnAssert mongodb-breakpoint-assert")
+    debugger.HandleCommand(
+        "command script add -o -f lldb_commands_more.DecorableCache mongodb-decorable-cache")
+    debugger.HandleCommand(
+        "command script add -o -f lldb_commands_more.ResolverStats mongodb-resolver-stats")
+    debugger.HandleCommand(
+        "command script add -o -f lldb_commands_more.LockSnapshot mongodb-lock-snapshot")
+    debugger.HandleCommand(
+        "command script add -o -f lldb_commands_more.PrinterStats mongodb-printer-stats")
     debugger.HandleCommand("type synthetic add -x '^mongo::Decorable<.+>$' --python-class lldb_commands_more.DecorablePrinter")
 
+    lldb_profiler.init(debugger)
+
 #######################
 # Command Definitions #
 #######################
@@ -42,9 +66,224 @@ def StopAttachHandler():
     # else:
         # print("NOT STOPPED: %s" % (t.GetStopReason() ))
 
-# TODO - should we set one bp on all uassert/massert
-def BreakpointOnMAssert(debugger, command, _exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
-    """Set a breakpoint on MongoDB massert that throws the specified error code."""
+def DecorableCache(_debugger, command, exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Manage the cache of Decorable registry layouts."""
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-decorable-cache',
+                                     description='Manage the cache of Decorable registry layouts.')
+    parser.add_argument('action', choices=['show', 'save', 'load', 'clear'], nargs='?', default='show')
+    args = parser.parse_args(arg_strs)
+
+    target = exec_ctx.target
+
+    if args.action == 'clear':
+        DECORABLE_LAYOUT_CACHE.clear()
+        DECORABLE_MODULE_UUIDS.clear()
+        PENDING_DECORABLE_REGISTRIES.clear()
+        lldb_resolver.clear()
+        DEMANGLE_CACHE.clear()
+        print("Cleared decorable layout cache")
+    elif args.action == 'save':
+        print("Saved decorable layout cache to %s" % save_dec_cache(target))
+    elif args.action == 'load':
+        print("Loaded %d decorable layouts" % load_dec_cache(target))
+    else:
+        for (uuid, name), layout in DECORABLE_LAYOUT_CACHE.items():
+            print("%s %s: %d decorations" % (uuid, name, len(layout)))
+        print("Demangle cache: %s" % DEMANGLE_CACHE.stats())
+
+
+def PrinterStats(debugger, command, _exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Turn formatter profiling on or off and print the timing report."""
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-printer-stats',
+                                     description='Profile the summary and synthetic children formatters.')
+    parser.add_argument('action', choices=['report', 'on', 'off', 'clear'], nargs='?', default='report')
+    parser.add_argument('--sort', choices=sorted(lldb_profiler.SORT_KEYS), default='total',
+                        help='Column to sort the report by')
+    parser.add_argument('--limit', type=int, help='Number of formatters to show')
+    args = parser.parse_args(arg_strs)
+
+    if args.action == 'on':
+        lldb_profiler.enable(debugger)
+        print("Formatter profiling enabled")
+    elif args.action == 'off':
+        lldb_profiler.disable(debugger)
+        print("Formatter profiling disabled")
+    elif args.action == 'clear':
+        lldb_profiler.clear()
+        print("Cleared formatter stats")
+    else:
+        if not lldb_profiler.ENABLED:
+            print("Formatter profiling is off, turn it on with: mongodb-printer-stats on")
+        for line in lldb_profiler.report(args.sort, args.limit):
+            print(line)
+
+
+def ResolverStats(_debugger, command, _exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Print the hits and misses of the type and symbol resolution caches."""
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-resolver-stats',
+                                     description='Print the hits and misses of the type and symbol caches.')
+    parser.add_argument('--clear', action='store_true', help='Clear the caches and counters')
+    args = parser.parse_args(arg_strs)
+
+    if args.clear:
+        lldb_resolver.clear()
+        print("Cleared resolver caches")
+        return
+
+    print("%-14s %10s %10s" % ("Lookup", "Hits", "Misses"))
+    for (category, hits, misses) in lldb_resolver.stats():
+        print("%-14s %10d %10d" % (category, hits, misses))
+
+
+# Assertion entry points by kind of assert, all take the Status as the first argument
+ASSERT_FUNCTIONS = {
+    "uassert": "mongo::uassertedWithLocation",
+    "massert": "mongo::msgassertedWithLocation",
+    "tassert": "mongo::tassertFailed",
+}
+
+# Name given to the breakpoints so they can be found again
+ASSERT_BREAKPOINT_NAME = "mongodb-assert"
+
+# Error codes to stop on for each kind of assert, checked by the breakpoint callbacks so codes can
+# be changed at runtime
+ASSERT_CODES = {kind: set() for kind in ASSERT_FUNCTIONS}
+
+# Number of times each error code has been asserted
+ASSERT_HIT_COUNTS = collections.Counter()
+
+# Log asserts with matching codes instead of stopping
+ASSERT_LOG_ONLY = False
+
+# Offset of ErrorInfo::code, computed on the first hit
+ASSERT_CODE_OFFSET = None
+
+
+def get_assert_code(frame):
+    """Read the error code from the Status argument of an assertion function."""
+    global ASSERT_CODE_OFFSET
+
+    px = frame.FindVariable("status").GetChildMemberWithName("_error").GetChildMemberWithName("px")
+    ptr = px.GetValueAsUnsigned(0)
+    if ptr == 0:
+        return None
+
+    if ASSERT_CODE_OFFSET is None:
+        error_info = px.GetType().GetPointeeType()
+        for i in range(error_info.GetNumberOfFields()):
+            field = error_info.GetFieldAtIndex(i)
+            if field.GetName() == "code":
+                ASSERT_CODE_OFFSET = field.GetOffsetInBytes()
+                break
+        else:
+            return None
+
+    err = lldb.SBError()
+    code = frame.GetThread().GetProcess().ReadUnsignedFromMemory(ptr + ASSERT_CODE_OFFSET, 4, err)
+    if err.Fail():
+        return None
+
+    return code
+
+
+def assert_breakpoint_callback(frame, bp_loc, kind):
+    """Breakpoint callback for the assertion function of a kind of assert, returns True to stop."""
+    code = get_assert_code(frame)
+    if code is None:
+        return True
+
+    ASSERT_HIT_COUNTS[code] += 1
+
+    if code not in ASSERT_CODES[kind]:
+        return False
+
+    if ASSERT_LOG_ONLY:
+        print("%s: code %d, thread %d" % (bp_loc.GetAddress().GetFunction().GetName(), code,
+                                          frame.GetThread().GetThreadID()))
+        return False
+
+    return True
+
+
+def uassert_breakpoint_callback(frame, bp_loc, _internal_dict):
+    return assert_breakpoint_callback(frame, bp_loc, "uassert")
+
+
+def massert_breakpoint_callback(frame, bp_loc, _internal_dict):
+    return assert_breakpoint_callback(frame, bp_loc, "massert")
+
+
+def tassert_breakpoint_callback(frame, bp_loc, _internal_dict):
+    return assert_breakpoint_callback(frame, bp_loc, "tassert")
+
+
+def ensure_assert_breakpoints(target):
+    """Create the assertion breakpoints in the target if they do not exist yet."""
+    bp_list = lldb.SBBreakpointList(target)
+    target.FindBreakpointsByName(ASSERT_BREAKPOINT_NAME, bp_list)
+    if bp_list.GetSize() > 0:
+        return
+
+    for kind, function in ASSERT_FUNCTIONS.items():
+        bp = target.BreakpointCreateByName(function)
+        bp.AddName(ASSERT_BREAKPOINT_NAME)
+        bp.SetScriptCallbackFunction("lldb_commands_more.%s_breakpoint_callback" % kind)
+
+
+def BreakpointOnAssert(_debugger, command, exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Stop on uasserts, masserts and tasserts with the specified error codes."""
+    global ASSERT_LOG_ONLY
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-breakpoint-assert',
+                                     description='Stop on asserts with the specified error codes.')
+    parser.add_argument('--kind', choices=sorted(ASSERT_FUNCTIONS), action='append',
+                        help='Kind of assert the codes apply to, default all')
+    parser.add_argument('action', choices=['add', 'remove', 'list', 'clear', 'log-only', 'stop'])
+    parser.add_argument('codes', metavar='N', type=int, nargs='*', help='assert code')
+    args = parser.parse_args(arg_strs)
+
+    kinds = args.kind or list(ASSERT_FUNCTIONS)
+
+    if args.action == 'add':
+        ensure_assert_breakpoints(exec_ctx.target)
+        for kind in kinds:
+            ASSERT_CODES[kind].update(args.codes)
+    elif args.action == 'remove':
+        for kind in kinds:
+            ASSERT_CODES[kind].difference_update(args.codes)
+    elif args.action == 'clear':
+        for kind in kinds:
+            ASSERT_CODES[kind].clear()
+        ASSERT_HIT_COUNTS.clear()
+    elif args.action == 'log-only':
+        ASSERT_LOG_ONLY = True
+    elif args.action == 'stop':
+        ASSERT_LOG_ONLY = False
+
+    print("Mode: %s" % ("log only" if ASSERT_LOG_ONLY else "stop"))
+    for kind, codes in ASSERT_CODES.items():
+        print("%s codes: %s" % (kind, ", ".join(str(c) for c in sorted(codes))))
+    for code, count in ASSERT_HIT_COUNTS.most_common():
+        watched = any(code in codes for codes in ASSERT_CODES.values())
+        print("%8d %s%d" % (count, "*" if watched else " ", code))
+
+
+def BreakpointOnMAssert(debugger, command, exec_ctx, result, internal_dict):  # pylint: disable=invalid-name
+    """Set a breakpoint on MongoDB massert that throws the specified error code.
+
+    Only masserts stop, see mongodb-breakpoint-assert for uasserts and tasserts.
+    """
 
     arg_strs = shlex.split(command)
 
@@ -52,48 +291,411 @@ def BreakpointOnMAssert(debugger, command, _exec_ctx, _result, _internal_dict):
     parser.add_argument('code', metavar='N', type=int, help='uassert code')
     args = parser.parse_args(arg_strs)
 
-    debugger.HandleCommand(
-        "breakpoint set -n mongo::msgassertedWithLocation -c \"(int)status._error.px->code == %s\"" %
-        args.code)
+    BreakpointOnAssert(debugger, "--kind massert add %d" % args.code, exec_ctx, result, internal_dict)
+
+
+# Maximum number of children shown in a one line summary of an aggregate
+DUMP_MAX_CHILDREN = 8
+
+DECORABLE_PREFIX = "mongo::Decorable<"
+
+
+def find_decorable_base(type_obj):
+    """Get (offset, decorable type name) of the mongo::Decorable<T> base of a type, None if none."""
+    type_obj = type_obj.GetCanonicalType()
+    if type_obj.GetName().startswith(DECORABLE_PREFIX):
+        return (0, type_obj.GetName())
+
+    for i in range(type_obj.GetNumberOfDirectBaseClasses()):
+        base = type_obj.GetDirectBaseClassAtIndex(i)
+        found = find_decorable_base(base.GetType())
+        if found is not None:
+            return (base.GetOffsetInBytes() + found[0], found[1])
+
+    return None
+
+
+def find_dump_value(exec_ctx, expression, thread_id):
+    """Get the SBValue for an expression, searching the frames of a thread if one is given."""
+    if thread_id is None:
+        frames = [exec_ctx.frame] if exec_ctx.frame.IsValid() else []
+    else:
+        thread = exec_ctx.process.GetThreadByIndexID(thread_id)
+        if not thread.IsValid():
+            print("No thread with index %d" % thread_id)
+            return None
+        frames = thread.frames
+
+    # Variable paths do not need the expression evaluator, so try them first
+    for frame in frames:
+        value = frame.GetValueForVariablePath(expression)
+        if value.IsValid() and value.GetError().Success():
+            return value
+
+    for frame in frames:
+        value = frame.EvaluateExpression(expression)
+        if value.IsValid() and value.GetError().Success():
+            return value
+
+    value = exec_ctx.target.EvaluateExpression(expression)
+    if value.IsValid() and value.GetError().Success():
+        return value
+
+    return None
+
+
+def get_decorable_address(target, value, type_name):
+    """Get (address of the Decorable, decorable type name) for a value, pointer or raw address."""
+    if type_name is not None:
+        # The value is a raw address or a pointer to an object of type_name
+        addr = value.GetValueAsUnsigned(0)
+        type_obj = lldb_resolver.find_type(target, type_name)
+        if not type_obj.IsValid():
+            print("Unknown type: %s" % type_name)
+            return None
+    else:
+        if value.GetType().IsPointerType() or value.GetType().IsReferenceType():
+            value = value.Dereference()
+        addr = value.GetLoadAddress()
+        type_obj = value.GetType()
+
+    found = find_decorable_base(type_obj)
+    if found is None:
+        print("%s is not a Decorable" % type_obj.GetName())
+        return None
+
+    (base_offset, decorable_type) = found
+    return (addr + base_offset, decorable_type, decorable_type[len(DECORABLE_PREFIX):decorable_type.rindex(">")].strip())
+
+
+# Members of mongo::Decorable<T> that point to the heap buffer holding the decorations
+DECORATION_DATA_MEMBERS = ("_decorations._decorationData", "_decorations._data")
+
+
+def get_decoration_data(target, process, decorable_type_name, decorable_addr):
+    """Get the address of the buffer holding the decorations of a Decorable, None if unknown.
+
+    The registry offsets of the decorations are relative to this buffer, not to the Decorable.
+    """
+    type_obj = lldb_resolver.find_type(target, decorable_type_name)
+    if not type_obj.IsValid():
+        return None
+
+    for member_path in DECORATION_DATA_MEMBERS:
+        offset = lldb_resolver.member_offset(target, type_obj, member_path)
+        if offset is not None:
+            # Raw pointer or the pointer at the start of a std::unique_ptr<unsigned char[]>
+            return read_u64(target.GetProcess() if process is None else process, decorable_addr + offset)
+
+    return None
+
+
+def summarize_value(value, depth):
+    """Get a one line summary of a value, expanding aggregates up to depth levels."""
+    summary = value.GetSummary()
+    if summary is not None:
+        return summary
+
+    num_children = value.GetNumChildren(DUMP_MAX_CHILDREN + 1)
+    if num_children == 0:
+        v = value.GetValue()
+        return v if v is not None else ""
+
+    if depth <= 0:
+        return "{...}"
+
+    parts = []
+    for i in range(min(num_children, DUMP_MAX_CHILDREN)):
+        child = value.GetChildAtIndex(i)
+        parts.append("%s=%s" % (child.GetName(), summarize_value(child, depth - 1)))
+    if num_children > DUMP_MAX_CHILDREN:
+        parts.append("...")
+
+    return "{%s}" % ", ".join(parts)
+
+
+def value_to_json(value, depth):
+    """Convert a value to JSON, aggregates below depth levels are replaced by their summary."""
+    num_children = value.GetNumChildren(DUMP_MAX_CHILDREN + 1)
+    if num_children == 0 or depth <= 0 or value.GetSummary() is not None:
+        return summarize_value(value, 0)
+
+    return {value.GetChildAtIndex(i).GetName(): value_to_json(value.GetChildAtIndex(i), depth - 1)
+            for i in range(min(num_children, DUMP_MAX_CHILDREN))}
+
+
+def DumpClient(_debugger, command, exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Dump the decorations of a ServiceContext, OperationContext or any other Decorable."""
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-dc', description='Dump the decorations of a Decorable.')
+    parser.add_argument('expression', nargs='?', default='globalServiceContext',
+                        help='Decorable, pointer to one or address, i.e. opCtx (default: globalServiceContext)')
+    parser.add_argument('--type', help='Type of the object at a raw address, i.e. mongo::OperationContext')
+    parser.add_argument('--thread', type=int, help='Index of the thread whose frames to search for the expression')
+    parser.add_argument('--filter', help='Only show decorations whose type contains this substring')
+    parser.add_argument('--regex', action='store_true', help='Treat --filter as a regular expression')
+    parser.add_argument('--depth', type=int, default=1, help='Levels of members to expand (default: 1)')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of one line per decoration')
+    args = parser.parse_args(arg_strs)
+
+    target = exec_ctx.target
+
+    value = find_dump_value(exec_ctx, args.expression, args.thread)
+    if value is None:
+        print("Could not evaluate %s" % args.expression)
+        return
+
+    found = get_decorable_address(target, value, args.type)
+    if found is None:
+        return
+    (addr, decorable_type, decorable_name) = found
+
+    data = get_decoration_data(target, exec_ctx.process, decorable_type, addr)
+    if data is None:
+        print("Could not read the decorations of the %s at 0x%x" % (decorable_name, addr))
+        return
+
+    if args.filter is None:
+        matches = lambda type_name: True
+    elif args.regex:
+        matches = re.compile(args.filter).search
+    else:
+        matches = lambda type_name: args.filter in type_name
+
+    decorations = []
+    for (type_name, offset) in get_dec_list(target, decorable_name):
+        if not matches(type_name):
+            continue
+
+        type_obj = lldb_resolver.find_type(target, type_name)
+        if not type_obj.IsValid():
+            decorations.append((type_name, offset, None))
+            continue
+
+        decorations.append((type_name, offset,
+                            target.CreateValueFromAddress(type_name, target.ResolveLoadAddress(data + offset), type_obj)))
+
+    if args.json:
+        print(json.dumps({
+            "decorable": decorable_name,
+            "address": addr,
+            "data": data,
+            "decorations": [{"type": type_name, "offset": offset,
+                             "value": value_to_json(v, args.depth) if v is not None else None}
+                            for (type_name, offset, v) in decorations],
+        }, indent=2))
+        return
+
+    print("%s at 0x%x: %d decorations at 0x%x" % (decorable_name, addr, len(decorations), data))
+    for (type_name, offset, v) in decorations:
+        summary = summarize_value(v, args.depth) if v is not None else "<unknown type>"
+        print("%6d  %s = %s" % (offset, type_name, summary))
+
+
+OPERATION_CONTEXT = "mongo::OperationContext"
+
+# Longest client description read from a std::string
+SNAPSHOT_MAX_STRING = 1024
+
+
+def read_u64(process, addr):
+    """Read a 64-bit unsigned integer through the page cache, None on error."""
+    if addr is None or addr == 0:
+        return None
+
+    buf = lldb_printers_more.read_memory(process, addr, 8)
+    if buf is None:
+        return None
+
+    return struct.unpack_from("<Q", buf)[0]
+
+
+def read_std_string(process, addr):
+    """Read the bytes of a libstdc++ std::string laid out as {_M_p, _M_string_length, ...}."""
+    if addr is None or addr == 0:
+        return None
+
+    fields = lldb_printers_more.read_u64_pair(process, addr)
+    if fields is None or fields[0] == 0:
+        return None
+
+    buf = lldb_printers_more.read_memory(process, fields[0], min(fields[1], SNAPSHOT_MAX_STRING))
+    return bytes(buf) if buf is not None else None
+
+
+def get_member_address(target, type_name, addr, member_path):
+    """Get the address of a member of the type_name object at addr, None if it is not known."""
+    if addr is None or addr == 0:
+        return None
+
+    offset = lldb_resolver.member_offset(target, lldb_resolver.find_type(target, type_name), member_path)
+    if offset is None:
+        return None
+
+    return addr + offset
+
+
+def find_thread_opctx(thread, max_frames):
+    """Get the address of the OperationContext in the innermost frame with an opCtx or this."""
+    for frame in thread.frames[:max_frames]:
+        for value in (frame.FindVariable("opCtx"), frame.FindVariable("this")):
+            if not value.IsValid():
+                continue
+
+            type_obj = value.GetType().GetCanonicalType()
+            if type_obj.IsPointerType():
+                addr = value.GetValueAsUnsigned(0)
+                pointee = type_obj.GetPointeeType()
+            elif type_obj.IsReferenceType():
+                addr = value.Dereference().GetLoadAddress()
+                pointee = type_obj.GetDereferencedType()
+            else:
+                continue
+
+            if addr != 0 and pointee.GetCanonicalType().GetUnqualifiedType().GetName() == OPERATION_CONTEXT:
+                return addr
+
+    return None
+
+
+def find_curop(target, process, opctx):
+    """Get the address of the top CurOp of an OperationContext from its CurOpStack decoration."""
+    try:
+        decorations = get_dec_list(target, OPERATION_CONTEXT)
+    except AssertionError:
+        # No decoration registry symbols
+        return None
+
+    found = find_decorable_base(lldb_resolver.find_type(target, OPERATION_CONTEXT))
+    if found is None:
+        return None
+
+    data = get_decoration_data(target, process, found[1], opctx + found[0])
+    if data is None:
+        return None
 
+    for (type_name, offset) in decorations:
+        if type_name.endswith("CurOpStack"):
+            return read_u64(process, get_member_address(target, type_name, data + offset, "_top"))
 
+    return None
 
-def DumpClient(_debugger, _command, exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
-    """Dump the client."""
 
-    # arg_strs = shlex.split(command)
+def get_locker_type(target):
+    """Get the concrete Locker type, LockerImpl until 8.0 and Locker after."""
+    locker_type = lldb_resolver.find_type(target, "mongo::LockerImpl")
+    if locker_type.IsValid():
+        return locker_type
 
-    gsc_list = exec_ctx.target.FindGlobalVariables("globalServiceContext", 1)
-    print(gsc_list)
-    gsc = gsc_list[0]
-    decorations = gsc.GetChildMemberWithName("_decorations")
-    registry = decorations.GetChildMemberWithName("_registry")
-    decoration_info = registry.GetChildMemberWithName("_decorationInfo")
-    decoration_data = decorations.GetChildMemberWithName("_decorationData").child[0]
+    return lldb_resolver.find_type(target, "mongo::Locker")
 
-    print(decoration_info.num_children)
-    for child in range(decoration_info.num_children):
-        di = decoration_info.children[child]
-        constructor = di.GetChildMemberWithName("constructor").__str__()
-        index = di.GetChildMemberWithName("descriptor").GetChildMemberWithName(
-            "_index").GetValueAsUnsigned()
 
-        type_name = constructor
-        type_name = type_name[0:len(type_name) - 1]
-        type_name = type_name[0:type_name.rindex(">")]
-        type_name = type_name[type_name.index("constructAt<"):].replace("constructAt<", "")
+def get_lock_requests(target, locker):
+    """Get a list of (ResourceId hash, mode, status) for the entries of a Locker's _requests map."""
+    locker_type = get_locker_type(target)
+    if locker == 0 or not locker_type.IsValid():
+        return []
 
-        # If the type is a pointer type, strip the * at the end.
-        if type_name.endswith('*'):
-            type_name = type_name[0:len(type_name) - 1]
-        type_name = type_name.rstrip()
+    value = target.CreateValueFromAddress("locker", target.ResolveLoadAddress(locker), locker_type)
+    entries = value.GetChildMemberWithName("_requests").GetChildMemberWithName("_fastAccess")
 
-        type_t = exec_ctx.target.FindTypes(type_name).GetTypeAtIndex(0)
-        offset_ptr = decoration_data.GetChildAtIndex(index, False, True)
+    requests = []
+    for entry in entries:
+        in_use = entry.GetChildMemberWithName("inUse")
+        if in_use.IsValid() and in_use.GetValueAsUnsigned(0) == 0:
+            continue
 
-        value = offset_ptr.Cast(type_t)
-        print(value)
+        request = entry.GetChildMemberWithName("value")
+        requests.append((entry.GetChildMemberWithName("key").GetChildMemberWithName("_fullHash").GetValueAsUnsigned(0),
+                         request.GetChildMemberWithName("mode").GetValue(),
+                         request.GetChildMemberWithName("status").GetValue()))
 
+    return requests
+
+
+def collect_snapshot_record(target, process, thread, opctx):
+    """Read the raw state of one thread's OperationContext, all the LLDB calls happen here."""
+    client = read_u64(process, get_member_address(target, OPERATION_CONTEXT, opctx, "_client"))
+    curop = find_curop(target, process, opctx)
+    locker = read_u64(process, get_member_address(target, OPERATION_CONTEXT, opctx, "_locker"))
+    locker_type_name = get_locker_type(target).GetName()
+
+    return {
+        "thread": thread.GetIndexID(),
+        "tid": thread.GetThreadID(),
+        "opctx": opctx,
+        "op_id": read_u64(process, get_member_address(target, OPERATION_CONTEXT, opctx, "_opId")),
+        "client": read_std_string(process, get_member_address(target, "mongo::Client", client, "_desc")),
+        "nss": read_std_string(process, get_member_address(target, "mongo::CurOp", curop, "_nss._data")),
+        "waiting": read_u64(process, get_member_address(target, locker_type_name, locker,
+                                                        "_waitingResource._fullHash")),
+        "requests": get_lock_requests(target, locker) if locker else [],
+    }
+
+
+def format_lock(full_hash, mode):
+    return "%s %s" % (lldb_printers_more.format_resource_id(full_hash), (mode or "?").replace("MODE_", ""))
+
+
+def decode_snapshot_record(record):
+    """Turn a raw record into printable columns, does not call into LLDB so it can run in a pool."""
+    held = [format_lock(h, mode) for (h, mode, status) in record["requests"] if status == "STATUS_GRANTED"]
+    waiting = [format_lock(h, mode) for (h, mode, status) in record["requests"]
+               if status in ("STATUS_WAITING", "STATUS_CONVERTING")]
+    if not waiting and record["waiting"]:
+        waiting = [lldb_printers_more.format_resource_id(record["waiting"])]
+
+    return {
+        "thread": record["thread"],
+        "tid": record["tid"],
+        "opctx": "0x%x" % record["opctx"],
+        "op_id": record["op_id"],
+        "client": record["client"].decode("utf-8", "replace") if record["client"] is not None else "",
+        "nss": lldb_printers_more.format_namespace_string(record["nss"]) if record["nss"] else "",
+        "held": held,
+        "waiting": waiting,
+    }
+
+
+def LockSnapshot(_debugger, command, exec_ctx, _result, _internal_dict):  # pylint: disable=invalid-name
+    """Print the OperationContext and locks of every thread."""
+
+    arg_strs = shlex.split(command)
+
+    parser = argparse.ArgumentParser(prog='mongodb-lock-snapshot',
+                                     description='Print the OperationContext and locks of every thread.')
+    parser.add_argument('--max-frames', type=int, default=64, help='Frames of each thread to search for an opCtx')
+    parser.add_argument('--jobs', type=int, help='Number of workers decoding the records')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args(arg_strs)
+
+    target = exec_ctx.target
+    process = exec_ctx.process
+
+    # SB API calls are not thread safe, so memory is read on this thread and only decoded in the pool
+    records = []
+    for thread in process.threads:
+        opctx = find_thread_opctx(thread, args.max_frames)
+        if opctx is not None:
+            records.append(collect_snapshot_record(target, process, thread, opctx))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        rows = list(pool.map(decode_snapshot_record, records))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print("%6s %8s %10s  %-30s %-40s %-30s %s" % ("Thread", "TID", "OpId", "Client", "Namespace", "Held",
+                                                   "Waiting"))
+    for row in rows:
+        print("%6d %8d %10s  %-30s %-40s %-30s %s" % (row["thread"], row["tid"],
+                                                       row["op_id"] if row["op_id"] is not None else "?",
+                                                       row["client"], row["nss"], ", ".join(row["held"]),
+                                                       ", ".join(row["waiting"])))
+    print("%d of %d threads have an OperationContext" % (len(rows), process.GetNumThreads()))
 
 
 def foo1():
@@ -101,12 +703,10 @@ def foo1():
 
 # Get address of symbol in file, not current local of global variable
 def global_symbol_address(target, name):
-    print("looking up:  " + name)
-    symbols = target.FindSymbols(name)
-    print("aaa"+ str(len(symbols)))
-    assert len(symbols) == 1
+    load_address = lldb_resolver.symbol_load_address(target, name)
+    assert load_address is not None, "Symbol not found: " + name
 
-    return symbols[0].symbol.addr.GetLoadAddress(target)
+    return load_address
 
 def get_symbol_value(target, name):
     load_address = global_symbol_address(target, name)
@@ -123,97 +723,414 @@ def get_symbol_value(target, name):
 def get_decorable_info(target, name):
 
     full_symbol = f"mongo::decorable_detail::gdbRegistry<{name}>"
-    type = target.FindFirstType("mongo::decorable_detail::Registry")
+    type = lldb_resolver.find_type(target, "mongo::decorable_detail::Registry")
 
     addr = target.ResolveLoadAddress( get_symbol_value(target, full_symbol))
 
     return target.CreateValueFromAddress("r1", addr, type)
 
 
-DEMANGLE_CACHE={}
+class DemangleCache:
+    """Process-wide, size-bounded LRU cache of demangled names.
+
+    Names are internal names like the ones from std::type_info, i.e. without the "_Z" prefix.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.names = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefilled_modules = set()
+        # Names being demangled in the background
+        self.pending = set()
+
+    def get(self, internal_name):
+        with self.lock:
+            full_name = self.names.get(internal_name)
+            if full_name is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.names.move_to_end(internal_name)
+            return full_name
+
+    def put(self, internal_name, full_name):
+        with self.lock:
+            self.names[internal_name] = full_name
+            self.names.move_to_end(internal_name)
+            while len(self.names) > self.max_size:
+                self.names.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.names.clear()
+            self.hits = 0
+            self.misses = 0
+            self.prefilled_modules.clear()
+
+    def stats(self):
+        return "size=%d/%d hits=%d misses=%d" % (len(self.names), self.max_size, self.hits, self.misses)
+
+
+DEMANGLE_CACHE = DemangleCache(int(os.environ.get("MONGODEV_DEMANGLE_CACHE_SIZE", 100000)))
+
+# Batches at least this large are demangled by a single c++filt process instead of one ctypes
+# call per name
+DEMANGLE_BATCH_MIN = 16
+
+
+def demangle_with_cxxfilt_process(internal_names):
+    """Demangle type names with one c++filt process, returns None if c++filt cannot be run."""
+    try:
+        proc = subprocess.run(["c++filt", "--types"], input="\n".join(internal_names), capture_output=True,
+                              text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    full_names = proc.stdout.splitlines()
+    if len(full_names) != len(internal_names):
+        return None
+
+    return full_names
+
+
+def demangle_into_cache(internal_names):
+    """Demangle a list of names not in the cache and add them, returns the list of demangled names."""
+    full_names = None
+    if len(internal_names) >= DEMANGLE_BATCH_MIN:
+        full_names = demangle_with_cxxfilt_process(internal_names)
+
+    if full_names is None:
+        # internal names like ones from typeInfo do not have the prefix "_ZN", just "N"
+        full_names = [cxxfilt.demangle(n, external_only=False) for n in internal_names]
+
+    for internal_name, full_name in zip(internal_names, full_names):
+        DEMANGLE_CACHE.put(internal_name, full_name)
+
+    return full_names
+
+
+def start_demangle(internal_names):
+    """Demangle names into the cache in a background thread, skipping ones already in progress."""
+    with DEMANGLE_CACHE.lock:
+        names = [n for n in internal_names if n not in DEMANGLE_CACHE.pending]
+        DEMANGLE_CACHE.pending.update(names)
+
+    if not names:
+        return
+
+    def run():
+        try:
+            demangle_into_cache(names)
+        finally:
+            with DEMANGLE_CACHE.lock:
+                DEMANGLE_CACHE.pending.difference_update(names)
+
+    threading.Thread(target=run, name="mongodev-demangle", daemon=True).start()
+
+
+def demangle_batch(internal_names, wait=True):
+    """Demangle a list of internal names, returns (list of demangled names, True if all were demangled).
+
+    With wait=False names not in the cache are returned as they are and demangled in a background
+    thread, so a later call finds them in the cache.
+    """
+    results = {}
+    misses = []
+    for internal_name in internal_names:
+        full_name = DEMANGLE_CACHE.get(internal_name)
+        if full_name is None:
+            misses.append(internal_name)
+        else:
+            results[internal_name] = full_name
+
+    misses = list(dict.fromkeys(misses))
+
+    if misses and not wait:
+        start_demangle(misses)
+        return ([results.get(n, n) for n in internal_names], False)
+
+    results.update(zip(misses, demangle_into_cache(misses)))
+
+    return ([results[n] for n in internal_names], True)
+
 
 def demangle(internal_name):
-    global DEMANGLE_CACHE
+    return demangle_batch([internal_name])[0][0]
+
+
+# Prefix of the mangled symbol for the std::type_info name of a type
+TYPEINFO_NAME_PREFIX = "_ZTS"
+
+
+def read_typeinfo_names(file_name):
+    """Get the internal names of the types with a type_info name symbol in a binary, read with nm."""
+    names = []
+    try:
+        with subprocess.Popen(["nm", "--defined-only", "--format=posix", file_name], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True) as proc:
+            for line in proc.stdout:
+                if line.startswith(TYPEINFO_NAME_PREFIX):
+                    names.append(line.split(" ", 1)[0][len(TYPEINFO_NAME_PREFIX):])
+    except OSError:
+        return []
+
+    return names
+
+
+def prefill_demangle_cache(file_name):
+    """Demangle the type_info names of all types in a binary with c++filt.
+
+    Runs in a background thread, so it only uses the binary's file and never the SB API.
+    """
+    names = read_typeinfo_names(file_name)
+
+    # Keep the most recent entries in the cache when there are more names than fit
+    names = names[-DEMANGLE_CACHE.max_size:]
+    for i in range(0, len(names), 1000):
+        batch = names[i:i + 1000]
+        full_names = demangle_with_cxxfilt_process(batch)
+        if full_names is None:
+            return
+
+        for internal_name, full_name in zip(batch, full_names):
+            DEMANGLE_CACHE.put(internal_name, full_name)
+
+
+def start_demangle_prefill(module):
+    """Prefill the demangle cache for a module in a background thread, once per module."""
+    uuid = module.GetUUIDString()
+    with DEMANGLE_CACHE.lock:
+        if uuid in DEMANGLE_CACHE.prefilled_modules:
+            return
+        DEMANGLE_CACHE.prefilled_modules.add(uuid)
+
+    thread = threading.Thread(target=prefill_demangle_cache, args=(module.GetFileSpec().fullpath,),
+                              name="mongodev-demangle", daemon=True)
+    thread.start()
+
+
+# Decorable registry layouts, keyed by (executable module UUID, decorable type name).
+#
+# The layout is a list of (type name, offset) tuples. Type names and offsets only change when the
+# binary is rebuilt, so keying on the module UUID lets us reuse them across runs of the same
+# executable and drops them when the executable changes.
+DECORABLE_LAYOUT_CACHE = {}
+
+# Last seen module UUID for each executable, used to evict layouts of a rebuilt executable
+DECORABLE_MODULE_UUIDS = {}
+
+# Registries read while their type names were still being demangled, keyed like
+# DECORABLE_LAYOUT_CACHE, so the next lookup does not read them again
+PENDING_DECORABLE_REGISTRIES = {}
+
+# Set to persist layouts to a file next to the executable so later debug sessions start warm
+PERSIST_DECORABLE_CACHE = os.environ.get("MONGODEV_PERSIST_DECORABLE_CACHE", "0") == "1"
+
+DECORABLE_CACHE_SUFFIX = ".mongodev_decorables.json"
+
+
+def get_module_uuid(target):
+    module = lldb_resolver.get_executable_module(target)
+    start_demangle_prefill(module)
+    return module.GetUUIDString()
+
+
+def get_dec_cache_file(target):
+    exe = target.GetExecutable()
+    return os.path.join(exe.GetDirectory(), exe.GetFilename() + DECORABLE_CACHE_SUFFIX)
 
-    if internal_name in DEMANGLE_CACHE:
-        return DEMANGLE_CACHE[internal_name]
 
-    # internal names like ones from typeInfo do not have the prefix "_ZN", just "N"
-    full_name = cxxfilt.demangle(internal_name, external_only=False)
+def save_dec_cache(target):
+    """Save the layouts for the target's executable to a file beside the binary."""
+    uuid = get_module_uuid(target)
+    layouts = {name: layout for (u, name), layout in DECORABLE_LAYOUT_CACHE.items() if u == uuid}
 
-    DEMANGLE_CACHE[internal_name] = full_name
+    file_name = get_dec_cache_file(target)
+    with open(file_name, "w") as wfh:
+        json.dump({"uuid": uuid, "layouts": layouts}, wfh)
 
-    return full_name
+    return file_name
 
-# TODO - Cache
-def get_dec_list(target, name):
 
+def load_dec_cache(target):
+    """Load layouts saved for the target's executable, returns the number of layouts loaded."""
+    file_name = get_dec_cache_file(target)
+    if not os.path.exists(file_name):
+        return 0
+
+    try:
+        with open(file_name) as rfh:
+            data = json.load(rfh)
+    except (OSError, ValueError) as e:
+        print("Ignoring bad decorable cache file %s: %s" % (file_name, e))
+        return 0
+
+    # The binary was rebuilt since the file was written
+    uuid = get_module_uuid(target)
+    if data.get("uuid") != uuid:
+        return 0
+
+    for name, layout in data["layouts"].items():
+        DECORABLE_LAYOUT_CACHE[(uuid, name)] = [tuple(d) for d in layout]
+
+    return len(data["layouts"])
+
+
+def read_dec_registry(target, name):
+    """Get (list of mangled type names, list of offsets) from the registry of a Decorable type."""
 
     di = get_decorable_info(target, name)
 
     entries = di.GetChildMemberWithName("_entries")
     # print(len(entries))
-    el = []
-    c = 0
+    names = []
+    offsets = []
     for i in range(len(entries)):
-
-        # if c >= 5:
-        #     break
-        c += 1
         e = entries.GetChildAtIndex(i)
 
         ti = e.GetChildMemberWithName("_typeInfo")
-        off = e.GetChildMemberWithName("_offset").GetValueAsUnsigned()
+        offsets.append(e.GetChildMemberWithName("_offset").GetValueAsUnsigned())
         # Strings are quoted with ""
-        n = ti.GetChildMemberWithName("__name").GetSummary().replace('"', '')
+        names.append(ti.GetChildMemberWithName("__name").GetSummary().replace('"', ''))
+
+    return (names, offsets)
+
+
+def get_dec_list(target, name, wait=True):
+    """Get the list of (type name, offset) decorations for a Decorable type, cached per module.
+
+    With wait=False the type names may still be mangled, see demangle_batch. Such a list is not
+    cached, so the next call returns the demangled names.
+    """
+    uuid = get_module_uuid(target)
+    key = (uuid, name)
+
+    el = DECORABLE_LAYOUT_CACHE.get(key)
+    if el is not None:
+        return el
+
+    if PERSIST_DECORABLE_CACHE and load_dec_cache(target):
+        el = DECORABLE_LAYOUT_CACHE.get(key)
+        if el is not None:
+            return el
 
-        n = demangle(n)
+    registry = PENDING_DECORABLE_REGISTRIES.pop(key, None) or read_dec_registry(target, name)
+    (full_names, complete) = demangle_batch(registry[0], wait)
+    el = list(zip(full_names, registry[1]))
 
-        el.append((n, off))
+    # The registry is filled in by static initializers, do not cache it before they have run
+    if not el:
+        return el
+
+    if not complete:
+        PENDING_DECORABLE_REGISTRIES[key] = registry
+        return el
+
+    # Drop layouts from previous builds of the executable
+    exe_path = target.GetExecutable().fullpath
+    old_uuid = DECORABLE_MODULE_UUIDS.get(exe_path)
+    if old_uuid is not None and old_uuid != uuid:
+        for stale in [k for k in DECORABLE_LAYOUT_CACHE if k[0] == old_uuid]:
+            del DECORABLE_LAYOUT_CACHE[stale]
+    DECORABLE_MODULE_UUIDS[exe_path] = uuid
+
+    DECORABLE_LAYOUT_CACHE[key] = el
+
+    if PERSIST_DECORABLE_CACHE:
+        try:
+            save_dec_cache(target)
+        except OSError as e:
+            print("Failed to save decorable cache: %s" % e)
 
     return el
 
 
-# mongo::Decorable<mongo::ServiceContext>
+def get_decorable_type_name(valobj):
+    """Get the name of T in mongo::Decorable<T>."""
+    decorable_type = valobj.GetType().GetCanonicalType()
+    if decorable_type.GetNumberOfTemplateArguments() > 0:
+        return decorable_type.GetTemplateArgumentType(0).GetName()
 
+    # Fallback to parsing the type name
+    type_name = decorable_type.GetName()
+    return type_name[type_name.index("<") + 1:type_name.rindex(">")].strip()
 
 
+# mongo::Decorable<mongo::ServiceContext>
 class DecorablePrinter:
-    """Pretty printer for absl::container_internal::raw_hash_set."""
+    """Synthetic children provider for mongo::Decorable<T>.
+
+    Children are only materialized when LLDB asks for a specific index. It runs on every stop,
+    so on a cold demangle cache it shows the mangled type names until the next stop instead of
+    waiting for them to be demangled.
+    """
 
     def __init__(self, valobj, *_args):
-        """Store the valobj and get the value of the hash_set."""
+        """Store the valobj and the name of the decorable type."""
         self.valobj = valobj
-        self.decs = get_dec_list(valobj.target, "mongo::ServiceContext")
-        print("decs: " + str(len(self.decs)))
+        self.target = valobj.target
+        self.decorable_name = get_decorable_type_name(valobj)
+        self.children = {}
+        self.child_indexes = None
+        self.data = None
+        self.decorations = None
+
+    def update(self):
+        """Drop children from the last stop, the layout itself comes from the cache."""
+        self.children = {}
+        self.child_indexes = None
+        self.data = None
+        self.decorations = None
+
+    def decs(self):
+        if self.decorations is None:
+            self.decorations = get_dec_list(self.target, self.decorable_name, wait=False)
+        return self.decorations
 
     def num_children(self):  # pylint: no-method-argument
         """Match LLDB's expected API."""
-        return len(self.decs)
+        return len(self.decs())
 
     def get_child_index(self, name):  # pylint: disable=no-self-use,no-method-argument
         """Match LLDB's expected API."""
-        return None
+        if self.child_indexes is None:
+            self.child_indexes = {d[0]: i for i, d in enumerate(self.decs())}
+
+        return self.child_indexes.get(name)
 
     def get_child_at_index(self, index):  # pylint: disable=no-self-use,no-method-argument
-        d1 = self.decs[index]
+        """Match LLDB's expected API."""
+        v = self.children.get(index)
+        if v is not None:
+            return v
 
-        target = self.valobj.target
+        decs = self.decs()
+        if index < 0 or index >= len(decs):
+            return None
 
-        type_obj = target.FindFirstType(d1[0])
-        # print("ttt" + str(type_obj))
-        # print("add:", type_obj.__class__)
+        (type_name, offset) = decs[index]
 
-        addr = target.ResolveLoadAddress(self.valobj.addr.GetLoadAddress(self.valobj.target) + d1[1])
-        # print("add:", addr.__class__)
+        type_obj = lldb_resolver.find_type(self.target, type_name)
 
-        v = target.CreateValueFromAddress(d1[0], addr , type_obj)
-        # print("vvvv:" + str(v))
+        if self.data is None:
+            self.data = get_decoration_data(self.target, self.valobj.GetProcess(),
+                                            self.valobj.GetType().GetCanonicalType().GetName(),
+                                            self.valobj.GetLoadAddress())
+            if self.data is None:
+                return None
 
-        return v
+        addr = self.target.ResolveLoadAddress(self.data + offset)
+
+        v = self.target.CreateValueFromAddress(type_name, addr, type_obj)
+        self.children[index] = v
 
+        return v
 
-    def has_children():  # pylint: disable=no-self-use,no-method-argument
+    def has_children(self):  # pylint: disable=no-self-use,no-method-argument
         """Match LLDB's expected API."""
         return True
 
@@ -0,0 +1,810 @@
+"""Stand-in for the lldb module that replays a recorded memory and type snapshot.
+
+Used by lldb_bench.py to run the printers and commands without a debugger. Only the parts of the
+SB API used by lldb_printers_more.py, lldb_commands_more.py and lldb_resolver.py are provided.
+
+Every SB API call is counted in CALLS and can be slowed down by LATENCY seconds, or READ_LATENCY
+seconds for ReadMemory, to simulate a remote lldb-dap connection.
+
+A snapshot is a dict, usually loaded from JSON:
+
+    {
+        "executable": "/path/to/mongod",
+        "uuid": "...",
+        "memory": [{"address": 4096, "data": "<base64>"}],
+        "types": {"mongo::OID": {"kind": "struct", "size": 12,
+                                 "fields": [{"name": "_oid", "type": "unsigned char[12]", "offset": 0}]}},
+        "symbols": {"mongo::decorable_detail::gdbRegistry<mongo::ServiceContext>": 8192},
+        "globals": {"globalServiceContext": {"type": "mongo::ServiceContext *", "address": 8200}},
+        "values": {"mongo::OID": [12288, 12300]}
+    }
+
+Type kinds are "basic" (size, signed), "struct" (size, fields, bases, template_args), "vector"
+(element, laid out like a libstdc++ std::vector) and "array" (element, count). Pointer types are
+named "<pointee> *" and array types "<element>[<count>]", both are created on demand.
+"""
+
+import base64
+import bisect
+import collections
+import functools
+import re
+import sys
+import time
+
+LLDB_INVALID_ADDRESS = 0xffffffffffffffff
+
+eByteOrderLittle = 4  # pylint: disable=invalid-name
+eBasicTypeInvalid = 0  # pylint: disable=invalid-name
+eStopReasonSignal = 5  # pylint: disable=invalid-name
+
+# Number of calls of each SB API method
+CALLS = collections.Counter()
+
+# Bytes returned by ReadMemory
+BYTES_READ = [0]
+
+# Seconds added to every SB API call, and to every ReadMemory call
+LATENCY = 0.0
+READ_LATENCY = 0.0
+
+# The snapshot being replayed, see load_snapshot
+SNAPSHOT = None
+
+# Summary function names by type name, and (type name, is regex, class name) of the synthetic
+# providers, registered with "type summary/synthetic add"
+SUMMARIES = {}
+SYNTHETICS = []
+
+
+def sb_call(func):
+    """Count a call of an SB API method and add the configured latency."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        CALLS[name] += 1
+        if LATENCY:
+            time.sleep(LATENCY)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def lookup(qualified_name):
+    """Get module.name from an imported module, at call time like LLDB."""
+    (module, name) = qualified_name.rsplit(".", 1)
+    return getattr(sys.modules[module], name)
+
+
+def reset_stats():
+    CALLS.clear()
+    BYTES_READ[0] = 0
+
+
+class Snapshot:
+    """Memory, types and symbols of a stopped process."""
+
+    def __init__(self, data):
+        self.executable = data.get("executable", "/fake/mongod")
+        self.uuid = data.get("uuid", "00000000-0000-0000-0000-000000000000")
+        regions = sorted((r["address"], base64.b64decode(r["data"])) for r in data.get("memory", []))
+        self.region_starts = [start for (start, _) in regions]
+        self.regions = regions
+        self.types = data.get("types", {})
+        self.symbols = data.get("symbols", {})
+        self.globals = data.get("globals", {})
+        self.values = data.get("values", {})
+
+    def read(self, addr, size):
+        i = bisect.bisect_right(self.region_starts, addr) - 1
+        if i < 0:
+            return None
+
+        (start, buf) = self.regions[i]
+        if addr + size > start + len(buf):
+            return None
+
+        return buf[addr - start:addr - start + size]
+
+
+def load_snapshot(data):
+    global SNAPSHOT  # pylint: disable=global-statement
+    SNAPSHOT = Snapshot(data)
+    get_type.cache_clear()
+    return SNAPSHOT
+
+
+class SBError:
+
+    def __init__(self, message=None):
+        self.message = message
+
+    def Success(self):
+        return self.message is None
+
+    def Fail(self):
+        return self.message is not None
+
+    def SetErrorString(self, message):
+        self.message = message
+
+    def GetCString(self):
+        return self.message
+
+
+class SBFileSpec:
+
+    def __init__(self, path):
+        self.fullpath = path
+
+    def GetDirectory(self):
+        return self.fullpath.rsplit("/", 1)[0]
+
+    def GetFilename(self):
+        return self.fullpath.rsplit("/", 1)[-1]
+
+
+class SBAddress:
+    """Snapshots are not relocated, so file and load addresses are the same."""
+
+    def __init__(self, addr):
+        self.addr = addr
+
+    @property
+    def load_addr(self):
+        return self.addr
+
+    @sb_call
+    def GetLoadAddress(self, _target=None):
+        return self.addr
+
+    @sb_call
+    def GetFileAddress(self):
+        return self.addr
+
+    @sb_call
+    def GetModule(self):
+        return SBModule()
+
+
+class SBSymbol:
+
+    def __init__(self, name, addr):
+        self.name = name
+        self.addr = SBAddress(addr)
+
+    @sb_call
+    def GetStartAddress(self):
+        return self.addr
+
+    def GetMangledName(self):
+        return self.name
+
+
+class SBSymbolContext:
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+class SBModule:
+    """The snapshot's executable, the only module."""
+
+    def IsValid(self):
+        return True
+
+    @sb_call
+    def GetFileSpec(self):
+        return SBFileSpec(SNAPSHOT.executable)
+
+    @sb_call
+    def GetUUIDString(self):
+        return SNAPSHOT.uuid
+
+    @sb_call
+    def ResolveFileAddress(self, addr):
+        return SBAddress(addr)
+
+    @sb_call
+    def GetNumSymbols(self):
+        return 0
+
+    def GetSymbolAtIndex(self, _index):
+        return None
+
+
+class SBTypeMember:
+
+    def __init__(self, name, type_obj, offset):
+        self.name = name
+        self.type = type_obj
+        self.offset = offset
+
+    @sb_call
+    def GetName(self):
+        return self.name
+
+    @sb_call
+    def GetType(self):
+        return self.type
+
+    @sb_call
+    def GetOffsetInBytes(self):
+        return self.offset
+
+
+@functools.lru_cache(maxsize=None)
+def get_type(name):
+    """Get the SBType for a type name, an invalid SBType if it is not in the snapshot."""
+    name = name.strip()
+    if name.startswith("const "):
+        name = name[len("const "):]
+
+    if name.endswith("*"):
+        return SBType(name, {"kind": "pointer", "size": 8, "pointee": name[:-1].strip()})
+
+    m = re.match(r"^(.*)\[(\d+)\]$", name)
+    if m is not None:
+        return SBType(name, {"kind": "array", "element": m.group(1), "count": int(m.group(2))})
+
+    spec = SNAPSHOT.types.get(name)
+    if spec is None:
+        return SBType(name, None)
+
+    return SBType(name, spec)
+
+
+class SBType:
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+
+    def kind(self):
+        return self.spec["kind"] if self.spec is not None else None
+
+    def IsValid(self):
+        return self.spec is not None
+
+    @sb_call
+    def GetName(self):
+        return self.name
+
+    @sb_call
+    def GetCanonicalType(self):
+        return self
+
+    @sb_call
+    def GetUnqualifiedType(self):
+        return self
+
+    @sb_call
+    def GetByteSize(self):
+        if self.kind() == "array":
+            return get_type(self.spec["element"]).GetByteSize() * self.spec["count"]
+        if self.kind() == "vector":
+            return 24
+        return self.spec["size"] if self.spec is not None else 0
+
+    @sb_call
+    def IsPointerType(self):
+        return self.kind() == "pointer"
+
+    @sb_call
+    def IsReferenceType(self):
+        return False
+
+    @sb_call
+    def GetPointeeType(self):
+        return get_type(self.spec["pointee"])
+
+    @sb_call
+    def GetDereferencedType(self):
+        return self
+
+    @sb_call
+    def GetArrayElementType(self):
+        return get_type(self.spec["element"])
+
+    @sb_call
+    def GetBasicType(self):
+        return 1 if self.kind() == "basic" else eBasicTypeInvalid
+
+    @sb_call
+    def GetNumberOfFields(self):
+        return len(self.spec.get("fields", [])) if self.kind() == "struct" else 0
+
+    @sb_call
+    def GetFieldAtIndex(self, index):
+        field = self.spec["fields"][index]
+        return SBTypeMember(field["name"], get_type(field["type"]), field["offset"])
+
+    @sb_call
+    def GetNumberOfDirectBaseClasses(self):
+        return len(self.spec.get("bases", [])) if self.kind() == "struct" else 0
+
+    @sb_call
+    def GetDirectBaseClassAtIndex(self, index):
+        base = self.spec["bases"][index]
+        return SBTypeMember(base["type"], get_type(base["type"]), base["offset"])
+
+    @sb_call
+    def GetNumberOfTemplateArguments(self):
+        return len(self.spec.get("template_args", [])) if self.spec is not None else 0
+
+    @sb_call
+    def GetTemplateArgumentType(self, index):
+        return get_type(self.spec["template_args"][index])
+
+
+class SBTypeList:
+
+    def __init__(self, types):
+        self.types = types
+
+    def GetSize(self):
+        return len(self.types)
+
+    def GetTypeAtIndex(self, index):
+        return self.types[index] if index < len(self.types) else SBType("", None)
+
+
+class SBData:
+
+    def __init__(self):
+        self.data = b""
+
+    def SetData(self, _error, data, _byte_order, _address_size):
+        self.data = bytes(data)
+
+
+class SBValue:
+    """A value in the snapshot's memory, or in a buffer for values created from data."""
+
+    def __init__(self, target, name, type_obj, addr, data=None, error=None):
+        self.target = target
+        self.name = name
+        self.type = type_obj
+        self.address = addr
+        self.data = data
+        self.error = error
+
+    @property
+    def process(self):
+        return self.target.process
+
+    @property
+    def addr(self):
+        return SBAddress(self.address)
+
+    def raw(self, offset, size):
+        if self.data is not None:
+            return self.data[offset:offset + size]
+        return self.target.process.read(self.address + offset, size)
+
+    def child(self, name, type_obj, offset):
+        if self.data is not None:
+            return SBValue(self.target, name, type_obj, LLDB_INVALID_ADDRESS,
+                           data=self.data[offset:offset + type_obj.GetByteSize()])
+        return SBValue(self.target, name, type_obj, self.address + offset)
+
+    def integer(self):
+        kind = self.type.kind()
+        if kind not in ("basic", "pointer"):
+            return None
+        buf = self.raw(0, self.type.spec["size"])
+        if buf is None or len(buf) != self.type.spec["size"]:
+            return None
+        return int.from_bytes(buf, "little", signed=self.type.spec.get("signed", False))
+
+    def pointee(self):
+        ptr = self.integer()
+        if not ptr:
+            return SBValue(self.target, self.name, SBType("", None), 0, error="null pointer")
+        return SBValue(self.target, "*" + self.name, self.type.GetPointeeType(), ptr)
+
+    def find_member(self, name):
+        """Find a field of a struct value or of its bases, following pointers like LLDB does."""
+        if self.type.kind() == "pointer":
+            return self.pointee().find_member(name)
+
+        if self.type.kind() != "struct":
+            return None
+
+        for field in self.type.spec.get("fields", []):
+            if field["name"] == name:
+                return self.child(name, get_type(field["type"]), field["offset"])
+
+        for base in self.type.spec.get("bases", []):
+            found = self.child(base["type"], get_type(base["type"]), base["offset"]).find_member(name)
+            if found is not None:
+                return found
+
+        return None
+
+    def children(self):
+        kind = self.type.kind()
+        if kind == "struct":
+            return [(b["type"], get_type(b["type"]), b["offset"]) for b in self.type.spec.get("bases", [])] + \
+                [(f["name"], get_type(f["type"]), f["offset"]) for f in self.type.spec.get("fields", [])]
+
+        if kind == "array":
+            element = get_type(self.type.spec["element"])
+            return [("[%d]" % i, element, i * element.GetByteSize()) for i in range(self.type.spec["count"])]
+
+        if kind == "vector":
+            element = get_type(self.type.spec["element"])
+            buf = self.raw(0, 16)
+            if buf is None:
+                return []
+            start = int.from_bytes(buf[0:8], "little")
+            finish = int.from_bytes(buf[8:16], "little")
+            count = (finish - start) // element.GetByteSize()
+            # Elements are not inside the vector, so offsets are relative to the vector's address
+            return [("[%d]" % i, element, start - self.address + i * element.GetByteSize()) for i in range(count)]
+
+        return []
+
+    def IsValid(self):
+        return self.type is not None and self.type.IsValid()
+
+    @sb_call
+    def GetError(self):
+        return SBError(self.error)
+
+    @sb_call
+    def GetName(self):
+        return self.name
+
+    @sb_call
+    def GetType(self):
+        return self.type
+
+    @sb_call
+    def GetTarget(self):
+        return self.target
+
+    @sb_call
+    def GetProcess(self):
+        return self.target.process
+
+    @sb_call
+    def GetLoadAddress(self):
+        return self.address
+
+    @sb_call
+    def GetAddress(self):
+        return SBAddress(self.address)
+
+    @sb_call
+    def GetByteSize(self):
+        return self.type.GetByteSize()
+
+    @sb_call
+    def GetValueAsUnsigned(self, default=0):
+        value = self.integer()
+        if value is None:
+            return default
+        return value & 0xffffffffffffffff
+
+    @sb_call
+    def GetValueAsSigned(self, default=0):
+        value = self.integer()
+        if value is None:
+            return default
+        return value - (1 << 64) if value >= (1 << 63) else value
+
+    @sb_call
+    def GetValue(self):
+        value = self.integer()
+        if value is None:
+            return None
+        return hex(value) if self.type.kind() == "pointer" else str(value)
+
+    @sb_call
+    def GetSummary(self):
+        summary = SUMMARIES.get(self.type.GetName())
+        if summary is not None:
+            return lookup(summary)(self, None)
+
+        if self.type.kind() == "pointer" and self.type.spec["pointee"] in ("char", "const char"):
+            # C strings
+            ptr = self.integer()
+            buf = self.target.process.read(ptr, 256) if ptr else None
+            if buf is None:
+                return None
+            return '"%s"' % buf.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+        return None
+
+    @sb_call
+    def GetChildMemberWithName(self, name):
+        found = self.find_member(name)
+        if found is None:
+            return SBValue(self.target, name, SBType(name, None), LLDB_INVALID_ADDRESS, error="no member")
+        return found
+
+    @sb_call
+    def GetNumChildren(self, max_children=None):
+        count = len(self.children())
+        return count if max_children is None else min(count, max_children)
+
+    @sb_call
+    def GetChildAtIndex(self, index, *_args):
+        children = self.children()
+        if index < 0 or index >= len(children):
+            return SBValue(self.target, "", SBType("", None), LLDB_INVALID_ADDRESS, error="no child")
+        (name, type_obj, offset) = children[index]
+        return self.child(name, type_obj, offset)
+
+    @sb_call
+    def Dereference(self):
+        return self.pointee()
+
+    @sb_call
+    def Cast(self, type_obj):
+        return SBValue(self.target, self.name, type_obj, self.address, data=self.data)
+
+    @sb_call
+    def CreateValueFromData(self, name, data, type_obj):
+        return SBValue(self.target, name, type_obj, LLDB_INVALID_ADDRESS, data=data.data)
+
+    def __len__(self):
+        return self.GetNumChildren()
+
+    def __iter__(self):
+        return (self.GetChildAtIndex(i) for i in range(self.GetNumChildren()))
+
+
+class SBValueList:
+
+    def __init__(self, values):
+        self.values = values
+
+    def GetSize(self):
+        return len(self.values)
+
+    def GetValueAtIndex(self, index):
+        return self.values[index]
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+
+class SBProcess:
+
+    def __init__(self, target):
+        self.target = target
+        self.stop_id = 1
+
+    def resume(self):
+        """Simulate a step, caches keyed on the stop ID are dropped."""
+        self.stop_id += 1
+
+    def read(self, addr, size):
+        """Read memory without counting an SB call."""
+        return SNAPSHOT.read(addr, size)
+
+    @property
+    def threads(self):
+        return []
+
+    @sb_call
+    def GetNumThreads(self):
+        return 0
+
+    @sb_call
+    def GetUniqueID(self):
+        return 1
+
+    @sb_call
+    def GetStopID(self):
+        return self.stop_id
+
+    @sb_call
+    def ReadMemory(self, addr, size, error):
+        if READ_LATENCY:
+            time.sleep(READ_LATENCY)
+
+        buf = SNAPSHOT.read(addr, size)
+        if buf is None:
+            error.SetErrorString("memory read failed for 0x%x" % addr)
+            return None
+
+        BYTES_READ[0] += len(buf)
+        return buf
+
+    @sb_call
+    def ReadPointerFromMemory(self, addr, error):
+        buf = self.ReadMemory(addr, 8, error)
+        return int.from_bytes(buf, "little") if buf is not None else 0
+
+
+class SBTarget:
+
+    def __init__(self):
+        self.process = SBProcess(self)
+        self.module = SBModule()
+
+    @sb_call
+    def GetProcess(self):
+        return self.process
+
+    @sb_call
+    def GetExecutable(self):
+        return SBFileSpec(SNAPSHOT.executable)
+
+    @sb_call
+    def FindModule(self, _file_spec):
+        return self.module
+
+    @sb_call
+    def GetByteOrder(self):
+        return eByteOrderLittle
+
+    @sb_call
+    def GetAddressByteSize(self):
+        return 8
+
+    @sb_call
+    def FindFirstType(self, name):
+        return get_type(name)
+
+    @sb_call
+    def FindTypes(self, name):
+        type_obj = get_type(name)
+        return SBTypeList([type_obj] if type_obj.IsValid() else [])
+
+    @sb_call
+    def FindSymbols(self, name):
+        addr = SNAPSHOT.symbols.get(name)
+        return [] if addr is None else [SBSymbolContext(SBSymbol(name, addr))]
+
+    @sb_call
+    def FindGlobalVariables(self, name, _max_matches):
+        variable = SNAPSHOT.globals.get(name)
+        if variable is None:
+            return SBValueList([])
+        return SBValueList([SBValue(self, name, get_type(variable["type"]), variable["address"])])
+
+    @sb_call
+    def ResolveLoadAddress(self, addr):
+        return SBAddress(addr)
+
+    @sb_call
+    def CreateValueFromAddress(self, name, addr, type_obj):
+        return SBValue(self, name, type_obj, addr.addr)
+
+    @sb_call
+    def EvaluateExpression(self, expression):
+        try:
+            return SBValue(self, expression, get_type("unsigned long"), LLDB_INVALID_ADDRESS,
+                           data=int(expression, 0).to_bytes(8, "little"))
+        except ValueError:
+            return SBValue(self, expression, SBType("", None), LLDB_INVALID_ADDRESS,
+                           error="expressions are not supported")
+
+
+class SBFrame:
+    """A frame whose only variables are the snapshot's globals."""
+
+    def __init__(self, target):
+        self.target = target
+
+    def IsValid(self):
+        return True
+
+    @sb_call
+    def FindVariable(self, name):
+        return self.GetValueForVariablePath(name)
+
+    @sb_call
+    def GetValueForVariablePath(self, path):
+        variables = self.target.FindGlobalVariables(path, 1)
+        if variables.GetSize() == 0:
+            return SBValue(self.target, path, SBType("", None), LLDB_INVALID_ADDRESS, error="no variable")
+        return variables.GetValueAtIndex(0)
+
+    @sb_call
+    def EvaluateExpression(self, expression):
+        return self.target.EvaluateExpression(expression)
+
+
+class SBExecutionContext:
+
+    def __init__(self, target):
+        self.target = target
+        self.process = target.process
+        self.frame = SBFrame(target)
+
+
+class SBTypeNameSpecifier:
+
+    def __init__(self, name, is_regex=False):
+        self.name = name
+        self.is_regex = is_regex
+
+    def GetName(self):
+        return self.name
+
+    def IsRegex(self):
+        return self.is_regex
+
+
+class SBTypeSummary:
+
+    def __init__(self, function):
+        self.function = function
+
+    @staticmethod
+    def CreateWithFunctionName(function, _options=0):
+        return SBTypeSummary(function)
+
+    def IsFunctionName(self):
+        return True
+
+    def GetData(self):
+        return self.function
+
+    def GetOptions(self):
+        return 0
+
+
+class SBTypeSynthetic:
+
+    def __init__(self, cls):
+        self.cls = cls
+
+    def IsClassName(self):
+        return True
+
+    def GetData(self):
+        return self.cls
+
+
+class SBTypeCategory:
+    """The default category, backed by SUMMARIES and SYNTHETICS."""
+
+    def GetNumSummaries(self):
+        return len(SUMMARIES)
+
+    def GetSummaryAtIndex(self, index):
+        return SBTypeSummary(list(SUMMARIES.values())[index])
+
+    def GetTypeNameSpecifierForSummaryAtIndex(self, index):
+        return SBTypeNameSpecifier(list(SUMMARIES)[index])
+
+    def AddTypeSummary(self, type_name, summary):
+        SUMMARIES[type_name.GetName()] = summary.GetData()
+        return True
+
+    def GetNumSynthetics(self):
+        return len(SYNTHETICS)
+
+    def GetSyntheticAtIndex(self, index):
+        return SBTypeSynthetic(SYNTHETICS[index][2])
+
+
+class SBDebugger:
+    """Records the formatters registered by __lldb_init_module."""
+
+    SUMMARY_ADD = re.compile(r"^type summary add (?P<type>\S+) -F (?P<function>[\w.]+)")
+    SYNTHETIC_ADD = re.compile(r"^type synthetic add (?P<regex>-x )?'?(?P<type>[^' ]+)'? --python-class (?P<cls>[\w.]+)")
+
+    def __init__(self):
+        self.commands = []
+
+    def GetDefaultCategory(self):
+        return SBTypeCategory()
+
+    def HandleCommand(self, command):
+        self.commands.append(command)
+
+        m = self.SUMMARY_ADD.match(command)
+        if m is not None:
+            SUMMARIES[m.group("type")] = m.group("function")
+
+        m = self.SYNTHETIC_ADD.match(command)
+        if m is not None:
+            SYNTHETICS.append((m.group("type"), m.group("regex") is not None, m.group("cls")))
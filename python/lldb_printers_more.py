@@ -11,6 +11,7 @@ from __future__ import print_function
 
 import base64
 import bson
+import os
 import string
 import struct
 import sys
@@ -18,6 +19,9 @@ import uuid
 
 import lldb
 
+import lldb_profiler
+import lldb_resolver
+
 # try:
 #     import bson
 #     import collections
@@ -46,6 +50,106 @@ import lldb
 #
 
 
+################
+# Memory Reads #
+################
+
+# Memory is read in whole pages so that the printers for adjacent objects (i.e. the elements of a
+# std::vector) share a single ReadMemory call. This matters for lldb-dap over a remote connection
+# where each ReadMemory is a packet round-trip.
+PAGE_SIZE = 4096
+
+
+class MemoryCache:
+    """Page-granular cache of process memory that is valid for a single stop."""
+
+    def __init__(self):
+        self.process_id = None
+        self.stop_id = None
+        self.pages = {}
+
+    def check_stop(self, process):
+        """Drop all pages if the process has resumed since they were read."""
+        process_id = process.GetUniqueID()
+        stop_id = process.GetStopID()
+        if process_id != self.process_id or stop_id != self.stop_id:
+            self.process_id = process_id
+            self.stop_id = stop_id
+            self.pages = {}
+
+    def load_pages(self, process, first_page, last_page):
+        """Read all missing pages in [first_page, last_page] with one ReadMemory call."""
+        missing = [p for p in range(first_page, last_page + 1) if p not in self.pages]
+        if not missing:
+            return True
+
+        start = missing[0]
+        count = missing[-1] - start + 1
+        buf = process.ReadMemory(start * PAGE_SIZE, count * PAGE_SIZE, lldb.SBError())
+        if buf is None:
+            return False
+
+        # A read that stops at an unmapped page comes back short, only keep the whole pages
+        view = memoryview(buf)
+        for i in range(min(count, len(buf) // PAGE_SIZE)):
+            self.pages.setdefault(start + i, view[i * PAGE_SIZE:(i + 1) * PAGE_SIZE])
+
+        return len(buf) >= count * PAGE_SIZE
+
+    def read(self, process, addr, size):
+        """Read size bytes at addr, returns a memoryview or None on error."""
+        self.check_stop(process)
+
+        if size <= 0:
+            return memoryview(b"")
+
+        first_page = addr // PAGE_SIZE
+        last_page = (addr + size - 1) // PAGE_SIZE
+        offset = addr - first_page * PAGE_SIZE
+
+        if not self.load_pages(process, first_page, last_page):
+            # Part of the range is not readable as whole pages, read just the bytes asked for
+            buf = process.ReadMemory(addr, size, lldb.SBError())
+            return memoryview(buf) if buf is not None and len(buf) >= size else None
+
+        if first_page == last_page:
+            return self.pages[first_page][offset:offset + size]
+
+        buf = b"".join(self.pages[p] for p in range(first_page, last_page + 1))
+        return memoryview(buf)[offset:offset + size]
+
+
+MEMORY_CACHE = MemoryCache()
+
+
+def read_memory(process, addr, size):
+    """Read memory through the shared page cache."""
+    if addr is None or addr == lldb.LLDB_INVALID_ADDRESS:
+        return None
+
+    return MEMORY_CACHE.read(process, addr, size)
+
+
+def read_u64_pair(process, addr):
+    """Read two consecutive 64-bit unsigned integers, returns None on error."""
+    buf = read_memory(process, addr, 16)
+    if buf is None:
+        return None
+
+    return struct.unpack_from("<QQ", buf)
+
+
+def read_member_u64(valobj, member_path):
+    """Read a 64-bit member at its cached offset, falls back to the SBValue if not in memory."""
+    buf = read_memory(valobj.GetProcess(), lldb_resolver.member_address(valobj, member_path), 8)
+    if buf is not None:
+        return struct.unpack_from("<Q", buf)[0]
+
+    for name in member_path.split("."):
+        valobj = valobj.GetChildMemberWithName(name)
+    return valobj.GetValueAsUnsigned(0)
+
+
 #############################
 # Pretty Printer Defintions #
 #############################
@@ -53,25 +157,42 @@ import lldb
 
 def ConstDataRangePrinter(valobj, *_args):  # pylint: disable=invalid-name
     """Pretty-Prints MongoDB Status objects."""
-    print("CDR....................................")
-    end = valobj.GetChildMemberWithName("_end")
-    begin = valobj.GetChildMemberWithName("_begin")
-
-    return "CDR(Len={})".format(end - begin)
+    return "CDR(Len={})".format(read_member_u64(valobj, "_end") - read_member_u64(valobj, "_begin"))
 
 
 def NamespaceStringPrinter(valobj, *_args):  # pylint: disable=invalid-name
     """Print NamespaceString value."""
-    data = valobj.GetChildMemberWithName("_data")
-    ptr = data.GetChildMemberWithName("_M_dataplus").GetChildMemberWithName("_M_p").GetValueAsUnsigned(0)
+    process = valobj.GetProcess()
+
+    # libstdc++ std::string is laid out as {_M_p, _M_string_length, ...}
+    fields = read_u64_pair(process, lldb_resolver.member_address(valobj, "_data"))
+    if fields is None:
+        # Not in memory (i.e. in a register), go through the SBValue
+        data = valobj.GetChildMemberWithName("_data")
+        fields = (data.GetChildMemberWithName("_M_dataplus").GetChildMemberWithName("_M_p").GetValueAsUnsigned(0),
+                  data.GetChildMemberWithName("_M_string_length").GetValueAsUnsigned(0))
+
+    (ptr, size1) = fields
     if ptr == 0:
             return 'nullptr'
 
-    size1 = data.GetChildMemberWithName("_M_string_length").GetValueAsUnsigned()
     if size1 == 1:
         return '""'
 
-    descriminator = valobj.GetProcess().ReadMemory(ptr, 1, lldb.SBError())[0]
+    buf = read_memory(process, ptr, size1)
+    if buf is None:
+        return 'nullptr'
+
+    return format_namespace_string(buf)
+
+
+def format_namespace_string(buf):
+    """Format the bytes of a NamespaceString or DatabaseName, does not call into LLDB."""
+    if len(buf) <= 1:
+        return '""'
+
+    size1 = len(buf)
+    descriminator = buf[0]
 
     data_offset = 1
     has_tenant = False
@@ -86,19 +207,17 @@ def NamespaceStringPrinter(valobj, *_args):  # pylint: disable=invalid-name
 
     # return f"p: {ptr}, {size1}"
 
-    # name = '"{}"'.format(valobj.GetProcess().ReadMemory(ptr + data_offset, size1, lldb.SBError()).decode("utf-8"))
     # TODO - handle collection names
-    string_bytes = valobj.GetProcess().ReadMemory(ptr + data_offset, size1, lldb.SBError())
-    if string_bytes is None:
+    string_bytes = buf[data_offset:data_offset + size1]
+    if len(string_bytes) != size1:
         return 'nullptr'
 
-    name = '"{}"'.format(string_bytes.decode("utf-8"))
+    name = '"{}"'.format(str(string_bytes, "utf-8"))
 
     if not has_tenant:
          return name
 
-    oid_bytes =valobj.GetProcess().ReadMemory(ptr + 1, 12, lldb.SBError())
-    oid = bson.objectid.ObjectId(oid_bytes)
+    oid = bson.objectid.ObjectId(bytes(buf[1:13]))
 
     return '"<{}>.{}"'.format(oid, name)
 
@@ -131,11 +250,19 @@ def ResourceIdPrinter(valobj, *_args):  # pylint: disable=invalid-name
     return extract_first_3_bits(data)
 
 
+def format_resource_id(full_hash):
+    """Format the _fullHash of a ResourceId as type:hash, does not call into LLDB."""
+    return "{}:{:x}".format(extract_first_3_bits(full_hash), full_hash & ((1 << 61) - 1))
+
+
 
 def OIDPrinter(valobj, *_args):  # pylint: disable=invalid-name
     """Print ResourceIdPrinter value."""
-    oid_bytes =valobj.GetProcess().ReadMemory(valobj.GetChildMemberWithName('_oid').AddressOf().GetValueAsUnsigned(0), 12, lldb.SBError())
-    oid = bson.objectid.ObjectId(oid_bytes)
+    oid_bytes = read_memory(valobj.GetProcess(), lldb_resolver.member_address(valobj, "_oid"), 12)
+    if oid_bytes is None:
+        return 'nullptr'
+
+    oid = bson.objectid.ObjectId(bytes(oid_bytes))
 
     return oid
 
@@ -168,17 +295,433 @@ def ValidatedTenancyScopePrinter(valobj, *_args):  # pylint: disable=invalid-nam
 
 def StringDataPrinter(valobj, *_args):  # pylint: disable=invalid-name
     """Print StringData value."""
-    sv = valobj.GetChildMemberWithName("_sv")
+    process = valobj.GetProcess()
+
+    # libstdc++ std::string_view is laid out as {_M_len, _M_str}
+    fields = read_u64_pair(process, lldb_resolver.member_address(valobj, "_sv"))
+    if fields is None:
+        # Not in memory (i.e. in a register), go through the SBValue
+        sv = valobj.GetChildMemberWithName("_sv")
+        fields = (sv.GetChildMemberWithName("_M_len").GetValueAsUnsigned(0),
+                  sv.GetChildMemberWithName("_M_str").GetValueAsUnsigned(0))
 
-    size1 = sv.GetChildMemberWithName("_M_len").GetValueAsUnsigned(0)
+    (size1, ptr) = fields
     if size1 == 0:
         return 'nullptr2'
 
-    ptr = sv.GetChildMemberWithName("_M_str").GetValueAsUnsigned()
     if ptr == 0:
         return 'nullptr3'
 
-    return '"{}"'.format(valobj.GetProcess().ReadMemory(ptr, size1, lldb.SBError()).decode("utf-8"))
+    string_bytes = read_memory(process, ptr, size1)
+    if string_bytes is None:
+        return 'nullptr3'
+
+    return '"{}"'.format(str(string_bytes, "utf-8"))
+
+
+########
+# BSON #
+########
+
+# Caps on how much of a BSON document the printers will read and decode. Oplog entries and
+# aggregation pipelines can be many MB, so only read and decode what is shown.
+BSON_MAX_BYTES = int(os.environ.get("MONGODEV_BSON_MAX_BYTES", 1024 * 1024))
+BSON_MAX_FIELDS = int(os.environ.get("MONGODEV_BSON_MAX_FIELDS", 20))
+BSON_MAX_STRING = int(os.environ.get("MONGODEV_BSON_MAX_STRING", 256))
+
+# Size of the first read of a document, later reads double in size up to BSON_MAX_BYTES
+BSON_FIRST_READ = 4096
+
+# Fixed size of values by BSON type, variable size types are handled in bson_value_size
+BSON_FIXED_SIZES = {
+    0x01: 8,  # double
+    0x06: 0,  # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,  # bool
+    0x09: 8,  # date
+    0x0A: 0,  # null
+    0x10: 4,  # int32
+    0x11: 8,  # timestamp
+    0x12: 8,  # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,  # MaxKey
+    0xFF: 0,  # MinKey
+}
+
+BSON_EMBEDDED_DOCUMENT = 0x03
+BSON_ARRAY = 0x04
+
+
+class BSONReader:
+    """Reads a BSON document from the inferior on demand, in growing chunks."""
+
+    def __init__(self, process, addr, size=None):
+        """Read a document at addr, or pass size to read a single element at addr."""
+        self.process = process
+        self.addr = addr
+        self.buf = b""
+        self.size = 0
+        self.limit = 0
+
+        if size is None:
+            header = read_memory(process, addr, 4)
+            if header is None:
+                return
+
+            size = struct.unpack_from("<i", header)[0]
+            if size < 5:
+                # Not a valid document
+                return
+
+        self.size = size
+        self.limit = min(size, BSON_MAX_BYTES)
+
+    def valid(self):
+        return self.size > 0
+
+    def truncated(self):
+        return self.limit < self.size
+
+    def ensure(self, end):
+        """Make sure the first end bytes are read, returns False if end is past the read limit."""
+        if end <= len(self.buf):
+            return True
+
+        if end > self.limit:
+            return False
+
+        want = min(max(end, len(self.buf) * 2, BSON_FIRST_READ), self.limit)
+        if want > PAGE_SIZE * 4:
+            # Big documents skip the page cache and are read in one go
+            buf = self.process.ReadMemory(self.addr, want, lldb.SBError())
+        else:
+            buf = read_memory(self.process, self.addr, want)
+        if buf is None:
+            return False
+
+        # A read that stops at an unmapped page can come back short
+        if len(buf) > len(self.buf):
+            self.buf = buf
+        return len(self.buf) >= end
+
+
+def bson_cstring_end(reader, pos):
+    """Find the end of the C string at pos, returns the position of the nul terminator or -1."""
+    start = pos
+    while True:
+        if not reader.ensure(start + 1):
+            return -1
+
+        chunk = bytes(reader.buf[start:start + 256])
+        if not chunk:
+            return -1
+
+        end = chunk.find(b"\0")
+        if end != -1:
+            return start + end
+
+        start += len(chunk)
+
+
+def bson_value_size(reader, type_byte, pos):
+    """Get the size of the value of type type_byte at pos, returns -1 if it cannot be read."""
+    fixed = BSON_FIXED_SIZES.get(type_byte)
+    if fixed is not None:
+        return fixed
+
+    if type_byte == 0x0B:  # regex, two C strings
+        end = bson_cstring_end(reader, pos)
+        if end == -1:
+            return -1
+        end = bson_cstring_end(reader, end + 1)
+        return -1 if end == -1 else end + 1 - pos
+
+    if not reader.ensure(pos + 4):
+        return -1
+    length = struct.unpack_from("<i", reader.buf, pos)[0]
+
+    if type_byte in (0x02, 0x0D, 0x0E):  # string, code, symbol
+        return 4 + length
+    if type_byte == 0x05:  # binary
+        return 4 + 1 + length
+    if type_byte == 0x0C:  # DBPointer
+        return 4 + length + 12
+    if type_byte in (BSON_EMBEDDED_DOCUMENT, BSON_ARRAY, 0x0F):  # document, array, code w/scope
+        return length
+
+    return -1
+
+
+def bson_next_element(reader, pos):
+    """Get the element at pos as (type, name, value position, end position) or None at the end."""
+    if not reader.ensure(pos + 1):
+        return None
+
+    type_byte = reader.buf[pos]
+    if type_byte == 0:
+        return None
+
+    name_end = bson_cstring_end(reader, pos + 1)
+    if name_end == -1:
+        return None
+
+    value_pos = name_end + 1
+    size = bson_value_size(reader, type_byte, value_pos)
+    if size < 0 or not reader.ensure(value_pos + size):
+        return None
+
+    name = str(reader.buf[pos + 1:name_end], "utf-8", "replace")
+    return (type_byte, name, value_pos, value_pos + size)
+
+
+def bson_format_value(reader, type_byte, value_pos, end, budget):
+    """Format a single BSON value, budget is the number of nested fields left to show."""
+    buf = reader.buf
+    if type_byte == 0x01:
+        return repr(struct.unpack_from("<d", buf, value_pos)[0])
+    if type_byte == 0x02:
+        str_end = min(end - 1, value_pos + 4 + BSON_MAX_STRING)
+        value = str(buf[value_pos + 4:str_end], "utf-8", "replace")
+        return '"{}"'.format(value) if str_end == end - 1 else '"{}"...'.format(value)
+    if type_byte == 0x08:
+        return "true" if buf[value_pos] else "false"
+    if type_byte == 0x0A:
+        return "null"
+    if type_byte == 0x10:
+        return str(struct.unpack_from("<i", buf, value_pos)[0])
+    if type_byte == 0x12:
+        return str(struct.unpack_from("<q", buf, value_pos)[0])
+    if type_byte == 0x07:
+        return "ObjectId('{}')".format(bson.objectid.ObjectId(bytes(buf[value_pos:end])))
+    if type_byte in (BSON_EMBEDDED_DOCUMENT, BSON_ARRAY):
+        return bson_format_document(reader, value_pos, type_byte == BSON_ARRAY, budget)
+
+    # Let pymongo decode everything else from a single element document
+    doc = struct.pack("<i", 4 + 1 + 2 + (end - value_pos) + 1) + bytes([type_byte]) + b"v\0" + \
+        bytes(buf[value_pos:end]) + b"\0"
+    try:
+        return str(bson.decode(doc)["v"])
+    except Exception:  # pylint: disable=broad-except
+        return "<type 0x{:02x}>".format(type_byte)
+
+
+def bson_format_document(reader, pos, is_array, budget):
+    """Format the document at pos, budget is a one element list of the fields left to show."""
+    parts = []
+    elem_pos = pos + 4
+    while True:
+        if budget[0] <= 0:
+            parts.append("...")
+            break
+
+        element = bson_next_element(reader, elem_pos)
+        if element is None:
+            if reader.truncated():
+                parts.append("...")
+            break
+
+        (type_byte, name, value_pos, end) = element
+        budget[0] -= 1
+        value = bson_format_value(reader, type_byte, value_pos, end, budget)
+        parts.append(value if is_array else "{}: {}".format(name, value))
+        elem_pos = end
+
+    if is_array:
+        return "[ {} ]".format(", ".join(parts)) if parts else "[]"
+
+    return "{{ {} }}".format(", ".join(parts)) if parts else "{}"
+
+
+def bson_summary(process, addr):
+    """Format the BSON document at addr, or None if there is no valid document."""
+    if addr == 0:
+        return None
+
+    reader = BSONReader(process, addr)
+    if not reader.valid():
+        return None
+
+    return bson_format_document(reader, 0, False, [BSON_MAX_FIELDS])
+
+
+def bson_element_summary(process, addr, total_size):
+    """Format the BSON element at addr as name: value."""
+    reader = BSONReader(process, addr, total_size if total_size > 0 else BSON_MAX_BYTES)
+    element = bson_next_element(reader, 0)
+    if element is None:
+        return "EOO"
+
+    (type_byte, name, value_pos, end) = element
+    return "{}: {}".format(name, bson_format_value(reader, type_byte, value_pos, end, [BSON_MAX_FIELDS]))
+
+
+def BSONObjPrinter(valobj, *_args):  # pylint: disable=invalid-name
+    """Print BSONObj value."""
+    addr = read_member_u64(valobj, "_objdata")
+
+    summary = bson_summary(valobj.GetProcess(), addr)
+    if summary is None:
+        return "<invalid BSONObj 0x{:x}>".format(addr)
+
+    return summary
+
+
+def BSONElementPrinter(valobj, *_args):  # pylint: disable=invalid-name
+    """Print BSONElement value."""
+    addr = read_member_u64(valobj, "data")
+    if addr == 0:
+        return "EOO"
+
+    total_size = valobj.GetChildMemberWithName("totalSize").GetValueAsSigned(0)
+    return bson_element_summary(valobj.GetProcess(), addr, total_size)
+
+
+def SharedBufferPrinter(valobj, *_args):  # pylint: disable=invalid-name
+    """Print SharedBuffer and ConstSharedBuffer value."""
+    buffer = valobj.GetChildMemberWithName("_buffer")
+    if buffer.IsValid():
+        # ConstSharedBuffer wraps a SharedBuffer
+        valobj = buffer
+
+    holder = valobj.GetChildMemberWithName("_holder").GetChildMemberWithName("px")
+    if holder.GetValueAsUnsigned(0) == 0:
+        return "SharedBuffer(null)"
+
+    holder = holder.Dereference()
+    refs = holder.GetChildMemberWithName("_refCount").GetChildAtIndex(0).GetValueAsUnsigned(0)
+    capacity = holder.GetChildMemberWithName("_capacity").GetValueAsUnsigned(0)
+    return "SharedBuffer(capacity={}, refs={})".format(capacity, refs)
+
+
+def create_bson_element(valobj, name, addr, name_size, total_size):
+    """Create a synthetic mongo::BSONElement value for the element at addr."""
+    target = valobj.GetTarget()
+    element_type = lldb_resolver.find_type(target, "mongo::BSONElement")
+    if not element_type.IsValid():
+        return None
+
+    fields = {
+        "data": struct.pack("<Q", addr),
+        "fieldNameSize_": struct.pack("<i", name_size),
+        "totalSize": struct.pack("<i", total_size),
+    }
+
+    data = bytearray(element_type.GetByteSize())
+    for i in range(element_type.GetNumberOfFields()):
+        field = element_type.GetFieldAtIndex(i)
+        value = fields.get(field.GetName())
+        if value is not None:
+            offset = field.GetOffsetInBytes()
+            data[offset:offset + len(value)] = value
+
+    sb_data = lldb.SBData()
+    sb_data.SetData(lldb.SBError(), bytes(data), target.GetByteOrder(), target.GetAddressByteSize())
+
+    return valobj.CreateValueFromData(name, sb_data, element_type)
+
+
+class BSONChildrenProvider:
+    """Lazy synthetic children for a BSON document, each field is a mongo::BSONElement.
+
+    Fields are only walked as far as the largest index LLDB asks for.
+    """
+
+    def __init__(self, valobj, *_args):
+        self.valobj = valobj
+        self.update()
+
+    def doc_address(self):
+        return read_member_u64(self.valobj, "_objdata")
+
+    def update(self):
+        self.reader = None
+        self.elements = []
+        self.complete = False
+        self.children = {}
+
+        addr = self.doc_address()
+        if addr != 0:
+            reader = BSONReader(self.valobj.GetProcess(), addr)
+            if reader.valid():
+                self.reader = reader
+
+    def walk_to(self, index):
+        """Walk the document until the element at index is known or the end is reached."""
+        pos = self.elements[-1][3] if self.elements else 4
+        while not self.complete and len(self.elements) <= index:
+            element = bson_next_element(self.reader, pos)
+            if element is None:
+                self.complete = True
+                break
+            self.elements.append(element)
+            pos = element[3]
+
+    def num_children(self):
+        if self.reader is None:
+            return 0
+
+        self.walk_to(BSON_MAX_FIELDS - 1)
+        return min(len(self.elements), BSON_MAX_FIELDS)
+
+    def get_child_index(self, name):
+        try:
+            return int(name.lstrip("[").rstrip("]"))
+        except ValueError:
+            pass
+
+        for i, element in enumerate(self.elements):
+            if element[1] == name:
+                return i
+        return None
+
+    def get_child_at_index(self, index):
+        if self.reader is None or index < 0:
+            return None
+
+        child = self.children.get(index)
+        if child is not None:
+            return child
+
+        self.walk_to(index)
+        if index >= len(self.elements):
+            return None
+
+        (_, name, value_pos, end) = self.elements[index]
+        start = self.elements[index - 1][3] if index > 0 else 4
+        child = create_bson_element(self.valobj, name, self.reader.addr + start, value_pos - start - 1, end - start)
+        self.children[index] = child
+
+        return child
+
+    def has_children(self):
+        return True
+
+
+class BSONObjChildrenProvider(BSONChildrenProvider):
+    """Synthetic children for mongo::BSONObj."""
+
+
+class BSONElementChildrenProvider(BSONChildrenProvider):
+    """Synthetic children for a mongo::BSONElement holding an embedded document or array."""
+
+    def doc_address(self):
+        addr = read_member_u64(self.valobj, "data")
+        if addr == 0:
+            return 0
+
+        header = read_memory(self.valobj.GetProcess(), addr, 1)
+        if header is None or header[0] not in (BSON_EMBEDDED_DOCUMENT, BSON_ARRAY):
+            return 0
+
+        reader = BSONReader(self.valobj.GetProcess(), addr, BSON_MAX_BYTES)
+        name_end = bson_cstring_end(reader, 1)
+        if name_end == -1:
+            return 0
+
+        return addr + name_end + 1
+
+    def has_children(self):
+        return self.doc_address() != 0
 
 
 def __lldb_init_module(debugger, *_args):
@@ -199,5 +742,14 @@ def __lldb_init_module(debugger, *_args):
 
     debugger.HandleCommand("type summary add mongo::StringData -F lldb_printers_more.StringDataPrinter")
 
+    debugger.HandleCommand("type summary add mongo::BSONObj -F lldb_printers_more.BSONObjPrinter")
+    debugger.HandleCommand("type synthetic add mongo::BSONObj --python-class lldb_printers_more.BSONObjChildrenProvider")
+    debugger.HandleCommand("type summary add mongo::BSONElement -F lldb_printers_more.BSONElementPrinter")
+    debugger.HandleCommand("type synthetic add mongo::BSONElement --python-class lldb_printers_more.BSONElementChildrenProvider")
+    debugger.HandleCommand("type summary add mongo::SharedBuffer -F lldb_printers_more.SharedBufferPrinter")
+    debugger.HandleCommand("type summary add mongo::ConstSharedBuffer -F lldb_printers_more.SharedBufferPrinter")
+
+    lldb_profiler.init(debugger)
+
 
 print("Loading lldb_printers_more.py done...")
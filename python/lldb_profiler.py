@@ -0,0 +1,237 @@
+"""Opt-in profiling of the Python formatters registered with LLDB.
+
+Every summary function and synthetic children provider method registered in LLDB's default
+category by our scripts is wrapped to record its call count, latency and the SB API calls it
+makes. Synthetic provider classes are looked up by name for each new value, but LLDB keeps the
+function of a summary after its first call, so summaries are registered again after wrapping.
+
+Turn it on with MONGODEV_PRINTER_STATS=1 before the scripts are imported, or with
+"mongodb-printer-stats on".
+"""
+
+import collections
+import inspect
+import os
+import sys
+import threading
+import time
+
+import lldb
+
+ENABLED = os.environ.get("MONGODEV_PRINTER_STATS", "0") == "1"
+
+# Modules whose formatters are profiled
+PROFILED_MODULES = ("lldb_printers_more", "lldb_commands_more")
+
+# Methods LLDB calls on a synthetic children provider
+SYNTHETIC_METHODS = ("__init__", "update", "num_children", "get_child_index", "get_child_at_index",
+                     "has_children", "get_value")
+
+# SB API classes whose calls are counted
+SB_CLASSES = ("SBValue", "SBType", "SBTypeMember", "SBProcess", "SBTarget", "SBModule", "SBAddress",
+              "SBFrame", "SBThread", "SBData", "SBSymbol")
+
+# Latency samples kept for each formatter for the p99
+MAX_SAMPLES = 10000
+
+# (owner, attribute name) to (original value, whether the owner defined it itself)
+ORIGINALS = {}
+
+
+class FormatterStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.sb_calls = 0
+        self.samples = collections.deque(maxlen=MAX_SAMPLES)
+
+    def p99(self):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+STATS = collections.defaultdict(FormatterStats)
+
+# Stack of the formatters running on each thread, SB calls are charged to the innermost one
+ACTIVE = threading.local()
+
+
+def active_stack():
+    stack = getattr(ACTIVE, "stack", None)
+    if stack is None:
+        stack = ACTIVE.stack = []
+    return stack
+
+
+def profile_formatter(name, func):
+    """Wrap a formatter function to record its latency and SB API calls."""
+
+    def wrapper(*args, **kwargs):
+        stack = active_stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            stats = STATS[name]
+            stats.count += 1
+            stats.total += elapsed
+            stats.samples.append(elapsed)
+
+    wrapper.mongodev_profiled = True
+    return wrapper
+
+
+def count_sb_calls(func):
+    """Wrap an SB API method to charge its calls to the running formatter."""
+
+    def wrapper(*args, **kwargs):
+        stack = getattr(ACTIVE, "stack", None)
+        if stack:
+            STATS[stack[-1]].sb_calls += 1
+        return func(*args, **kwargs)
+
+    wrapper.mongodev_profiled = True
+    return wrapper
+
+
+def replace(owner, attr, wrap):
+    """Replace owner.attr with wrap(owner.attr), remembering the original."""
+    value = getattr(owner, attr)
+    if getattr(value, "mongodev_profiled", False):
+        return
+
+    ORIGINALS[(owner, attr)] = (value, attr in vars(owner))
+    setattr(owner, attr, wrap(value))
+
+
+def get_registered_formatters(debugger):
+    """Get the names of the Python summary functions and synthetic provider classes, i.e. module.name."""
+    category = debugger.GetDefaultCategory()
+
+    functions = set()
+    for i in range(category.GetNumSummaries()):
+        summary = category.GetSummaryAtIndex(i)
+        if summary.IsFunctionName():
+            functions.add(summary.GetData())
+
+    classes = set()
+    for i in range(category.GetNumSynthetics()):
+        synthetic = category.GetSyntheticAtIndex(i)
+        if synthetic.IsClassName():
+            classes.add(synthetic.GetData())
+
+    return (functions, classes)
+
+
+def refresh_summaries(debugger, functions):
+    """Register the summaries for functions again so LLDB looks up the current module attribute."""
+    category = debugger.GetDefaultCategory()
+    summaries = []
+    for i in range(category.GetNumSummaries()):
+        summary = category.GetSummaryAtIndex(i)
+        if summary.IsFunctionName() and summary.GetData() in functions:
+            summaries.append((category.GetTypeNameSpecifierForSummaryAtIndex(i), summary))
+
+    for (type_name, summary) in summaries:
+        category.AddTypeSummary(type_name, lldb.SBTypeSummary.CreateWithFunctionName(summary.GetData(),
+                                                                                    summary.GetOptions()))
+
+
+def resolve(qualified_name):
+    """Get (module, attribute name) for module.name if it is one of our modules."""
+    (module_name, _, name) = qualified_name.rpartition(".")
+    if module_name not in PROFILED_MODULES or module_name not in sys.modules:
+        return None
+
+    module = sys.modules[module_name]
+    if not hasattr(module, name):
+        return None
+
+    return (module, name)
+
+
+def enable(debugger):
+    """Wrap all the registered formatters and SB API methods, can be called again to pick up new ones."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+
+    (functions, classes) = get_registered_formatters(debugger)
+
+    for qualified_name in functions:
+        found = resolve(qualified_name)
+        if found is not None:
+            replace(found[0], found[1], lambda f, n=qualified_name: profile_formatter(n, f))
+    refresh_summaries(debugger, functions)
+
+    for qualified_name in classes:
+        found = resolve(qualified_name)
+        if found is None:
+            continue
+
+        cls = getattr(found[0], found[1])
+        for method in SYNTHETIC_METHODS:
+            if hasattr(cls, method):
+                replace(cls, method, lambda f, n="%s.%s" % (qualified_name, method): profile_formatter(n, f))
+
+    for class_name in SB_CLASSES:
+        cls = getattr(lldb, class_name, None)
+        if cls is None:
+            continue
+
+        for (attr, value) in list(vars(cls).items()):
+            if attr[:1].isupper() and inspect.isfunction(value):
+                replace(cls, attr, count_sb_calls)
+
+
+def disable(debugger):
+    """Restore the original formatters and SB API methods."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = False
+
+    for ((owner, attr), (value, owned)) in ORIGINALS.items():
+        if owned:
+            setattr(owner, attr, value)
+        else:
+            # Inherited, remove the wrapper to expose the base class's method again
+            delattr(owner, attr)
+    ORIGINALS.clear()
+
+    refresh_summaries(debugger, get_registered_formatters(debugger)[0])
+
+
+def init(debugger):
+    """Called at the end of each script's __lldb_init_module to profile its formatters if enabled."""
+    if ENABLED:
+        enable(debugger)
+
+
+def clear():
+    STATS.clear()
+
+
+SORT_KEYS = {
+    "total": lambda s: s.total,
+    "count": lambda s: s.count,
+    "p99": lambda s: s.p99(),
+    "sb": lambda s: s.sb_calls,
+}
+
+
+def report(sort="total", limit=None):
+    """Get the report lines, sorted with the most expensive formatter first."""
+    rows = sorted(STATS.items(), key=lambda item: SORT_KEYS[sort](item[1]), reverse=True)[:limit]
+
+    lines = ["%-60s %10s %12s %10s %10s %10s %8s" % ("Formatter", "Calls", "Total (ms)", "Mean (us)",
+                                                      "p99 (us)", "SB calls", "SB/call")]
+    for (name, s) in rows:
+        lines.append("%-60s %10d %12.2f %10.1f %10.1f %10d %8.1f" % (
+            name, s.count, s.total * 1e3, s.total * 1e6 / max(s.count, 1), s.p99() * 1e6, s.sb_calls,
+            s.sb_calls / max(s.count, 1)))
+
+    return lines
@@ -0,0 +1,204 @@
+"""Memoized symbol, type and member offset lookups shared by the mongodev LLDB scripts.
+
+FindSymbols, FindFirstType and FindGlobalVariables are some of the slowest SB API calls on a large
+mongod binary. Results are cached by the UUID of the target's executable module, so they are
+shared between all targets of the same binary and dropped when it is rebuilt.
+
+Symbols and globals are cached as their module and file address, since dynamically linked builds
+keep them in shared libraries rather than the executable. Load addresses depend on where the
+process loaded each module, so they are cached per process.
+"""
+
+import collections
+
+import lldb
+
+# Cache of (category, executable module UUID, name) to result
+CACHE = {}
+
+# Cache of (process unique ID, executable module UUID, symbol name) to load address
+LOAD_ADDRESS_CACHE = {}
+
+# Hits and misses of each category of lookup
+HITS = collections.Counter()
+MISSES = collections.Counter()
+
+
+def get_executable_module(target):
+    return target.FindModule(target.GetExecutable())
+
+
+def module_uuid(target):
+    return get_executable_module(target).GetUUIDString()
+
+
+def memoize(category, target, name, lookup, keep=None):
+    """Get a cached result, calling lookup() on a miss.
+
+    Results for which keep(result) is false are returned without being cached.
+    """
+    key = (category, module_uuid(target), name)
+    if key in CACHE:
+        HITS[category] += 1
+        return CACHE[key]
+
+    MISSES[category] += 1
+    result = lookup()
+    if keep is None or keep(result):
+        CACHE[key] = result
+    return result
+
+
+def find_type(target, name):
+    """Find a type by name, types that are not found are looked up again next time."""
+    return memoize("type", target, name, lambda: target.FindFirstType(name), keep=lambda t: t.IsValid())
+
+
+def get_module_location(address):
+    """Get (module path, module UUID, file address) of an SBAddress."""
+    module = address.GetModule()
+    return (module.GetFileSpec().fullpath, module.GetUUIDString(), address.GetFileAddress())
+
+
+def resolve_module_location(target, location):
+    """Get the SBAddress of a (module path, module UUID, file address), None if the module changed."""
+    (path, uuid, file_address) = location
+    module = target.FindModule(lldb.SBFileSpec(path))
+    if not module.IsValid() or module.GetUUIDString() != uuid:
+        return None
+    return module.ResolveFileAddress(file_address)
+
+
+def memoize_location(category, target, name, lookup):
+    """Get the SBAddress and extra data of a cached (location, data) from lookup(), None if not found.
+
+    Misses are not cached, the shared library may not be loaded yet. The entry is looked up again
+    when the shared library it came from was rebuilt.
+    """
+    for _ in range(2):
+        found = memoize(category, target, name, lookup, keep=lambda r: r is not None)
+        if found is None:
+            return None
+
+        address = resolve_module_location(target, found[0])
+        if address is not None:
+            return (address, found[1])
+
+        CACHE.pop((category, module_uuid(target), name), None)
+
+    return None
+
+
+def find_symbol_address(target, name):
+    """Get the SBAddress of a symbol, None if there is not exactly one match."""
+
+    def lookup():
+        symbols = target.FindSymbols(name)
+        if len(symbols) != 1:
+            return None
+        return (get_module_location(symbols[0].symbol.GetStartAddress()), None)
+
+    found = memoize_location("symbol", target, name, lookup)
+    return None if found is None else found[0]
+
+
+def symbol_load_address(target, name):
+    """Get the load address of a symbol in the target's process, None if not found."""
+    process = target.GetProcess()
+    key = (process.GetUniqueID(), module_uuid(target), name)
+    if key in LOAD_ADDRESS_CACHE:
+        HITS["load_address"] += 1
+        return LOAD_ADDRESS_CACHE[key]
+
+    MISSES["load_address"] += 1
+    address = find_symbol_address(target, name)
+    if address is None:
+        return None
+
+    load_address = address.GetLoadAddress(target)
+    if load_address == lldb.LLDB_INVALID_ADDRESS:
+        # Not loaded yet, try again later
+        return None
+
+    LOAD_ADDRESS_CACHE[key] = load_address
+    return load_address
+
+
+def find_global_variable(target, name):
+    """Get a global variable as an SBValue, None if not found."""
+
+    def lookup():
+        variables = target.FindGlobalVariables(name, 1)
+        if variables.GetSize() == 0:
+            return None
+        variable = variables.GetValueAtIndex(0)
+        return (get_module_location(variable.GetAddress()), variable.GetType())
+
+    found = memoize_location("global", target, name, lookup)
+    if found is None:
+        return None
+
+    (address, type_obj) = found
+    return target.CreateValueFromAddress(name, address, type_obj)
+
+
+def find_field(type_obj, name):
+    """Get (offset, type) of a field of a type or one of its base classes, None if not found."""
+    type_obj = type_obj.GetCanonicalType()
+    for i in range(type_obj.GetNumberOfFields()):
+        field = type_obj.GetFieldAtIndex(i)
+        if field.GetName() == name:
+            return (field.GetOffsetInBytes(), field.GetType())
+
+    for i in range(type_obj.GetNumberOfDirectBaseClasses()):
+        base = type_obj.GetDirectBaseClassAtIndex(i)
+        found = find_field(base.GetType(), name)
+        if found is not None:
+            return (base.GetOffsetInBytes() + found[0], found[1])
+
+    return None
+
+
+def find_member_offset(type_obj, path):
+    """Get the offset of a member of a type, path is a list of member names, None if not found."""
+    offset = 0
+    for name in path:
+        found = find_field(type_obj, name)
+        if found is None:
+            return None
+        offset += found[0]
+        type_obj = found[1]
+
+    return offset
+
+
+def member_offset(target, type_obj, member_path):
+    """Get the offset of a member, member_path is a dotted path of members, i.e. "_data._M_p"."""
+    type_obj = type_obj.GetCanonicalType()
+    name = "%s::%s" % (type_obj.GetName(), member_path)
+    return memoize("offset", target, name, lambda: find_member_offset(type_obj, member_path.split(".")))
+
+
+def member_address(valobj, member_path):
+    """Get the load address of a member of valobj with arithmetic, None if it is not in memory."""
+    address = valobj.GetLoadAddress()
+    if address == lldb.LLDB_INVALID_ADDRESS:
+        return None
+
+    offset = member_offset(valobj.GetTarget(), valobj.GetType(), member_path)
+    if offset is None:
+        return None
+
+    return address + offset
+
+
+def clear():
+    CACHE.clear()
+    LOAD_ADDRESS_CACHE.clear()
+    HITS.clear()
+    MISSES.clear()
+
+
+def stats():
+    """Get a list of (category, hits, misses)."""
+    return [(category, HITS[category], MISSES[category]) for category in sorted(set(HITS) | set(MISSES))]
@@ -0,0 +1,416 @@
+"""Triage many core dumps at once with the mongodev LLDB scripts.
+
+Each core is loaded headless and a list of LLDB commands is run against it, by default a
+backtrace of the crashing thread, mongodb-dc and mongodb-lock-snapshot:
+
+   python3 python/lldb_triage.py --out triage/ core.mongod.1234 core.mongod.5678
+   python3 python/lldb_triage.py --commands triage.lldb --mongo-root ~/mongo cores/
+
+Writes <core>.json and <core>.md for each core into --out, and summary.md and summary.json
+which group the cores by crash signature: the signal and the top frames of the crashing thread,
+leaving out the frames of the signal and abort handling.
+
+The cores run in a pool of processes, each with its own debugger. The cores of one executable are
+handed to the same worker in batches, so the executable and its debug info are parsed once for
+the batch. The caches in lldb_resolver.py are keyed by module UUID and are shared the same way.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import importlib.util
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+import elf_notes
+
+# ELF note types in core files
+NT_PRPSINFO = 3
+NT_FILE = 0x46494c45
+NT_SIGINFO = 0x53494749
+
+ET_CORE = 4
+
+# Offset of pr_fname in the x86_64 and aarch64 struct elf_prpsinfo
+PRPSINFO_FNAME_OFFSET = 40
+
+DEFAULT_COMMANDS = [
+    "thread backtrace",
+    "mongodb-dc",
+    "mongodb-lock-snapshot",
+]
+
+DEFAULT_SEARCH_DIRS = [os.path.join("build", "install", "bin")]
+
+# Frames of the crashing thread in the crash signature
+SIGNATURE_FRAMES = 5
+
+# Frames of the crashing thread kept in the report
+REPORT_FRAMES = 30
+
+# Functions that handle the signal or the abort rather than cause it
+NOISE_FUNCTIONS = (
+    "raise",
+    "abort",
+    "gsignal",
+    "__restore_rt",
+    "__pthread_kill",
+    "pthread_kill",
+    "__GI_",
+    "__assert_fail",
+    "mongo::(anonymous namespace)::abruptQuit",
+    "mongo::(anonymous namespace)::endProcessWithSignal",
+    "mongo::endProcessWithSignal",
+    "mongo::printStackTrace",
+    "mongo::(anonymous namespace)::printStackTraceNoRecursion",
+    "mongo::(anonymous namespace)::myTerminate",
+    "mongo::quickExit",
+)
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def read_core_notes(core_file):
+    """Get {"fname", "files", "signal"} from the notes of a 64-bit little endian ELF core file."""
+    info = {"fname": None, "files": [], "signal": None}
+    with open(core_file, "rb") as rfh:
+        if elf_notes.read_header(rfh)[0] != ET_CORE:
+            raise ValueError("Not a core file: %s" % core_file)
+
+        rfh.seek(0)
+        for (note_type, _, desc) in elf_notes.iter_notes(rfh):
+            if note_type == NT_PRPSINFO and len(desc) >= PRPSINFO_FNAME_OFFSET + 16:
+                fname = desc[PRPSINFO_FNAME_OFFSET:PRPSINFO_FNAME_OFFSET + 16]
+                info["fname"] = fname.split(b"\0", 1)[0].decode("utf-8", "replace")
+            elif note_type == NT_SIGINFO and len(desc) >= 4:
+                (info["signal"],) = struct.unpack_from("<i", desc, 0)
+            elif note_type == NT_FILE and len(desc) >= 16:
+                # count, page size, count * (start, end, offset), then the file names
+                (count, _) = struct.unpack_from("<QQ", desc, 0)
+                names = desc[16 + count * 24:].split(b"\0")[:count]
+                for name in names:
+                    path = name.decode("utf-8", "replace")
+                    if path not in info["files"]:
+                        info["files"].append(path)
+
+    return info
+
+
+def find_executable(core_file, binary, search_dirs):
+    """Get the path of the executable that dumped a core, None if it can not be found."""
+    if binary is not None:
+        return binary
+
+    info = read_core_notes(core_file)
+
+    # pr_fname is the first 15 characters of the executable's name
+    candidates = [f for f in info["files"] if info["fname"] and os.path.basename(f).startswith(info["fname"])]
+    candidates.extend(info["files"][:1])
+
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+
+        # Cores from CI name the paths of the machine that ran the task
+        for directory in search_dirs:
+            local = os.path.join(directory, os.path.basename(path))
+            if os.path.isfile(local):
+                return os.path.abspath(local)
+
+    return None
+
+
+def expand_cores(paths):
+    """Expand directories into the core files in them."""
+    cores = []
+    for path in paths:
+        if os.path.isdir(path):
+            cores.extend(os.path.join(path, n) for n in sorted(os.listdir(path))
+                         if n.startswith("core") or n.endswith(".core") or n.endswith(".mdmp"))
+        else:
+            cores.append(path)
+    return cores
+
+
+def read_commands(commands_file, commands):
+    """Get the commands to run, from a file of one command per line and the command line."""
+    result = []
+    if commands_file is not None:
+        with open(commands_file) as rfh:
+            result.extend(l.strip() for l in rfh if l.strip() and not l.lstrip().startswith("#"))
+    result.extend(commands)
+    return result or list(DEFAULT_COMMANDS)
+
+
+##########
+# Worker #
+##########
+
+DEBUGGER = None
+
+
+def init_worker(scripts):
+    """Create the debugger of a worker process and import the scripts into it."""
+    global DEBUGGER  # pylint: disable=global-statement
+    import lldb  # pylint: disable=import-outside-toplevel
+
+    DEBUGGER = lldb.SBDebugger.Create()
+    DEBUGGER.SetAsync(False)
+    for script in scripts:
+        run_command(DEBUGGER, "command script import %s" % script)
+
+
+def run_command(debugger, command):
+    """Run an LLDB command, returns {"command", "output", "error"}."""
+    import lldb  # pylint: disable=import-outside-toplevel
+
+    result = lldb.SBCommandReturnObject()
+    debugger.GetCommandInterpreter().HandleCommand(command, result)
+    return {
+        "command": command,
+        "output": result.GetOutput() or "",
+        "error": None if result.Succeeded() else (result.GetError() or "failed").strip(),
+    }
+
+
+def describe_frame(frame):
+    line_entry = frame.GetLineEntry()
+    return {
+        "pc": "0x%x" % frame.GetPC(),
+        "function": frame.GetDisplayFunctionName() or frame.GetFunctionName() or "??",
+        "module": frame.GetModule().GetFileSpec().GetFilename(),
+        "location": "%s:%d" % (line_entry.GetFileSpec().fullpath, line_entry.GetLine())
+                    if line_entry.IsValid() and line_entry.GetFileSpec().IsValid() else None,
+    }
+
+
+def find_crashing_thread(process):
+    """Get the thread that stopped with a signal or an exception, else the selected thread."""
+    import lldb  # pylint: disable=import-outside-toplevel
+
+    for thread in process:
+        if thread.GetStopReason() in (lldb.eStopReasonSignal, lldb.eStopReasonException):
+            return thread
+    return process.GetSelectedThread()
+
+
+def get_signature(signal_name, frames):
+    """Get the crash signature from the signal and the top frames that are not signal handling."""
+    functions = []
+    for frame in frames:
+        function = frame["function"]
+        if function == "??" or any(function.startswith(n) for n in NOISE_FUNCTIONS):
+            continue
+        # Leave out the arguments, they differ for template instances of the same frame
+        functions.append(function.split("(", 1)[0])
+        if len(functions) == SIGNATURE_FRAMES:
+            break
+
+    return "%s | %s" % (signal_name, " > ".join(functions) or "??")
+
+
+def triage_core(debugger, core_file, executable, commands):
+    """Load a core and run the commands against it, returns the report dict."""
+    start = time.monotonic()
+    report = {"core": core_file, "executable": executable, "error": None}
+
+    target = debugger.CreateTarget(executable)
+    if not target.IsValid():
+        report["error"] = "Failed to create target for %s" % executable
+        return report
+
+    process = target.LoadCore(core_file)
+    if not process.IsValid():
+        report["error"] = "Failed to load core %s" % core_file
+        debugger.DeleteTarget(target)
+        return report
+
+    report["load_seconds"] = time.monotonic() - start
+
+    thread = find_crashing_thread(process)
+    frames = [describe_frame(thread.GetFrameAtIndex(i)) for i in range(min(thread.GetNumFrames(), REPORT_FRAMES))]
+    signal_name = thread.GetStopDescription(256) or "unknown"
+
+    report.update({
+        "threads": process.GetNumThreads(),
+        "crashing_thread": thread.GetIndexID(),
+        "stop_description": signal_name,
+        "frames": frames,
+        "signature": get_signature(signal_name, frames),
+    })
+
+    debugger.SetSelectedTarget(target)
+    process.SetSelectedThread(thread)
+    report["commands"] = [run_command(debugger, c) for c in commands]
+    report["seconds"] = time.monotonic() - start
+
+    debugger.DeleteTarget(target)
+    return report
+
+
+def triage_batch(batch, commands):
+    """Triage a batch of (core, executable) in a worker, the executables stay loaded for the batch."""
+    targets = {}
+    reports = []
+    for (core_file, executable) in batch:
+        if executable not in targets:
+            # Keeps the modules of the executable loaded while each core gets its own target
+            targets[executable] = DEBUGGER.CreateTarget(executable)
+        try:
+            reports.append(triage_core(DEBUGGER, core_file, executable, commands))
+        except Exception as e:  # pylint: disable=broad-except
+            reports.append({"core": core_file, "executable": executable, "error": repr(e)})
+
+    for target in targets.values():
+        DEBUGGER.DeleteTarget(target)
+
+    return reports
+
+
+###########
+# Reports #
+###########
+
+
+def write_markdown(report, wfh):
+    wfh.write("# %s\n\n" % os.path.basename(report["core"]))
+    wfh.write("- Executable: `%s`\n" % report["executable"])
+    if report["error"] is not None:
+        wfh.write("- Error: %s\n" % report["error"])
+        return
+
+    wfh.write("- Signature: `%s`\n" % report["signature"])
+    wfh.write("- Crashing thread: %d of %d\n" % (report["crashing_thread"], report["threads"]))
+    wfh.write("- Loaded in %.1fs, triaged in %.1fs\n\n" % (report["load_seconds"], report["seconds"]))
+
+    wfh.write("## Crashing thread\n\n")
+    for (i, frame) in enumerate(report["frames"]):
+        wfh.write("%d. `%s` %s\n" % (i, frame["function"], frame["location"] or frame["module"] or ""))
+
+    for command in report["commands"]:
+        wfh.write("\n## %s\n\n```\n%s```\n" % (command["command"], command["output"]))
+        if command["error"] is not None:
+            wfh.write("\nError: %s\n" % command["error"])
+
+
+def write_reports(out_dir, reports):
+    """Write a JSON and markdown report for each core, and the summary by crash signature."""
+    os.makedirs(out_dir, exist_ok=True)
+
+    signatures = collections.OrderedDict()
+    for report in reports:
+        name = os.path.join(out_dir, os.path.basename(report["core"]))
+        with open(name + ".json", "w") as wfh:
+            json.dump(report, wfh, indent=2)
+        with open(name + ".md", "w") as wfh:
+            write_markdown(report, wfh)
+
+        signature = report.get("signature") or "error: %s" % report["error"]
+        signatures.setdefault(signature, []).append(report["core"])
+
+    summary = sorted(signatures.items(), key=lambda item: len(item[1]), reverse=True)
+    with open(os.path.join(out_dir, "summary.json"), "w") as wfh:
+        json.dump([{"signature": s, "count": len(c), "cores": c} for (s, c) in summary], wfh, indent=2)
+
+    with open(os.path.join(out_dir, "summary.md"), "w") as wfh:
+        wfh.write("# Crash signatures\n\n| Cores | Signature | Examples |\n|---|---|---|\n")
+        for (signature, cores) in summary:
+            examples = ", ".join("[%s](%s.md)" % ((os.path.basename(c),) * 2) for c in cores[:3])
+            wfh.write("| %d | `%s` | %s |\n" % (len(cores), signature.replace("|", "\\|"), examples))
+
+    return summary
+
+
+def make_batches(cores, jobs, batch_size):
+    """Split the (core, executable) list into batches of one executable each."""
+    by_executable = collections.defaultdict(list)
+    for (core_file, executable) in cores:
+        by_executable[executable].append((core_file, executable))
+
+    # Large enough that each executable is parsed by few workers, small enough to keep them all busy
+    if batch_size is None:
+        batch_size = max(1, -(-len(cores) // jobs))
+
+    batches = []
+    for executable_cores in by_executable.values():
+        for i in range(0, len(executable_cores), batch_size):
+            batches.append(executable_cores[i:i + batch_size])
+    return batches
+
+
+def get_scripts(mongo_root):
+    """Get the scripts the VS Code extension imports into LLDB, see getDebuggInitScripts."""
+    scripts = []
+    if mongo_root is not None:
+        scripts.extend(os.path.join(mongo_root, "buildscripts", "lldb", s) for s in
+                       ["lldb_printers.py", "lldb_commands.py"])
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    scripts.extend(os.path.join(script_dir, s) for s in ["lldb_commands_more.py", "lldb_printers_more.py"])
+    return [s for s in scripts if os.path.exists(s)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Triage core dumps with the mongodev LLDB scripts.')
+    parser.add_argument('--out', default='triage', help='Directory for the reports')
+    parser.add_argument('--binary', help='Executable of all the cores, found from each core by default')
+    parser.add_argument('--search-dir', action='append', help='Directories to search for executables')
+    parser.add_argument('--mongo-root', help='mongo repository to import buildscripts/lldb from')
+    parser.add_argument('--commands', help='File of LLDB commands to run, one per line')
+    parser.add_argument('--command', action='append', default=[], help='LLDB command to run, can be repeated')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--batch-size', type=int, help='Cores of one executable handed to a worker at once')
+    parser.add_argument('cores', nargs='+', help='core files or directories of them')
+    args = parser.parse_args()
+
+    # Only the workers import lldb, but fail before starting them if they can not
+    if importlib.util.find_spec("lldb") is None:
+        eprint("The lldb Python module is not available, set PYTHONPATH to the output of 'lldb -P'")
+        sys.exit(1)
+
+    commands = read_commands(args.commands, args.command)
+    search_dirs = args.search_dir or DEFAULT_SEARCH_DIRS
+
+    cores = []
+    reports = []
+    for core_file in expand_cores(args.cores):
+        try:
+            executable = find_executable(core_file, args.binary, search_dirs)
+        except (OSError, ValueError) as e:
+            eprint("Skipping %s: %s" % (core_file, e))
+            continue
+
+        if executable is None:
+            reports.append({"core": core_file, "executable": None, "error": "executable not found"})
+        else:
+            cores.append((core_file, executable))
+
+    start = time.monotonic()
+    jobs = max(1, min(args.jobs, len(cores)))
+
+    # lldb starts threads when it is initialized, so the workers are spawned rather than forked
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker,
+                                                initargs=(get_scripts(args.mongo_root),)) as pool:
+        futures = [pool.submit(triage_batch, batch, commands) for batch in make_batches(cores, jobs, args.batch_size)]
+        for future in concurrent.futures.as_completed(futures):
+            for report in future.result():
+                print("%-8s %6.1fs  %s  %s" % ("ERROR" if report["error"] else "OK", report.get("seconds", 0.0),
+                                              report["core"], report["error"] or report["signature"]), flush=True)
+                reports.append(report)
+
+    summary = write_reports(args.out, reports)
+
+    print("\n%d cores, %d signatures in %.1fs, reports in %s" % (len(reports), len(summary),
+                                                                 time.monotonic() - start, args.out))
+    for (signature, signature_cores) in summary:
+        print("%5d  %s" % (len(signature_cores), signature))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#! /usr/bin/env python3
+# Script is responsible for finding failures in test logs like test1.log
+#
+# Prints one JSON object per line for each failure found:
+#   {"line": 10, "column": 4, "length": 9, "matcher": 0, "message": "Assertion"}
+#
+# Lines and columns are 0 based to match vscode.Position. Columns and lengths count UTF-16 code units
+# of the decoded line like vscode.Position, not bytes. "matcher" is the index in MATCHERS.
+#
+import argparse
+import json
+import mmap
+import multiprocessing
+import re
+
+# Tuples of RegEx to search for and message to display for user
+# Keep in sync with errorMatchers in extension.ts, same entries in the same order
+MATCHERS = [
+    (rb"BACKTRACE", "Assertion"),
+    (rb"BadValue:.*", "BadValue error"),
+    (rb"failed to load:.*", "failed to load file"),
+    (rb"uncaught exception:.*", "Uncaught Javascript exception"),
+    (rb"assert failed.*", "JS Assert failed"),
+    (rb"assert.*are not equal", "JS Equality Assert failed"),
+    (rb"mongo program was not running at.*", "Mongo Program had bad exit"),
+    (rb"Invalid access.*", "Mongo Program crashed"),
+    (rb"Got signal.*", "Mongo Program got fatal signal"),
+    (rb"ERROR: AddressSanitizer.*", "Address Sanitizer failure"),
+    (rb"Tripwire assertion.*", "Tripwire Assertion"),
+]
+
+COMPILED_MATCHERS = [re.compile(m[0]) for m in MATCHERS]
+
+# One regex for all the matchers, used to find the lines to run the individual matchers on
+COMBINED_MATCHER = re.compile(b"|".join(b"(?:" + m[0] + b")" for m in MATCHERS))
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def get_text_length(data):
+    """Get the length of UTF-8 bytes as decoded text in UTF-16 code units, the unit of vscode.Position."""
+    if data.isascii():
+        return len(data)
+    return len(data.decode("utf-8", "replace").encode("utf-16-le")) // 2
+
+
+def scan_chunk(data):
+    """Find all the failures in a chunk of a log, returns (matches, number of lines).
+
+    Line numbers in the matches are relative to the start of the chunk.
+    """
+    matches = []
+    line_num = 0
+    line_start = 0
+    pos = 0
+    end = len(data)
+
+    while True:
+        m = COMBINED_MATCHER.search(data, pos, end)
+        if m is None:
+            break
+
+        match_line_start = data.rfind(b"\n", line_start, m.start()) + 1
+        if match_line_start == 0:
+            match_line_start = line_start
+        line_num += data.count(b"\n", line_start, match_line_start)
+        line_start = match_line_start
+
+        line_end = data.find(b"\n", m.start(), end)
+        if line_end == -1:
+            line_end = end
+
+        # Check every matcher on the line since a line can match more than one
+        line = data[line_start:line_end]
+        for i, matcher in enumerate(COMPILED_MATCHERS):
+            lm = matcher.search(line)
+            if lm is not None:
+                matches.append({
+                    "line": line_num,
+                    "column": get_text_length(line[:lm.start()]),
+                    "length": get_text_length(lm.group(0)),
+                    "matcher": i,
+                    "message": MATCHERS[i][1],
+                })
+
+        pos = line_end + 1
+        if pos >= end:
+            break
+
+    line_num += data.count(b"\n", line_start, end)
+
+    return (matches, line_num)
+
+
+def scan_file_chunk(args):
+    (file_name, start, end) = args
+    with open(file_name, "rb") as rfh:
+        with mmap.mmap(rfh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return scan_chunk(mm[start:end])
+
+
+def split_chunks(mm, chunk_size):
+    """Split the file into chunks that end on line boundaries."""
+    chunks = []
+    start = 0
+    size = len(mm)
+    while start < size:
+        end = mm.find(b"\n", min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        chunks.append((start, end))
+        start = end
+
+    return chunks
+
+
+def analyze(file_name, jobs=1, chunk_size=CHUNK_SIZE):
+    """Yield all the failures in a log file in order."""
+    with open(file_name, "rb") as rfh:
+        try:
+            mm = mmap.mmap(rfh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return
+
+        with mm:
+            chunks = split_chunks(mm, chunk_size)
+            if jobs > 1 and len(chunks) > 1:
+                with multiprocessing.Pool(jobs) as pool:
+                    results = pool.imap(scan_file_chunk, [(file_name, s, e) for (s, e) in chunks])
+                    yield from add_line_offsets(results)
+            else:
+                yield from add_line_offsets(scan_chunk(mm[s:e]) for (s, e) in chunks)
+
+
+def add_line_offsets(results):
+    base_line = 0
+    for (matches, line_count) in results:
+        for m in matches:
+            m["line"] += base_line
+            yield m
+        base_line += line_count
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Find failures in a test log.')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of processes to scan with')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Size in bytes of each chunk')
+    parser.add_argument('log_file', help='log file to scan')
+    args = parser.parse_args()
+
+    for match in analyze(args.log_file, args.jobs, args.chunk_size):
+        print(json.dumps(match))
@@ -0,0 +1,280 @@
+#! /usr/bin/env python3
+# Script is responsible for indexing structured mongod JSON logs in resmoke output
+#
+# Resmoke lines look like:
+#   [j0:s0:prim] {"t":{"$date":"2023-05-22T18:31:05.202Z"},"s":"I",  "c":"-",  "id":22810, "ctx":"js",...}
+#
+# The index is written beside the log as <log>.mongodev_idx and stores one row per JSON log line
+# in columns: byte offset, timestamp, severity, component, id, ctx and fixture tag.
+#
+# Usage:
+#   log_indexer.py index test1.log
+#   log_indexer.py query test1.log --id 22810 --tag j0:s0:sec --start 2023-05-22T18:31:00 --end 2023-05-22T18:32:00
+#
+import argparse
+import array
+import datetime
+import json
+import os
+import re
+import struct
+import sys
+
+try:
+    import orjson as fast_json
+except ImportError:
+    fast_json = json
+
+INDEX_SUFFIX = ".mongodev_idx"
+
+INDEX_VERSION = 1
+
+# Columns of the index, name and array typecode
+COLUMNS = [
+    ("offset", "Q"),
+    ("time", "q"),
+    ("severity", "H"),
+    ("component", "H"),
+    ("id", "q"),
+    ("ctx", "I"),
+    ("tag", "H"),
+]
+
+# mongod always writes the leading fields in this order, so they can be read without parsing the
+# whole line
+PREFIX_REGEX = re.compile(
+    rb'\{"t":\{"\$date":"(?P<t>[^"]+)"\},"s":"(?P<s>[^"]+)",\s*"c":"(?P<c>[^"]+)",\s*"id":(?P<id>-?\d+),\s*"ctx":"(?P<ctx>(?:[^"\\]|\\.)*)"')
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+class StringTable:
+    """Maps strings to small integers for the index columns."""
+
+    def __init__(self, strings=None):
+        self.strings = list(strings or [])
+        self.ids = {s: i for i, s in enumerate(self.strings)}
+
+    def get_id(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self.ids[s] = i
+        return i
+
+
+class DateParser:
+    """Parses log timestamps to milliseconds since the epoch, caching by second."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def parse(self, date):
+        # i.e. 2023-05-22T18:31:05.202Z or 2023-05-22T18:31:05.202+00:00
+        has_millis = date[19:20] == "."
+        key = date[:19] + (date[23:] if has_millis else date[19:])
+        base = self.seconds.get(key)
+        if base is None:
+            base = int(datetime.datetime.fromisoformat(key.replace("Z", "+00:00")).timestamp())
+            self.seconds[key] = base
+
+        return base * 1000 + (int(date[20:23]) if has_millis else 0)
+
+
+def parse_time_arg(value):
+    """Parse a time from the command line as milliseconds since the epoch, defaulting to UTC."""
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def parse_line(line):
+    """Parse a log line into (tag, date, severity, component, id, ctx) or None if it is not JSON."""
+    tag = b""
+    start = 0
+    if line.startswith(b"["):
+        tag_end = line.find(b"] ")
+        if tag_end == -1:
+            return None
+        tag = line[1:tag_end]
+        start = tag_end + 2
+
+    if not line.startswith(b'{"t"', start):
+        return None
+
+    m = PREFIX_REGEX.match(line, start)
+    if m is not None:
+        return (tag.decode(), m.group("t").decode(), m.group("s").decode(), m.group("c").decode(),
+                int(m.group("id")), m.group("ctx").decode())
+
+    try:
+        doc = fast_json.loads(line[start:])
+        return (tag.decode(), doc["t"]["$date"], doc["s"], doc["c"], int(doc["id"]), doc["ctx"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class LogIndex:
+    """Columnar index of the structured log lines in a log file."""
+
+    def __init__(self):
+        self.columns = {name: array.array(typecode) for (name, typecode) in COLUMNS}
+        self.severities = StringTable()
+        self.components = StringTable()
+        self.ctxs = StringTable()
+        self.tags = StringTable()
+
+    def __len__(self):
+        return len(self.columns["offset"])
+
+    def build(self, file_name):
+        dates = DateParser()
+        offset = 0
+        columns = self.columns
+        with open(file_name, "rb") as rfh:
+            for line in rfh:
+                fields = parse_line(line)
+                if fields is not None:
+                    (tag, date, severity, component, log_id, ctx) = fields
+                    try:
+                        millis = dates.parse(date)
+                    except ValueError:
+                        millis = 0
+                    columns["offset"].append(offset)
+                    columns["time"].append(millis)
+                    columns["severity"].append(self.severities.get_id(severity))
+                    columns["component"].append(self.components.get_id(component))
+                    columns["id"].append(log_id)
+                    columns["ctx"].append(self.ctxs.get_id(ctx))
+                    columns["tag"].append(self.tags.get_id(tag))
+
+                offset += len(line)
+
+    def save(self, index_file, file_stat):
+        header = json.dumps({
+            "version": INDEX_VERSION,
+            "size": file_stat.st_size,
+            "mtime": file_stat.st_mtime,
+            "rows": len(self),
+            "severities": self.severities.strings,
+            "components": self.components.strings,
+            "ctxs": self.ctxs.strings,
+            "tags": self.tags.strings,
+        }).encode()
+
+        with open(index_file, "wb") as wfh:
+            wfh.write(struct.pack("<I", len(header)))
+            wfh.write(header)
+            for (name, _) in COLUMNS:
+                self.columns[name].tofile(wfh)
+
+    @staticmethod
+    def load(index_file, file_stat):
+        """Load an index, returns None if it is missing or out of date."""
+        try:
+            with open(index_file, "rb") as rfh:
+                (header_size,) = struct.unpack("<I", rfh.read(4))
+                header = json.loads(rfh.read(header_size))
+                if header.get("version") != INDEX_VERSION or header["size"] != file_stat.st_size or \
+                        header["mtime"] != file_stat.st_mtime:
+                    return None
+
+                index = LogIndex()
+                index.severities = StringTable(header["severities"])
+                index.components = StringTable(header["components"])
+                index.ctxs = StringTable(header["ctxs"])
+                index.tags = StringTable(header["tags"])
+                for (name, _) in COLUMNS:
+                    index.columns[name].fromfile(rfh, header["rows"])
+                return index
+        except (OSError, ValueError, EOFError, KeyError, struct.error):
+            return None
+
+    def query(self, log_id=None, tag=None, component=None, ctx=None, severity=None, start=None, end=None):
+        """Get the byte offsets of all the lines that match the filters."""
+        filters = []
+        for (column, table, value) in [("tag", self.tags, tag), ("component", self.components, component),
+                                       ("ctx", self.ctxs, ctx), ("severity", self.severities, severity)]:
+            if value is not None:
+                if value not in table.ids:
+                    return []
+                filters.append((self.columns[column], table.ids[value]))
+
+        if log_id is not None:
+            filters.append((self.columns["id"], log_id))
+
+        times = self.columns["time"]
+        rows = range(len(self))
+        if start is not None or end is not None:
+            # Lines are almost always in time order, but different fixtures can interleave, so
+            # do not binary search
+            rows = [r for r in rows if (start is None or times[r] >= start) and (end is None or times[r] <= end)]
+
+        # Check the most selective looking filter, the id, first
+        for (column, value) in reversed(filters):
+            rows = [r for r in rows if column[r] == value]
+
+        offsets = self.columns["offset"]
+        return [offsets[r] for r in rows]
+
+
+def get_index(file_name, rebuild=False):
+    """Load the index for a log file, building it if it is missing or out of date."""
+    file_stat = os.stat(file_name)
+    index_file = file_name + INDEX_SUFFIX
+
+    index = None if rebuild else LogIndex.load(index_file, file_stat)
+    if index is None:
+        index = LogIndex()
+        index.build(file_name)
+        try:
+            index.save(index_file, file_stat)
+        except OSError as e:
+            eprint("Failed to save index %s: %s" % (index_file, e))
+
+    return index
+
+
+def read_lines(file_name, offsets):
+    """Yield the lines at each byte offset by seeking."""
+    with open(file_name, "rb") as rfh:
+        for offset in offsets:
+            rfh.seek(offset)
+            yield rfh.readline().decode("utf-8", "replace").rstrip("\n")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Index and query structured mongod logs.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = sub.add_parser('index', help='Build the index for a log file')
+    index_parser.add_argument('log_file', help='log file to index')
+
+    query_parser = sub.add_parser('query', help='Print the lines that match all the filters')
+    query_parser.add_argument('log_file', help='log file to query')
+    query_parser.add_argument('--id', type=int, help='log id, i.e. 22810')
+    query_parser.add_argument('--tag', help='fixture tag, i.e. j0:s0:sec')
+    query_parser.add_argument('--component', help='log component, i.e. REPL')
+    query_parser.add_argument('--ctx', help='log context, i.e. conn12')
+    query_parser.add_argument('--severity', help='log severity, i.e. I, W, E')
+    query_parser.add_argument('--start', help='earliest time, ISO 8601, UTC if no offset is given')
+    query_parser.add_argument('--end', help='latest time, ISO 8601, UTC if no offset is given')
+
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        log_index = get_index(args.log_file, rebuild=True)
+        print("Indexed %d log lines" % len(log_index))
+    else:
+        log_index = get_index(args.log_file)
+        matched = log_index.query(log_id=args.id, tag=args.tag, component=args.component, ctx=args.ctx,
+                                  severity=args.severity,
+                                  start=parse_time_arg(args.start) if args.start else None,
+                                  end=parse_time_arg(args.end) if args.end else None)
+        for log_line in read_lines(args.log_file, matched):
+            print(log_line)
@@ -0,0 +1,206 @@
+#! /usr/bin/env python3
+# Script is responsible for finding the mongod, mongos and mongo shell processes on this machine
+#
+# Reads /proc directly and prints the same JSON as mpf, see MongoProceses in mongo_process.ts:
+#   {"mongod": [{"pid": 1, "port": 20000, "server_type": "shardsvr", "replica_set_name": "rs0"}],
+#    "mongos": [{"pid": 2, "port": 20007, "configdb": "config-rs/localhost:20002"}],
+#    "shell": [3]}
+#
+# With --watch, prints one JSON event per line as processes start and exit:
+#   {"event": "start", "type": "mongod", "process": {...}}
+#   {"event": "exit", "type": "mongod", "pid": 1}
+#
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+PROC = "/proc"
+
+MONGOD = "mongod"
+MONGOS = "mongos"
+SHELL = "shell"
+
+# Process names as they appear in /proc/<pid>/stat
+PROGRAMS = {
+    "mongod": MONGOD,
+    "mongos": MONGOS,
+    "mongo": SHELL,
+    "mongosh": SHELL,
+}
+
+# Versioned server binaries, i.e. mongod-6.0 from a multiversion install
+VERSIONED_PROGRAM = re.compile(r"^(mongod|mongos)-\d+\.\d+$")
+
+DEFAULT_PORTS = {
+    "configsvr": 27019,
+    "shardsvr": 27018,
+}
+
+DEFAULT_PORT = 27017
+
+
+def read_stat(pid):
+    """Get (name, state, start time) from /proc/<pid>/stat, or None if the process is gone."""
+    try:
+        with open(os.path.join(PROC, pid, "stat"), "rb") as rfh:
+            stat = rfh.read()
+    except OSError:
+        return None
+
+    # The name is in parentheses and may contain spaces, the fields after it are space separated
+    name_start = stat.find(b"(")
+    name_end = stat.rfind(b")")
+    fields = stat[name_end + 2:].split()
+
+    # Fields after the name start at field 3 (state), start time is field 22
+    return (stat[name_start + 1:name_end].decode("utf-8", "replace"), fields[0].decode(), int(fields[19]))
+
+
+def read_cmdline(pid):
+    try:
+        with open(os.path.join(PROC, pid, "cmdline"), "rb") as rfh:
+            return [a.decode("utf-8", "replace") for a in rfh.read().split(b"\0") if a]
+    except OSError:
+        return None
+
+
+def get_program(name):
+    """Get the process type of a program name, None if it is not a mongo program."""
+    versioned = VERSIONED_PROGRAM.match(name)
+    return PROGRAMS.get(versioned.group(1) if versioned else name)
+
+
+def get_option(argv, name):
+    """Get the value of --name value or --name=value, None if not present."""
+    prefix = name + "="
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+
+    return None
+
+
+def get_server_type(argv):
+    cluster_role = get_option(argv, "--clusterRole")
+    if "--configsvr" in argv or cluster_role == "configsvr":
+        return "configsvr"
+    if "--shardsvr" in argv or cluster_role == "shardsvr":
+        return "shardsvr"
+    if get_option(argv, "--replSet") is not None:
+        return "replset"
+    return "standalone"
+
+
+def get_port(argv, server_type=None):
+    port = get_option(argv, "--port")
+    try:
+        return int(port)
+    except (TypeError, ValueError):
+        return DEFAULT_PORTS.get(server_type, DEFAULT_PORT)
+
+
+def classify(pid, argv):
+    """Get (process type, process JSON) for a process from its command line."""
+    program = get_program(os.path.basename(argv[0])) if argv else None
+    if program is None:
+        return (None, None)
+
+    if program == MONGOD:
+        server_type = get_server_type(argv)
+        return (MONGOD, {
+            "pid": pid,
+            "port": get_port(argv, server_type),
+            "server_type": server_type,
+            "replica_set_name": get_option(argv, "--replSet") or "",
+        })
+
+    if program == MONGOS:
+        return (MONGOS, {
+            "pid": pid,
+            "port": get_port(argv),
+            "configdb": get_option(argv, "--configdb") or "",
+        })
+
+    return (SHELL, pid)
+
+
+def scan(known=None):
+    """Find all the mongo processes, returns a dict of (pid, start time) to (type, process JSON).
+
+    Processes already in known are not read again.
+    """
+    processes = {}
+    for pid in os.listdir(PROC):
+        if not pid.isdigit():
+            continue
+
+        stat = read_stat(pid)
+        if stat is None:
+            continue
+
+        (name, state, start_time) = stat
+        # Zombies have an empty command line
+        if get_program(name) is None or state == "Z":
+            continue
+
+        key = (int(pid), start_time)
+        if known is not None and key in known:
+            processes[key] = known[key]
+            continue
+
+        argv = read_cmdline(pid)
+        (program, process) = classify(int(pid), argv)
+        if program is not None:
+            processes[key] = (program, process)
+
+    return processes
+
+
+def to_json(processes):
+    result = {MONGOD: [], MONGOS: [], SHELL: []}
+    for (program, process) in sorted(processes.values(), key=lambda p: str(p[1])):
+        result[program].append(process)
+
+    return result
+
+
+def watch(interval):
+    """Print an event for each process start and exit, polling /proc every interval seconds."""
+    known = {}
+    while True:
+        processes = scan(known)
+
+        for key in known.keys() - processes.keys():
+            print(json.dumps({"event": "exit", "type": known[key][0], "pid": key[0]}), flush=True)
+
+        for key in processes.keys() - known.keys():
+            (program, process) = processes[key]
+            print(json.dumps({"event": "start", "type": program, "process": process}), flush=True)
+
+        known = processes
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Find mongod, mongos and mongo shell processes.')
+    parser.add_argument('--watch', action='store_true', help='Print process start and exit events')
+    parser.add_argument('--interval', type=float, default=0.5, help='Seconds between polls in watch mode')
+    args = parser.parse_args()
+
+    if not os.path.isdir(PROC):
+        print("mongo_process.py: %s is not available" % PROC, file=sys.stderr)
+        sys.exit(1)
+
+    if args.watch:
+        try:
+            watch(args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(to_json(scan())))
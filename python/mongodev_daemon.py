@@ -0,0 +1,490 @@
+#! /usr/bin/env python3
+# Script is responsible for serving the mongodev helpers from one long-lived process
+#
+# Each helper script pays for a new interpreter, the venv activation and loading its index from
+# disk on every call. The daemon loads them once and keeps the suite index, the ninja indexes,
+# scanned logs and the known processes in memory, checking the files they came from on each call.
+#
+# It speaks JSON-RPC 2.0, one request per line, over stdio or a Unix socket, and exits after
+# --idle-timeout seconds without a request. "call" connects to the socket, starting the daemon
+# with the current interpreter if it is not running:
+#
+# Usage:
+#   mongodev_daemon.py serve                                  - serve on the default socket
+#   mongodev_daemon.py serve --stdio                          - serve on stdin and stdout
+#   mongodev_daemon.py start                                  - start the daemon if needed, prints the socket
+#   mongodev_daemon.py call suite.resolve jstests/core/foo.js - prints --suite=... jstests/core/foo.js
+#   mongodev_daemon.py call suite.batch a.js b.js             - prints one line per suite
+#   mongodev_daemon.py call --jobs 0 suite.batch a.js b.js    - with resmoke --jobs in each line
+#   mongodev_daemon.py call ninja.lookup build.ninja fle_crud_test
+#   mongodev_daemon.py call ninja.affected build.ninja src/mongo/db/query/planner.cpp
+#   mongodev_daemon.py call log.scan test.log
+#   mongodev_daemon.py call process.list
+#
+# Requests may carry "cwd" in their params, relative paths are resolved and printed against it.
+#
+import argparse
+import collections
+import hashlib
+import json
+import os
+import select
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+# Seconds a client waits for a daemon it started to listen
+START_TIMEOUT = 10
+
+# Positional arguments of "call" for each method, * collects the rest into a list
+METHOD_ARGS = {
+    "ping": (),
+    "stats": (),
+    "shutdown": (),
+    "suite.resolve": ("file",),
+    "suite.batch": ("*files",),
+    "ninja.lookup": ("ninja_file", "*tests"),
+    "ninja.affected": ("ninja_file", "*files"),
+    "log.scan": ("file",),
+    "process.list": (),
+}
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def get_default_socket():
+    """Get the socket of the daemon for this checkout of the scripts and this venv.
+
+    A daemon runs the code and the interpreter it was started with, so each pair gets its own.
+    """
+    key = hashlib.sha256(("%s\0%s" % (os.path.dirname(os.path.abspath(__file__)), sys.prefix)).encode()).hexdigest()
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir()),
+                        "mongodev-%d-%s.sock" % (os.getuid(), key[:12]))
+
+
+def get_log_file(socket_path):
+    return socket_path + ".log"
+
+
+def get_stat_key(file_name):
+    st = os.stat(file_name)
+    return (st.st_size, st.st_mtime)
+
+
+##########
+# Server #
+##########
+
+
+class Handlers:
+    """The methods the daemon serves, with their in-memory caches."""
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        import affected_tests
+        import get_test_cmd
+        import log_analyzer
+        import mongo_process
+        import ninja_index
+
+        self.affected_tests = affected_tests
+        self.get_test_cmd = get_test_cmd
+        self.log_analyzer = log_analyzer
+        self.mongo_process = mongo_process
+        self.ninja_index = ninja_index
+
+        self.started = time.monotonic()
+        self.calls = collections.Counter()
+        # mongo root to the suite file mtimes load_suite_index was called with
+        self.suite_mtimes = {}
+        # file name to (stat key, value)
+        self.ninja_indexes = {}
+        self.deps_indexes = {}
+        self.log_scans = {}
+        self.known_processes = {}
+
+    def check_suite_index(self, file_names):
+        """Drop the cached suite index of a repo when its suite files changed.
+
+        get_test_cmd.SUITE_INDEXES are kept for the life of the process, which is fine for
+        one command but not for the daemon.
+        """
+        for file_name in file_names:
+            root = self.get_test_cmd.find_mongo_root(file_name)
+            if root is None:
+                continue
+
+            mtimes = self.get_test_cmd.get_suite_files_mtimes(root)
+            if self.suite_mtimes.get(root) != mtimes:
+                self.suite_mtimes[root] = mtimes
+                self.get_test_cmd.SUITE_INDEXES.pop(root, None)
+            return
+
+    def cached(self, cache, file_name, key, load):
+        """Get the value for file_name from cache, loading it again if its key changed."""
+        entry = cache.get(file_name)
+        if entry is None or entry[0] != key:
+            entry = cache[file_name] = (key, load())
+        return entry[1]
+
+    def get_ninja_index(self, ninja_file):
+        ninja_file = os.path.abspath(ninja_file)
+        return self.cached(self.ninja_indexes, ninja_file, get_stat_key(ninja_file),
+                           lambda: self.ninja_index.load_index(ninja_file))
+
+    def ping(self):
+        return "pong"
+
+    def stats(self):
+        return {
+            "pid": os.getpid(),
+            "python": sys.executable,
+            "uptime": time.monotonic() - self.started,
+            "calls": dict(self.calls),
+            "ninja_indexes": len(self.ninja_indexes),
+            "log_scans": len(self.log_scans),
+        }
+
+    def suite_resolve(self, file):
+        self.check_suite_index([file])
+        return self.get_test_cmd.get_suite(file)
+
+    def suite_batch(self, files, jobs=None):
+        self.check_suite_index(files)
+        return self.get_test_cmd.get_batch_commands(files, jobs)
+
+    def ninja_lookup(self, ninja_file, tests=None):
+        index = self.get_ninja_index(ninja_file)
+        if not tests:
+            return index
+        return {t: index.get(t) for t in tests}
+
+    def get_deps_index(self, ninja_file):
+        """Get the affected_tests index, loading it again when the ninja file or .ninja_deps changed."""
+
+        def get_key(index):
+            return (get_stat_key(ninja_file), self.affected_tests.get_stat_key(index["deps_file"]))
+
+        entry = self.deps_indexes.get(ninja_file)
+        if entry is None or entry[0] != get_key(entry[1]):
+            index = self.affected_tests.load_index(ninja_file)
+            entry = self.deps_indexes[ninja_file] = (get_key(index), index)
+        return entry[1]
+
+    def ninja_affected(self, ninja_file, files):
+        ninja_file = os.path.abspath(ninja_file)
+        build_root = os.path.dirname(ninja_file)
+
+        affected = self.affected_tests.find_affected_executables(
+            self.get_deps_index(ninja_file),
+            [self.affected_tests.to_ninja_path(os.path.abspath(f), build_root) for f in files])
+        return self.affected_tests.select_targets(self.get_ninja_index(ninja_file), affected)
+
+    def log_scan(self, file):
+        file = os.path.abspath(file)
+        return self.cached(self.log_scans, file, get_stat_key(file), lambda: list(self.log_analyzer.analyze(file)))
+
+    def process_list(self):
+        self.known_processes = self.mongo_process.scan(self.known_processes)
+        return self.mongo_process.to_json(self.known_processes)
+
+
+class Server:
+    """Dispatches JSON-RPC requests to Handlers one at a time and tracks idleness."""
+
+    def __init__(self, idle_timeout):
+        self.handlers = Handlers()
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.last_request = time.monotonic()
+        self.stopping = threading.Event()
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_request
+
+    def handle_line(self, line):
+        """Handle one request line, returns the response line or None for a notification."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}})
+
+        if not isinstance(request, dict):
+            # Batches are not supported
+            return json.dumps({"jsonrpc": "2.0", "id": None,
+                               "error": {"code": INVALID_REQUEST, "message": "Request must be an object"}})
+
+        request_id = request.get("id")
+        with self.lock:
+            self.last_request = time.monotonic()
+            response = self.dispatch(request)
+            self.last_request = time.monotonic()
+
+        if request_id is None:
+            return None
+
+        response.update({"jsonrpc": "2.0", "id": request_id})
+        return json.dumps(response)
+
+    def dispatch(self, request):
+        method = request.get("method")
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return {"error": {"code": INVALID_PARAMS, "message": "params must be an object"}}
+
+        if method == "shutdown":
+            self.stopping.set()
+            return {"result": True}
+
+        handler = getattr(self.handlers, str(method).replace(".", "_"), None) if method in METHOD_ARGS else None
+        if handler is None:
+            return {"error": {"code": METHOD_NOT_FOUND, "message": "Unknown method: %s" % method}}
+
+        self.handlers.calls[method] += 1
+
+        # Relative paths of the client are relative to its working directory, not the daemon's
+        params = dict(params)
+        cwd = params.pop("cwd", None)
+        saved_cwd = os.getcwd()
+        try:
+            if cwd is not None:
+                os.chdir(cwd)
+            return {"result": handler(**params)}
+        except TypeError as e:
+            return {"error": {"code": INVALID_PARAMS, "message": str(e)}}
+        except Exception as e:  # pylint: disable=broad-except
+            return {"error": {"code": SERVER_ERROR, "message": "%s: %s" % (type(e).__name__, e)}}
+        finally:
+            os.chdir(saved_cwd)
+
+    def should_stop(self):
+        return self.stopping.is_set() or self.idle_seconds() > self.idle_timeout
+
+
+def serve_stdio(server):
+    """Serve requests from stdin until EOF, shutdown or the idle timeout."""
+    # stdout carries the responses, anything the handlers print goes to stderr
+    responses = sys.stdout
+    sys.stdout = sys.stderr
+
+    while not server.should_stop():
+        (readable, _, _) = select.select([sys.stdin], [], [], max(0.0, server.idle_timeout - server.idle_seconds()))
+        if not readable:
+            continue
+
+        line = sys.stdin.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+
+        response = server.handle_line(line)
+        if response is not None:
+            responses.write(response + "\n")
+            responses.flush()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.rpc.handle_line(line.decode("utf-8"))
+            if response is not None:
+                self.wfile.write(response.encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(server, socket_path):
+    """Serve requests on a Unix socket until shutdown or the idle timeout."""
+    if connect(socket_path) is not None:
+        eprint("A daemon is already serving %s" % socket_path)
+        return
+
+    try:
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+
+    old_umask = os.umask(0o077)
+    try:
+        unix_server = UnixServer(socket_path, RequestHandler)
+    finally:
+        os.umask(old_umask)
+    unix_server.rpc = server
+
+    def watch_idle():
+        while not server.should_stop():
+            time.sleep(min(1.0, server.idle_timeout))
+        unix_server.shutdown()
+
+    threading.Thread(target=watch_idle, daemon=True).start()
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+
+
+##########
+# Client #
+##########
+
+
+def connect(socket_path):
+    """Connect to the daemon, None if it is not running."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def start_daemon(socket_path, idle_timeout):
+    """Start a daemon in the background with the current interpreter and wait for it to listen.
+
+    Its output goes to a log file next to the socket.
+    """
+    with open(get_log_file(socket_path), "ab") as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--socket", socket_path,
+                          "--idle-timeout", str(idle_timeout)], stdin=subprocess.DEVNULL,
+                         stdout=log, stderr=log, start_new_session=True)
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        sock = connect(socket_path)
+        if sock is not None:
+            return sock
+        time.sleep(0.02)
+
+    return None
+
+
+def call(socket_path, method, params, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Call a method on the daemon, starting it if needed. Returns the result or raises RuntimeError."""
+    sock = connect(socket_path)
+    if sock is None:
+        sock = start_daemon(socket_path, idle_timeout)
+        if sock is None:
+            raise RuntimeError("Failed to start the daemon on %s, see %s" % (socket_path, get_log_file(socket_path)))
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode("utf-8"))
+        stream.write(b"\n")
+        stream.flush()
+        line = stream.readline()
+
+    if not line:
+        raise RuntimeError("The daemon closed the connection")
+
+    response = json.loads(line)
+    if "error" in response:
+        raise RuntimeError(response["error"]["message"])
+    return response["result"]
+
+
+def get_call_params(method, args):
+    """Map the positional arguments of "call" to the params of method."""
+    names = METHOD_ARGS[method]
+    params = {"cwd": os.getcwd()}
+    for (i, name) in enumerate(names):
+        if name.startswith("*"):
+            params[name[1:]] = args[i:]
+            return params
+        if i < len(args):
+            params[name] = args[i]
+
+    if len(args) > len(names):
+        raise ValueError("Too many arguments for %s" % method)
+    return params
+
+
+def print_result(result):
+    """Print strings and lists of strings as plain lines for shell scripts, anything else as JSON."""
+    if isinstance(result, str):
+        print(result)
+    elif isinstance(result, list) and all(isinstance(r, str) for r in result):
+        for r in result:
+            print(r)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Serve the mongodev helpers from a long-lived process.')
+    parser.add_argument('--socket', default=get_default_socket(), help='Unix socket path')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='Seconds without a request before the daemon exits')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the daemon')
+    serve_parser.add_argument('--stdio', action='store_true', help='Serve on stdin and stdout instead of the socket')
+
+    subparsers.add_parser('start', help='Start the daemon if needed and print its socket')
+
+    call_parser = subparsers.add_parser('call', help='Call a method, starting the daemon if needed')
+    call_parser.add_argument('method', choices=sorted(METHOD_ARGS))
+    call_parser.add_argument('--jobs', type=int, help='jobs param of suite.batch')
+    call_parser.add_argument('args', nargs='*', help='Arguments of the method')
+
+    # The subcommand options may also come after the subcommand
+    for sub in (serve_parser, call_parser):
+        sub.add_argument('--socket', default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+        sub.add_argument('--idle-timeout', type=float, default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.action == 'serve':
+        rpc_server = Server(args.idle_timeout)
+        if args.stdio:
+            serve_stdio(rpc_server)
+        else:
+            serve_socket(rpc_server, args.socket)
+        sys.exit(0)
+
+    if args.action == 'start':
+        daemon_sock = connect(args.socket) or start_daemon(args.socket, args.idle_timeout)
+        if daemon_sock is None:
+            eprint("mongodev_daemon: Failed to start the daemon on %s, see %s" % (args.socket, get_log_file(args.socket)))
+            sys.exit(1)
+        daemon_sock.close()
+        print(args.socket)
+        sys.exit(0)
+
+    if args.jobs is not None and args.method != "suite.batch":
+        parser.error("--jobs is only a param of suite.batch")
+
+    try:
+        call_params = get_call_params(args.method, args.args)
+        if args.jobs is not None:
+            call_params["jobs"] = args.jobs
+        print_result(call(args.socket, args.method, call_params, args.idle_timeout))
+    except (RuntimeError, ValueError) as e:
+        eprint("mongodev_daemon: %s" % e)
+        sys.exit(1)
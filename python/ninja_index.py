@@ -0,0 +1,171 @@
+#! /usr/bin/env python3
+# Script is responsible for mapping unit test names to test executables from a ninja file
+#
+# The mapping is saved beside the ninja file as <ninja>.mongodev_tests.json. It is keyed on the
+# size and mtime of the ninja file and a hash of its "build +" statements, so a regenerated ninja
+# file is only re-parsed when the test targets changed.
+#
+# See ninja_parser.ts for the formats of the lines from the two ninja generators.
+#
+# Usage:
+#   ninja_index.py build.ninja fle_crud_test    - print the executable for a test
+#   ninja_index.py --json build.ninja           - print the whole mapping as JSON
+#
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+
+INDEX_SUFFIX = ".mongodev_tests.json"
+
+INDEX_VERSION = 1
+
+BUILD_TARGET = b"build +"
+
+# Original Module Parsing
+ORIG_PARSE_NINJA_EXEC = re.compile(r"^build \+([\w\.-]+):\s+EXEC\s+([\w/\\\.]+)")
+ORIG_PARSE_NINJA_PHONY = re.compile(r"^build \+([\w\.-]+):\s+phony\s+\+([\w/\\\.-]+)")
+
+# New Module Parsing
+NEW_PARSE_NINJA_CMD = re.compile(r"^build \+([\w\.-]+):\s+CMD\s+([\w/\\\.]+)")
+NEW_PARSE_NINJA_PHONY = re.compile(r"^build \+([\w\.-]+):\s+phony\s+\|\s+\+([\w\.\-]+)")
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def extract_build_targets(ninja_file):
+    """Get the "build +" statements of a ninja file with line continuations joined."""
+    statements = []
+    with open(ninja_file, "rb") as rfh:
+        try:
+            mm = mmap.mmap(rfh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return statements
+
+        with mm:
+            pos = 0 if mm[:len(BUILD_TARGET)] == BUILD_TARGET else mm.find(b"\n" + BUILD_TARGET)
+            while pos != -1:
+                if mm[pos:pos + 1] == b"\n":
+                    pos += 1
+
+                # A statement continues onto the next line when a line ends in $
+                end = mm.find(b"\n", pos)
+                while end != -1 and mm[end - 1:end] == b"$":
+                    end = mm.find(b"\n", end + 1)
+                if end == -1:
+                    end = len(mm)
+
+                statements.append(mm[pos:end])
+                pos = mm.find(b"\n" + BUILD_TARGET, end)
+
+    return statements
+
+
+def parse_build_targets(statements):
+    """Map test names to executables, the same way as parseNinjaFile in ninja_parser.ts."""
+    mapping_exec = {}
+    mapping_phony = {}
+
+    for statement in statements:
+        line = statement.decode("utf-8", "replace").replace("$\n", "").replace("$", "")
+
+        m = ORIG_PARSE_NINJA_EXEC.match(line)
+        if m is not None:
+            mapping_exec[m.group(1)] = m.group(2)
+            # Handle ungrouped unit tests
+            mapping_phony.setdefault(m.group(1), m.group(1))
+            continue
+
+        m = ORIG_PARSE_NINJA_PHONY.match(line)
+        if m is not None:
+            mapping_phony[m.group(1)] = m.group(2)
+
+        m = NEW_PARSE_NINJA_CMD.match(line)
+        if m is not None:
+            mapping_exec[m.group(1)] = m.group(2)
+            continue
+
+        m = NEW_PARSE_NINJA_PHONY.match(line)
+        if m is not None:
+            mapping_phony[m.group(1)] = m.group(2)
+
+    return {name: mapping_exec.get(target, "unknown") for name, target in mapping_phony.items()}
+
+
+def hash_statements(statements):
+    h = hashlib.blake2b(digest_size=16)
+    for statement in statements:
+        h.update(statement)
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def load_index(ninja_file):
+    """Load the test mapping for a ninja file, re-indexing only if the test targets changed."""
+    ninja_stat = os.stat(ninja_file)
+    index_file = ninja_file + INDEX_SUFFIX
+
+    cached = None
+    try:
+        with open(index_file) as rfh:
+            cached = json.load(rfh)
+        if cached.get("version") != INDEX_VERSION:
+            cached = None
+    except (OSError, ValueError):
+        pass
+
+    if cached is not None and cached["size"] == ninja_stat.st_size and cached["mtime"] == ninja_stat.st_mtime:
+        return cached["tests"]
+
+    statements = extract_build_targets(ninja_file)
+    statements_hash = hash_statements(statements)
+
+    if cached is not None and cached["hash"] == statements_hash:
+        tests = cached["tests"]
+    else:
+        tests = parse_build_targets(statements)
+
+    try:
+        with open(index_file, "w") as wfh:
+            json.dump({
+                "version": INDEX_VERSION,
+                "size": ninja_stat.st_size,
+                "mtime": ninja_stat.st_mtime,
+                "hash": statements_hash,
+                "tests": tests,
+            }, wfh)
+    except OSError as e:
+        eprint("Failed to save ninja index %s: %s" % (index_file, e))
+
+    return tests
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Map unit test names to test executables.')
+    parser.add_argument('--json', action='store_true', help='Print the whole mapping as JSON')
+    parser.add_argument('ninja_file', help='ninja file')
+    parser.add_argument('tests', nargs='*', help='test names, i.e. fle_crud_test')
+    args = parser.parse_args()
+
+    index = load_index(args.ninja_file)
+
+    if args.json:
+        print(json.dumps(index))
+
+    result = 0
+    for test in args.tests:
+        executable = index.get(test)
+        if executable is None:
+            eprint("Unknown test: %s" % test)
+            result = 1
+        else:
+            print(executable)
+
+    sys.exit(result)
@@ -1,4 +1,16 @@
 #!/bin/bash
+#
+# Recreates .venv in a mongo repo with poetry
+#
+# Built venvs are kept in a store keyed by a hash of poetry.lock, pyproject.toml and the python
+# version, so switching back to a branch with the same lock file restores its venv in seconds
+# with a copy on write clone, or a copy if the filesystem can not clone.
+#
+# Environment:
+#   MONGODEV_VENV_STORE      - store directory, default ~/.cache/mongodev/venvs
+#   MONGODEV_VENV_STORE_MAX  - number of venvs kept, the least recently used are removed, default 5
+#   MONGODEV_VENV_STORE=off  - always build the venv
+#
 
 set -e
 
@@ -7,19 +19,86 @@ if [ ! -f SConstruct ]; then
     exit 1
 fi
 
+PYTHON=/opt/mongodbtoolchain/v4/bin/python3
+POETRY_VERSION=1.5.1
+
+STORE=${MONGODEV_VENV_STORE:-${XDG_CACHE_HOME:-$HOME/.cache}/mongodev/venvs}
+STORE_MAX=${MONGODEV_VENV_STORE_MAX:-5}
+
+# Copy a directory tree with a copy on write clone, or a plain copy if the filesystem can not clone.
+# Never hardlinks, the venv is saved from the live .venv which pip may later change in place.
+clone_tree() {
+    cp -a --reflink=always "$1" "$2" 2>/dev/null && return
+    rm -rf "$2"
+    cp -a "$1" "$2"
+}
+
+venv_key() {
+    (
+        echo "poetry==$POETRY_VERSION"
+        $PYTHON -c 'import sys; print(sys.executable, sys.version)'
+        cat poetry.lock pyproject.toml 2>/dev/null
+    ) | sha256sum | cut -c1-32
+}
+
+VENV_DIR=$(pwd)/.venv
+
+if [ "$STORE" != "off" ]; then
+    KEY=$(venv_key)
+    ENTRY=$STORE/$KEY
+
+    if [ -d "$ENTRY/venv" ]; then
+        echo "Restoring venv $KEY from $STORE"
+        rm -rf .venv.restore
+        trap 'rm -rf .venv.restore' EXIT
+        clone_tree "$ENTRY/venv" .venv.restore
+
+        # The scripts in bin have the path of the venv the entry was built at
+        BUILT_AT=$(cat "$ENTRY/prefix")
+        if [ "$BUILT_AT" != "$VENV_DIR" ]; then
+            grep -rlI --fixed-strings "$BUILT_AT" .venv.restore/bin | xargs -r sed -i "s#$BUILT_AT#$VENV_DIR#g"
+        fi
+
+        rm -rf .venv
+        mv .venv.restore .venv
+        touch "$ENTRY"
+
+        echo Done reinstall venv at ".env"
+        exit 0
+    fi
+fi
+
 rm -rf .venv
 
 echo Setting up venv at ".env"
-/opt/mongodbtoolchain/v4/bin/python3 -m venv .venv
+$PYTHON -m venv .venv
 
 echo Activating Virtual Env ".env"
 . .venv/bin/activate
 
 echo Install poetry
-python -m pip install 'poetry==1.5.1'
+python -m pip install "poetry==$POETRY_VERSION"
 
+# pip and poetry keep their downloads and wheels in ~/.cache, shared by every venv build
 echo Install python modules via poetry
 export PYTHON_KEYRING_BACKEND=keyring.backends.null.Keyring
 python -m poetry install --no-root --sync
 
+if [ "$STORE" != "off" ]; then
+    echo "Saving venv $KEY to $STORE"
+    mkdir -p "$STORE"
+    TMP_ENTRY="$ENTRY.tmp.$$"
+    rm -rf "$TMP_ENTRY"
+    trap 'rm -rf "$TMP_ENTRY"' EXIT
+    mkdir "$TMP_ENTRY"
+    clone_tree .venv "$TMP_ENTRY/venv"
+    echo "$VENV_DIR" > "$TMP_ENTRY/prefix"
+    rm -rf "$ENTRY"
+    mv "$TMP_ENTRY" "$ENTRY"
+
+    # Keep the most recently used venvs, a restore touches its entry. Entries other runs are
+    # still saving are not counted or removed.
+    ls -1td "$STORE"/*/ | grep -v '\.tmp\.[0-9]*/$' | tail -n +$((STORE_MAX + 1)) | xargs -r rm -rf
+fi
+
 echo Done reinstall venv at ".env"
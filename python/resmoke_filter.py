@@ -0,0 +1,175 @@
+#! /usr/bin/env python3
+# Script is responsible for turning resmoke output into a stream of structured events
+#
+# Prints one JSON event per line, see resmoke_parser.ts for the formats of the lines:
+#   {"event": "fixture_start", "tag": "j0:s0:prim", "program": "mongod", "port": 20000, "pid": 2504298}
+#   {"event": "program_start", "tag": "js_test:x", "program": "/path/mongod", "port": 20040, "pid": 2506883}
+#   {"event": "test_start", "tag": "executor:js_test:job0", "test": "jstests/core/foo.js"}
+#   {"event": "test_end", "tag": "executor:js_test:job0", "test": "foo.js", "seconds": 1.2, "failed": false}
+#   {"event": "assertion", "tag": "j0:s0:prim", "line": "..."}
+#   {"event": "crash", "tag": "j0:s0:prim", "line": "..."}
+#   {"event": "line", "line": "..."}
+#   {"event": "dropped", "count": 1234}
+#
+# Raw lines are passed through as "line" events at a limited rate, all other events are always
+# printed. Lines are read through a bounded queue, so a slow reader of our output slows down
+# resmoke instead of buffering without limit.
+#
+# Usage:
+#   resmoke_filter.py -- python3 buildscripts/resmoke.py run --suite=core jstests/core/foo.js
+#   python3 buildscripts/resmoke.py run ... 2>&1 | resmoke_filter.py
+#
+import argparse
+import json
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+
+RESMOKE_FIXTURE_PARSER = re.compile(r"(?P<program>mongo\w?) started on port (?P<port>\d+) with pid (?P<pid>\d+)")
+SHELL_FIXTURE_PARSER = re.compile(
+    r'shell: Started program( |","attr":){"pid":"(?P<pid>\d+)","port":(?P<port>-?\d+),"argv":\["(?P<program>([/\w]+))')
+TEST_START_PARSER = re.compile(r"Running (?P<test>\S+)\.\.\.")
+TEST_END_PARSER = re.compile(r"(?P<test>\S+) ran in (?P<seconds>[\d.]+) seconds: (?P<result>.*)")
+
+# Literal substrings checked before any regex is run, and the events they can produce
+ASSERTION_MARKERS = ["BACKTRACE", "assert failed", "uncaught exception:", "Tripwire assertion"]
+CRASH_MARKERS = ["Got signal", "Invalid access", "ERROR: AddressSanitizer"]
+
+END_OF_INPUT = None
+
+
+def parse_line(line):
+    """Parse a resmoke output line into an event dict, or None if it is not interesting."""
+    # All the lines we care about are tagged, i.e. "[j0:s0:prim] ..."
+    if not line.startswith("["):
+        return None
+
+    tag_end = line.find("] ")
+    if tag_end == -1:
+        return None
+
+    tag = line[1:tag_end]
+    log_line = line[tag_end + 2:]
+
+    if log_line.startswith("mongo") and " started on port " in log_line:
+        m = RESMOKE_FIXTURE_PARSER.match(log_line)
+        if m is not None:
+            return {"event": "fixture_start", "tag": tag, "program": m.group("program"),
+                    "port": int(m.group("port")), "pid": int(m.group("pid"))}
+
+    if "Started program" in log_line:
+        m = SHELL_FIXTURE_PARSER.search(log_line)
+        if m is not None:
+            return {"event": "program_start", "tag": tag, "program": m.group("program"),
+                    "port": int(m.group("port")), "pid": int(m.group("pid"))}
+
+    if tag.startswith("executor"):
+        if "Running " in log_line:
+            m = TEST_START_PARSER.search(log_line)
+            if m is not None:
+                return {"event": "test_start", "tag": tag, "test": m.group("test")}
+
+        if " ran in " in log_line:
+            m = TEST_END_PARSER.search(log_line)
+            if m is not None:
+                return {"event": "test_end", "tag": tag, "test": m.group("test"),
+                        "seconds": float(m.group("seconds")),
+                        "failed": not m.group("result").startswith("no failures")}
+
+    for marker in CRASH_MARKERS:
+        if marker in log_line:
+            return {"event": "crash", "tag": tag, "line": line}
+
+    for marker in ASSERTION_MARKERS:
+        if marker in log_line:
+            return {"event": "assertion", "tag": tag, "line": line}
+
+    return None
+
+
+class RateLimiter:
+    """Allows up to rate items per second, counts the items that were not allowed."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.dropped = 0
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+
+        self.dropped += 1
+        return False
+
+
+def read_lines(stream, lines):
+    """Read lines into a bounded queue, blocks when the queue is full."""
+    for raw in stream:
+        lines.put(raw.decode("utf-8", "replace").rstrip("\r\n"))
+    lines.put(END_OF_INPUT)
+
+
+def write_event(out, event):
+    out.write(json.dumps(event))
+    out.write("\n")
+
+
+def filter_stream(stream, out, buffer_lines, line_rate):
+    lines = queue.Queue(maxsize=buffer_lines)
+    reader = threading.Thread(target=read_lines, args=(stream, lines), daemon=True)
+    reader.start()
+
+    limiter = RateLimiter(line_rate)
+    while True:
+        line = lines.get()
+        if line is END_OF_INPUT:
+            break
+
+        event = parse_line(line)
+        if event is not None:
+            write_event(out, event)
+
+        if line_rate > 0 and limiter.allow():
+            if limiter.dropped:
+                write_event(out, {"event": "dropped", "count": limiter.dropped})
+                limiter.dropped = 0
+            write_event(out, {"event": "line", "line": line})
+
+        # Only flush once we have caught up so bursts are written in large chunks
+        if lines.empty():
+            out.flush()
+
+    if limiter.dropped:
+        write_event(out, {"event": "dropped", "count": limiter.dropped})
+    out.flush()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Turn resmoke output into JSON events.')
+    parser.add_argument('--buffer-lines', type=int, default=10000,
+                        help='Maximum number of lines buffered before reading from resmoke blocks')
+    parser.add_argument('--line-rate', type=int, default=1000,
+                        help='Maximum raw lines per second to pass through, 0 for none')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='command to run, reads stdin if not given')
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+
+    if not command:
+        filter_stream(sys.stdin.buffer, sys.stdout, args.buffer_lines, args.line_rate)
+        sys.exit(0)
+
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    filter_stream(proc.stdout, sys.stdout, args.buffer_lines, args.line_rate)
+    sys.exit(proc.wait())
@@ -5,7 +5,8 @@ set -x
 PYTHON=$1
 RESMOKE=$2
 MONGODB_WAIT_FOR_DEBUGGER=$3
-RELATIVE_TEST_FILE=$4
+shift 3
+RELATIVE_TEST_FILES=("$@")
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 
 echo "CWD: $PWD"
@@ -17,8 +18,96 @@ then
     export MONGODB_WAIT_FOR_DEBUGGER
 fi
 
-echo run_resmoke.sh: Mapping JSTest to suite with '"$PYTHON" "$DIR/get_test_cmd.py" "$RELATIVE_TEST_FILE"'
-RESMOKE_ARGS=$($PYTHON "$DIR/get_test_cmd.py" "$RELATIVE_TEST_FILE")
+# With MONGODEV_RESMOKE_JOBS=N, run each suite of a batch with resmoke --jobs=N, 0 for one job per test up to the CPU count
+JOBS_ARGS=()
+if [[ -n "$MONGODEV_RESMOKE_JOBS" ]];
+then
+    JOBS_ARGS=(--jobs "$MONGODEV_RESMOKE_JOBS")
+fi
+
+# Socket of the daemon for the active venv, see get_default_socket() in mongodev_daemon.py
+daemon_socket() {
+    [[ -n "$VIRTUAL_ENV" ]] || return 1
+    local key
+    key=$(printf '%s\0%s' "$DIR" "$VIRTUAL_ENV" | sha256sum | cut -c1-12)
+    echo "${XDG_RUNTIME_DIR:-${TMPDIR:-/tmp}}/mongodev-$(id -u)-$key.sock"
+}
+
+# Same arguments as "mongodev_daemon.py call" for suite.resolve and suite.batch. With socat and jq
+# installed, a running daemon is called on its socket, without starting a python interpreter.
+# Otherwise, or if that fails, "mongodev_daemon.py call" is run, which also starts the daemon.
+daemon_call() {
+    local args=("$@") jobs=null socket request response
+    if command -v socat > /dev/null && command -v jq > /dev/null && socket=$(daemon_socket) && [[ -S "$socket" ]];
+    then
+        if [[ "$1" == "--jobs" ]];
+        then
+            jobs=$2
+            shift 2
+        fi
+        local method=$1
+        shift
+
+        request=$(jq -cn --arg method "$method" --arg cwd "$PWD" --argjson jobs "$jobs" '{jsonrpc: "2.0", id: 1, method: $method,
+            params: (if $method == "suite.batch" then {cwd: $cwd, files: $ARGS.positional, jobs: $jobs}
+                     else {cwd: $cwd, file: $ARGS.positional[0]} end)}' --args "$@" 2>/dev/null) &&
+        response=$(echo "$request" | socat -t 300 - "UNIX-CONNECT:$socket" 2>/dev/null) &&
+        [[ -n "$response" ]] &&
+        {
+            echo "$response" | jq -r 'if .error then ("mongodev_daemon: " + .error.message + "\n" | halt_error(1))
+                else .result | if type == "array" then .[] else . end end'
+            return
+        }
+    fi
+
+    "$PYTHON" "$DIR/mongodev_daemon.py" call "${args[@]}"
+}
+
+# With MONGODEV_DAEMON=1, ask the mongodev daemon which keeps the suite index loaded between runs
+if [[ "$MONGODEV_DAEMON" == "1" ]];
+then
+    BATCH_CMD=(daemon_call "${JOBS_ARGS[@]}" suite.batch)
+    SINGLE_CMD=(daemon_call suite.resolve)
+else
+    BATCH_CMD=("$PYTHON" "$DIR/get_test_cmd.py" --batch "${JOBS_ARGS[@]}")
+    SINGLE_CMD=("$PYTHON" "$DIR/get_test_cmd.py")
+fi
+
+if [[ ${#RELATIVE_TEST_FILES[@]} -gt 1 ]];
+then
+    # Run each suite once with all of its tests so fixtures are only started once per suite
+    echo run_resmoke.sh: Grouping JSTests by suite with "${BATCH_CMD[@]}" "${RELATIVE_TEST_FILES[@]}"
+    if ! BATCH_OUTPUT=$("${BATCH_CMD[@]}" "${RELATIVE_TEST_FILES[@]}");
+    then
+        echo "run_resmoke.sh: Failed to group the tests by suite" >&2
+        exit 1
+    fi
+
+    RESMOKE_COMMANDS=()
+    if [[ -n "$BATCH_OUTPUT" ]];
+    then
+        mapfile -t RESMOKE_COMMANDS <<< "$BATCH_OUTPUT"
+    fi
+    if [[ ${#RESMOKE_COMMANDS[@]} -eq 0 ]];
+    then
+        echo "run_resmoke.sh: No suite found for ${RELATIVE_TEST_FILES[*]}" >&2
+        exit 1
+    fi
+
+    RESULT=0
+    for RESMOKE_ARGS in "${RESMOKE_COMMANDS[@]}"; do
+        echo "$PYTHON $RESMOKE" run $RESMOKE_ARGS
+        $PYTHON "$RESMOKE" run $RESMOKE_ARGS || RESULT=$?
+    done
+    exit $RESULT
+fi
+
+echo run_resmoke.sh: Mapping JSTest to suite with "${SINGLE_CMD[@]}" "${RELATIVE_TEST_FILES[0]}"
+if ! RESMOKE_ARGS=$("${SINGLE_CMD[@]}" "${RELATIVE_TEST_FILES[0]}");
+then
+    echo "run_resmoke.sh: Failed to find the suite of ${RELATIVE_TEST_FILES[0]}" >&2
+    exit 1
+fi
 
 # To test feature flags, add the following to each of the lines
 # Be careful with quoting and spacing
@@ -9,12 +9,17 @@
 MRLOG=$1
 NINJA_FILE=$2
 FILE_NAME=$3
+DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 
 BASE_COMMAND="ninja -f $NINJA_FILE  -j 200 -k 0"
 
 if [[ "$FILE_NAME" =~ .*_test.*.cpp ]]; then
     TEST_NAME=$(echo $FILE_NAME | sed "s#.*\/\(.*\).cpp#\1#")
 
+    if TEST_EXECUTABLE=$(python3 "$DIR/ninja_index.py" "$NINJA_FILE" "$TEST_NAME"); then
+        echo "Test executable: $TEST_EXECUTABLE"
+    fi
+
     echo "$MRLOG" -c -e ninja -- -f "$NINJA_FILE" -j 200 -k 0 "+$TEST_NAME"
     $MRLOG -c -e ninja -- -f "$NINJA_FILE" -j 200 -k 0 "+$TEST_NAME"
 
@@ -0,0 +1,452 @@
+#! /usr/bin/env python3
+# Script is responsible for symbolizing the backtraces of a test run in one pass
+#
+# Reads the BACKTRACE log lines from mongod logs, resmoke output and the files written to
+# --setParameter backtraceLogFile (i.e. /data/db/job0/mongorunner/*.stacktrace). Frames from all
+# the files are deduplicated by (build ID, offset), so a crash seen on every node of a fixture is
+# only symbolized once.
+#
+# Addresses are resolved in bulk by a pool of long-lived llvm-symbolizer processes, or by LLDB if
+# llvm-symbolizer is not installed. Results are cached per build ID in
+# ~/.cache/mongodev/symbols/<build id>.json, so later runs of the same binary are free.
+#
+# The main executable has no path in the backtrace, it is found by build ID among --binary and
+# the mongo executables in --search-dir.
+#
+# Usage:
+#   symbolize_stacktraces.py /data/db/job0/mongorunner/ resmoke.log
+#   symbolize_stacktraces.py --binary build/install/bin/mongod --json mongod.log
+#
+import argparse
+import concurrent.futures
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import elf_notes
+
+# Places to look for llvm-symbolizer after the PATH, the ones in older toolchains can not print JSON
+SYMBOLIZER_PATHS = ["/opt/mongodbtoolchain/v4/bin/llvm-symbolizer", "/opt/mongodbtoolchain/v3/bin/llvm-symbolizer"]
+
+DEFAULT_SEARCH_DIRS = [os.path.join("build", "install", "bin")]
+
+SEARCH_PROGRAMS = ["mongod", "mongos", "mongo", "mongosh"]
+
+# File names searched for in directories given as inputs
+INPUT_SUFFIXES = (".stacktrace", ".log")
+
+# ELF type of position dependent executables, their frames are symbolized by absolute address
+ET_EXEC = 2
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def get_cache_dir():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "mongodev", "symbols")
+
+
+def find_backtraces(line):
+    """Get the bt attribute of a BACKTRACE log line, None if the line is not one."""
+    if "backtrace" not in line:
+        return None
+
+    # Lines from resmoke are prefixed with a tag, i.e. "[j0:s0:prim] {...}"
+    start = line.find("{")
+    if start == -1:
+        return None
+
+    try:
+        doc = json.loads(line[start:])
+    except ValueError:
+        return None
+
+    if "backtrace" in doc:
+        return doc
+
+    bt = doc.get("attr", {}).get("bt")
+    if isinstance(bt, dict) and "backtrace" in bt:
+        return bt
+
+    return None
+
+
+def read_backtraces(path):
+    """Get a list of (line number, bt) for the backtraces in a file."""
+    backtraces = []
+    with open(path, "r", errors="replace") as rfh:
+        for (line_number, line) in enumerate(rfh, 1):
+            bt = find_backtraces(line)
+            if bt is not None:
+                backtraces.append((line_number, bt))
+
+    return backtraces
+
+
+def expand_inputs(paths):
+    """Expand directories into the stacktrace and log files under them."""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+
+        for (root, _, names) in os.walk(path):
+            files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith(INPUT_SUFFIXES))
+
+    return files
+
+
+def find_binaries(binaries, search_dirs):
+    """Get a dict of build ID to path for the candidate main executables."""
+    candidates = list(binaries)
+    for directory in search_dirs:
+        candidates.extend(os.path.join(directory, p) for p in SEARCH_PROGRAMS)
+
+    by_build_id = {}
+    for path in candidates:
+        build_id = elf_notes.get_build_id(path) if os.path.isfile(path) else None
+        if build_id is not None:
+            by_build_id.setdefault(build_id, os.path.abspath(path))
+
+    return by_build_id
+
+
+class Frame:
+    """A frame of a backtrace, module is (build ID, path) or None if the binary is unknown."""
+
+    def __init__(self, raw, module, address):
+        self.raw = raw
+        self.module = module
+        self.address = address
+
+
+def parse_frames(bt, binaries):
+    """Get the frames of a backtrace with the module and address to symbolize them with."""
+    somap = {entry.get("b"): entry for entry in bt.get("processInfo", {}).get("somap", [])}
+
+    frames = []
+    for raw in bt.get("backtrace", []):
+        entry = somap.get(raw.get("b"))
+        module = None
+        address = None
+        if entry is not None and entry.get("buildId"):
+            build_id = entry["buildId"].lower()
+            path = binaries.get(build_id)
+            if path is None and entry.get("path") and elf_notes.get_build_id(entry["path"]) == build_id:
+                path = entry["path"]
+                binaries[build_id] = path
+
+            if path is not None:
+                module = (build_id, path)
+                address = int(raw["a"], 16) if entry.get("elfType") == ET_EXEC else int(raw["o"], 16)
+
+        frames.append(Frame(raw, module, address))
+
+    return frames
+
+
+class SymbolCache:
+    """Persistent cache of address to frames, one file per build ID."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = {}
+        self.dirty = set()
+        self.hits = 0
+
+    def file_name(self, build_id):
+        return os.path.join(self.directory, build_id + ".json")
+
+    def load(self, build_id):
+        if build_id not in self.entries:
+            try:
+                with open(self.file_name(build_id)) as rfh:
+                    self.entries[build_id] = json.load(rfh)
+            except (OSError, ValueError):
+                self.entries[build_id] = {}
+
+        return self.entries[build_id]
+
+    def get(self, build_id, address):
+        # Empty entries are from older versions that cached failures, look those up again
+        found = self.load(build_id).get("%x" % address)
+        if not found:
+            return None
+        self.hits += 1
+        return found
+
+    def put(self, build_id, address, symbolized):
+        """Cache the frames of an address, unless there are none, which may be a transient failure."""
+        if not symbolized:
+            return
+        self.load(build_id)["%x" % address] = symbolized
+        self.dirty.add(build_id)
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for build_id in self.dirty:
+                tmp_file = self.file_name(build_id) + ".tmp"
+                with open(tmp_file, "w") as wfh:
+                    json.dump(self.entries[build_id], wfh)
+                os.replace(tmp_file, self.file_name(build_id))
+        except OSError as e:
+            eprint("Failed to save symbol cache %s: %s" % (self.directory, e))
+
+        self.dirty.clear()
+
+
+class LLVMSymbolizer:
+    """A long-lived llvm-symbolizer process answering one JSON line per query."""
+
+    def __init__(self, executable):
+        self.proc = subprocess.Popen([executable, "--output-style=JSON", "--demangle", "--inlines"],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+                                     bufsize=1)
+
+    def symbolize(self, queries):
+        """Symbolize a list of (path, address), returns a list of lists of frames."""
+
+        def write():
+            try:
+                for (path, address) in queries:
+                    self.proc.stdin.write('"%s" 0x%x\n' % (path, address))
+                self.proc.stdin.flush()
+            except OSError:
+                # It exited, the reads below get EOF and the queries are not cached
+                pass
+
+        # Write from another thread so a full stdout pipe can not block us while we write
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+
+        results = []
+        for _ in queries:
+            results.append(parse_llvm_symbolizer_line(self.proc.stdout.readline()))
+        writer.join()
+
+        return results
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        self.proc.wait()
+
+
+def parse_llvm_symbolizer_line(line):
+    """Get the frames of a line of llvm-symbolizer JSON output, [] if it failed or exited."""
+    try:
+        result = json.loads(line)
+    except ValueError:
+        return []
+    if not isinstance(result, dict) or result.get("Error"):
+        return []
+
+    frames = []
+    for symbol in result.get("Symbol", []):
+        if not symbol.get("FunctionName"):
+            continue
+        frames.append({
+            "function": symbol["FunctionName"],
+            "file": symbol.get("FileName") or None,
+            "line": symbol.get("Line") or None,
+            "column": symbol.get("Column") or None,
+        })
+
+    return frames
+
+
+def supports_json(executable):
+    """Check that llvm-symbolizer can print JSON, which was added in LLVM 13."""
+    try:
+        proc = subprocess.run([executable, "--output-style=JSON", "--obj=" + executable, "0x0"],
+                              stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True, timeout=30, check=False)
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+    if proc.returncode != 0:
+        return False
+
+    try:
+        json.loads(proc.stdout.splitlines()[0])
+    except (IndexError, ValueError):
+        return False
+
+    return True
+
+
+def find_llvm_symbolizer():
+    candidates = [shutil.which("llvm-symbolizer")] + SYMBOLIZER_PATHS
+    for path in candidates:
+        if path is not None and os.access(path, os.X_OK) and supports_json(path):
+            return path
+
+    return None
+
+
+def symbolize_with_llvm(executable, queries, jobs):
+    """Symbolize (path, address) queries with a pool of llvm-symbolizer processes."""
+    jobs = max(1, min(jobs, len(queries)))
+    symbolizers = [LLVMSymbolizer(executable) for _ in range(jobs)]
+    try:
+        # Queries for the same binary go to the same process, so it loads the debug info once
+        chunks = [[] for _ in range(jobs)]
+        for i, query in enumerate(sorted(queries)):
+            chunks[i * jobs // len(queries)].append(query)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(lambda sc: sc[0].symbolize(sc[1]), zip(symbolizers, chunks))
+            return {query: frames for (chunk, chunk_results) in zip(chunks, results)
+                    for (query, frames) in zip(chunk, chunk_results)}
+    finally:
+        for symbolizer in symbolizers:
+            symbolizer.close()
+
+
+def symbolize_with_lldb(queries):
+    """Symbolize (path, address) queries with one LLDB target per binary."""
+    import lldb  # pylint: disable=import-outside-toplevel
+
+    debugger = lldb.SBDebugger.Create()
+    targets = {}
+    results = {}
+    for (path, address) in queries:
+        if path not in targets:
+            targets[path] = debugger.CreateTarget(path)
+        target = targets[path]
+
+        context = target.ResolveSymbolContextForAddress(target.ResolveFileAddress(address),
+                                                        lldb.eSymbolContextEverything)
+        function = context.GetFunction().GetName() or context.GetSymbol().GetName()
+        line_entry = context.GetLineEntry()
+        frames = []
+        if function:
+            frames.append({
+                "function": function,
+                "file": line_entry.GetFileSpec().fullpath if line_entry.IsValid() else None,
+                "line": line_entry.GetLine() if line_entry.IsValid() else None,
+                "column": line_entry.GetColumn() if line_entry.IsValid() else None,
+            })
+        results[(path, address)] = frames
+
+    lldb.SBDebugger.Destroy(debugger)
+    return results
+
+
+def symbolize(frames, cache, backend, jobs):
+    """Fill in symbolized frames, returns the number of unique addresses that were resolved."""
+    pending = {}
+    for frame in frames:
+        if frame.module is None:
+            continue
+        (build_id, path) = frame.module
+        if cache.get(build_id, frame.address) is None:
+            pending[(path, frame.address)] = build_id
+
+    if pending:
+        if backend == "lldb":
+            results = symbolize_with_lldb(list(pending))
+        else:
+            results = symbolize_with_llvm(backend, list(pending), jobs)
+
+        for (query, symbolized) in results.items():
+            cache.put(pending[query], query[1], symbolized)
+
+    return len(pending)
+
+
+def format_frame(index, frame, cache):
+    """Format a frame as lines, falling back to the symbol mongod printed itself."""
+    raw = frame.raw
+    symbolized = cache.get(frame.module[0], frame.address) if frame.module is not None else None
+    if not symbolized:
+        return [" #%-3d 0x%s  %s" % (index, raw.get("a", "?"), raw.get("C") or raw.get("s") or "??")]
+
+    lines = []
+    # llvm-symbolizer lists the innermost inlined function first
+    for (i, s) in enumerate(symbolized):
+        location = "%s:%s" % (s["file"], s["line"]) if s["file"] else "??"
+        if i == 0:
+            lines.append(" #%-3d 0x%s  %s at %s" % (index, raw.get("a", "?"), s["function"], location))
+        else:
+            lines.append("        inlined into %s at %s" % (s["function"], location))
+
+    return lines
+
+
+def get_backend(name):
+    if name in ("auto", "llvm-symbolizer"):
+        executable = find_llvm_symbolizer()
+        if executable is not None:
+            return executable
+        if name == "llvm-symbolizer":
+            return None
+
+    try:
+        import lldb  # pylint: disable=import-outside-toplevel,unused-import
+        return "lldb"
+    except ImportError:
+        return None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Symbolize the backtraces of a test run.')
+    parser.add_argument('--binary', action='append', default=[], help='mongod, mongos or other executable')
+    parser.add_argument('--search-dir', action='append', help='Directories to search for mongo executables')
+    parser.add_argument('--backend', choices=['auto', 'llvm-symbolizer', 'lldb'], default='auto')
+    parser.add_argument('--jobs', type=int, default=4, help='Number of llvm-symbolizer processes')
+    parser.add_argument('--cache-dir', default=get_cache_dir(), help='Directory of the symbol cache')
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of text')
+    parser.add_argument('inputs', nargs='+', help='log or stacktrace files, or directories of them')
+    args = parser.parse_args()
+
+    symbolizer_backend = get_backend(args.backend)
+    if symbolizer_backend is None:
+        eprint("Neither llvm-symbolizer nor the lldb Python module is available")
+        sys.exit(1)
+
+    start_time = time.monotonic()
+    known_binaries = find_binaries(args.binary, args.search_dir or DEFAULT_SEARCH_DIRS)
+
+    traces = []
+    for input_file in expand_inputs(args.inputs):
+        for (trace_line, trace) in read_backtraces(input_file):
+            traces.append((input_file, trace_line, parse_frames(trace, known_binaries)))
+
+    symbol_cache = SymbolCache(args.cache_dir)
+    all_frames = [f for (_, _, frames) in traces for f in frames]
+    resolved = symbolize(all_frames, symbol_cache, symbolizer_backend, args.jobs)
+    symbol_cache.save()
+
+    if args.json:
+        print(json.dumps([{
+            "file": input_file,
+            "line": trace_line,
+            "frames": [dict(f.raw, symbolized=symbol_cache.get(f.module[0], f.address) if f.module else None)
+                       for f in frames],
+        } for (input_file, trace_line, frames) in traces], indent=2))
+    else:
+        for (input_file, trace_line, frames) in traces:
+            print("== %s:%d ==" % (input_file, trace_line))
+            for (frame_index, trace_frame) in enumerate(frames):
+                for text in format_frame(frame_index, trace_frame, symbol_cache):
+                    print(text)
+            print()
+
+    unknown = {f.raw.get("b") for f in all_frames if f.module is None}
+    eprint("%d backtraces, %d frames, %d addresses symbolized in %.2fs%s" % (
+        len(traces), len(all_frames), resolved, time.monotonic() - start_time,
+        ", %d modules without a binary" % len(unknown) if unknown else ""))
@@ -0,0 +1,249 @@
+#! /usr/bin/env python3
+# Script is responsible for cataloging the suites and tests in every unit test executable
+#
+# The executables come from the ninja test index (see ninja_index.py). Each one is asked for its
+# tests with --list, in parallel, and the catalog is saved beside the ninja file as
+# <ninja>.mongodev_catalog.json. An executable is only listed again when both its mtime and its
+# GNU build ID changed, so relinking an unchanged test does not cost a run.
+#
+# mongo unittest executables print one suite per line for --list, the googletest based ones print
+# each suite followed by its indented tests.
+#
+# Usage:
+#   unittest_catalog.py build.ninja index                        - refresh the catalog
+#   unittest_catalog.py build.ninja list --suite QueryPlannerTest
+#   unittest_catalog.py build.ninja run --suite QueryPlannerTest - run a suite in every executable
+#   unittest_catalog.py build.ninja run --filter 'Sharding.*'    - run matching tests everywhere
+#
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import elf_notes
+import ninja_index
+
+CATALOG_SUFFIX = ".mongodev_catalog.json"
+
+CATALOG_VERSION = 1
+
+LIST_TIMEOUT_SECONDS = 60
+
+# Lines of output kept from a failed run
+FAILURE_TAIL_LINES = 40
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_list_output(output):
+    """Parse --list output into a dict of suite to a list of tests.
+
+    The list of tests is empty when only suite names are printed.
+    """
+    suites = {}
+    current = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+
+        if line[0].isspace() and current is not None:
+            # googletest: "  TestName  # GetParam() = ..."
+            suites[current].append(line.split("#", 1)[0].strip())
+            continue
+
+        current = line.strip()
+        if current.endswith("."):
+            current = current[:-1]
+        suites.setdefault(current, [])
+
+    return suites
+
+
+def list_executable(executable):
+    """Get (executable, suites, error) by running the executable with --list."""
+    try:
+        proc = subprocess.run([executable, "--list"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=LIST_TIMEOUT_SECONDS, check=False)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return (executable, None, str(e))
+
+    if proc.returncode != 0:
+        return (executable, None, proc.stderr.decode("utf-8", "replace").strip()[-200:])
+
+    return (executable, parse_list_output(proc.stdout.decode("utf-8", "replace")), None)
+
+
+def get_catalog_file(ninja_file):
+    return ninja_file + CATALOG_SUFFIX
+
+
+def load_catalog(ninja_file, jobs=None):
+    """Load the catalog, listing the executables that were rebuilt with a pool of --list runs.
+
+    Returns a dict of executable to {"mtime", "build_id", "suites"}. Executables that are not
+    built yet are left out.
+    """
+    catalog_file = get_catalog_file(ninja_file)
+    cached = {}
+    try:
+        with open(catalog_file) as rfh:
+            data = json.load(rfh)
+        if data.get("version") == CATALOG_VERSION:
+            cached = data["executables"]
+    except (OSError, ValueError):
+        pass
+
+    build_dir = os.path.dirname(os.path.abspath(ninja_file))
+    executables = sorted({os.path.join(build_dir, e) for e in ninja_index.load_index(ninja_file).values()
+                          if e != "unknown"})
+
+    catalog = {}
+    stale = []
+    for executable in executables:
+        try:
+            mtime = os.stat(executable).st_mtime
+        except OSError:
+            continue
+
+        entry = cached.get(executable)
+        if entry is not None and entry["mtime"] == mtime:
+            catalog[executable] = entry
+            continue
+
+        build_id = elf_notes.get_build_id(executable)
+        if entry is not None and build_id is not None and entry["build_id"] == build_id:
+            catalog[executable] = dict(entry, mtime=mtime)
+            continue
+
+        catalog[executable] = {"mtime": mtime, "build_id": build_id, "suites": None}
+        stale.append(executable)
+
+    if stale:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            for (executable, suites, error) in pool.map(list_executable, stale):
+                if error is not None:
+                    eprint("Failed to list %s: %s" % (executable, error))
+                    del catalog[executable]
+                else:
+                    catalog[executable]["suites"] = suites
+
+    if stale or len(catalog) != len(cached):
+        try:
+            with open(catalog_file, "w") as wfh:
+                json.dump({"version": CATALOG_VERSION, "executables": catalog}, wfh)
+        except OSError as e:
+            eprint("Failed to save unit test catalog %s: %s" % (catalog_file, e))
+
+    return catalog
+
+
+def select(catalog, suites, name_filter):
+    """Get a dict of executable to the matching suites, an empty list means all of its suites.
+
+    Executables that only list suite names are kept for a name filter since their tests are not known.
+    """
+    name_regex = re.compile(name_filter) if name_filter else None
+
+    selected = {}
+    for (executable, entry) in catalog.items():
+        matches = []
+        for (suite, tests) in entry["suites"].items():
+            if suites and suite not in suites:
+                continue
+            if name_regex is not None and tests and not any(name_regex.search(t) for t in tests):
+                continue
+            matches.append(suite)
+
+        if matches:
+            selected[executable] = [] if len(matches) == len(entry["suites"]) else matches
+
+    return selected
+
+
+def run_executable(executable, suites, name_filter):
+    """Run the selected suites of one executable, returns a result dict."""
+    command = [executable]
+    for suite in suites:
+        command.extend(["--suite", suite])
+    if name_filter:
+        command.extend(["--filter", name_filter])
+
+    start = time.monotonic()
+    proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+    output = proc.stdout.decode("utf-8", "replace")
+
+    return {
+        "executable": executable,
+        "command": command,
+        "returncode": proc.returncode,
+        "seconds": time.monotonic() - start,
+        "output": "\n".join(output.splitlines()[-FAILURE_TAIL_LINES:]) if proc.returncode != 0 else "",
+    }
+
+
+def run_selected(selected, name_filter, jobs=None):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(run_executable, e, s, name_filter) for (e, s) in sorted(selected.items())]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            print("%-6s %7.1fs  %s" % ("PASS" if result["returncode"] == 0 else "FAIL", result["seconds"],
+                                       " ".join(result["command"])), flush=True)
+            yield result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Catalog and run the tests in all unit test executables.')
+    parser.add_argument('--jobs', type=int, help='Number of executables to list or run at once')
+    parser.add_argument('ninja_file', help='ninja file')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    subparsers.add_parser('index', help='Refresh the catalog')
+
+    for name in ['list', 'run']:
+        sub = subparsers.add_parser(name, help='%s matching suites and tests' % name.capitalize())
+        sub.add_argument('--suite', action='append', help='Suite name, can be repeated')
+        sub.add_argument('--filter', help='Regular expression for test names')
+    subparsers.choices['list'].add_argument('--json', action='store_true', help='Print JSON')
+
+    args = parser.parse_args()
+
+    unit_catalog = load_catalog(args.ninja_file, args.jobs)
+
+    if args.action == 'index':
+        print("%d executables, %d suites" % (len(unit_catalog),
+                                             sum(len(e["suites"]) for e in unit_catalog.values())))
+        sys.exit(0)
+
+    selection = select(unit_catalog, args.suite, args.filter)
+
+    if args.action == 'list':
+        if args.json:
+            print(json.dumps({e: {s: unit_catalog[e]["suites"][s] for s in (suites or unit_catalog[e]["suites"])}
+                              for (e, suites) in selection.items()}, indent=2))
+        else:
+            for (exe, suites) in sorted(selection.items()):
+                for suite in suites or sorted(unit_catalog[exe]["suites"]):
+                    tests = unit_catalog[exe]["suites"][suite]
+                    if args.filter and tests:
+                        tests = [t for t in tests if re.search(args.filter, t)]
+                    print("%s %s %s" % (exe, suite, " ".join(tests)))
+        sys.exit(0)
+
+    if not selection:
+        eprint("No unit tests match")
+        sys.exit(1)
+
+    results = list(run_selected(selection, args.filter, args.jobs))
+    failed = [r for r in results if r["returncode"] != 0]
+    for r in failed:
+        print("\n=== %s ===\n%s" % (" ".join(r["command"]), r["output"]))
+
+    print("\n%d executables, %d failed" % (len(results), len(failed)))
+    sys.exit(1 if failed else 0)
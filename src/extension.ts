@@ -6,8 +6,9 @@ import * as vscode from 'vscode';
 import * as path from 'path';
 import * as fs from 'fs';
 import * as fsPromises from 'fs/promises';
-import { parseNinjaFile } from './ninja_parser';
-import { mongoProcessList, MongoDProcess, MongoSProcess } from './mongo_process';
+import { loadNinjaIndex } from './ninja_parser';
+import { MongodevDaemon } from './mongodev_daemon';
+import { mongoProcessList, MongoDProcess, MongoSProcess, MongoProceses } from './mongo_process';
 import { setTimeout } from 'timers/promises';
 import { parseResmokeCommand } from './resmoke_parser';
 import * as which from 'which';
@@ -27,6 +28,7 @@ const CONFIG_TEST_SCROLLBACK = "testScrollback";
 
 let mongodbRoot = "";
 let extensionContext: vscode.ExtensionContext;
+let daemon: MongodevDaemon | undefined;
 
 const customChalk = new chalk.Instance({ level: 3 });
 
@@ -66,6 +68,13 @@ export function activate(context: vscode.ExtensionContext) {
 
 	registerDebugHelpers();
 
+	// The daemon runs the configured python, start a new one on the next call
+	context.subscriptions.push(vscode.workspace.onDidChangeConfiguration((e) => {
+		if (e.affectsConfiguration("mongodev." + CONFIG_PYTHON3)) {
+			daemon = undefined;
+		}
+	}));
+
 	checkForMissingFiles();
 	// TODO - consider setTimeout() from nodejs?
 }
@@ -93,6 +102,7 @@ function registerDiagnostics(collection: vscode.DiagnosticCollection) {
 }
 
 // Tuples of RegEx to search for and message to display for user
+// Keep in sync with MATCHERS in python/log_analyzer.py, same entries in the same order
 const errorMatchers: Array<[RegExp, string]> = [
 	[/BACKTRACE/, "Assertion"],
 	[/BadValue:.*/, "BadValue error"],
@@ -103,57 +113,81 @@ const errorMatchers: Array<[RegExp, string]> = [
 	[/mongo program was not running at.*/, "Mongo Program had bad exit"],
 	[/Invalid access.*/, "Mongo Program crashed"],
 	[/Got signal.*/, "Mongo Program got fatal signal"],
-	[/Got signal.*/, "Mongo Program got fatal signal"],
 	[/ERROR: AddressSanitizer.*/, "Address Sanitizer failure"],
 	[/Tripwire assertion.*/, "Tripwire Assertion"]
 ];
 
+// A failure found in a log, the same as printed by python/log_analyzer.py
+interface LogMatch {
+	line: number,
+	column: number,
+	length: number,
+	// Index in errorMatchers
+	matcher: number,
+	message: string
+}
+
+function scanLogText(text: string): Array<LogMatch> {
+	let line_num = 0;
+	const lines = text.split("\n");
+	let matches: Array<LogMatch> = [];
+
+	for (const line of lines) {
+		errorMatchers.forEach((em, i) => {
+			const match = line.match(em[0]);
+
+			if (match) {
+				matches.push({ line: line_num, column: match.index ?? 0, length: match[0].length, matcher: i, message: em[1] });
+			}
+		});
+
+		line_num += 1;
+	}
+
+	return matches;
+}
+
 /**
  * Scan a log file for "errors" to highlight
  *
+ * Saved logs are scanned by the daemon, which keeps the results until the file changes.
+ *
  * @param document
  * @param collection
  * @returns the line number with the first error
  */
-function updateDiagnostics(document: vscode.TextDocument, collection: vscode.DiagnosticCollection): number {
+async function updateDiagnostics(document: vscode.TextDocument, collection: vscode.DiagnosticCollection): Promise<number> {
 	if (document && path.basename(document.uri.fsPath).match(/(.*.log|log[_A-Za-z0-9]*|log_.*)/)) {
-		collection.delete(document.uri);
-
-		const text = document.getText();
-
-		let line_num = 0;
-		const lines = text.split("\n");
-		let first_line_num: number = -1;
-		let diags: Array<vscode.Diagnostic> = [];
-
-		for (const line of lines) {
-			for (const em of errorMatchers) {
-				const match = line.match(em[0]);
-
-				if (match) {
-					if (first_line_num === -1) {
-						first_line_num = line_num;
-					}
-
-					let pos = match.index ?? 0;
-					diags.push({
-						code: '',
-						message: em[1],
-						range: new vscode.Range(new vscode.Position(line_num, pos), new vscode.Position(line_num, pos + match[0].length)),
-						severity: vscode.DiagnosticSeverity.Error,
-						source: 'mongodev'
-					});
-				}
+		let matches: Array<LogMatch> | undefined;
+		if (document.uri.scheme === "file" && !document.isDirty) {
+			try {
+				matches = await getDaemon().call<Array<LogMatch>>("log.scan", { file: document.uri.fsPath });
+			} catch (e) {
+				mlog(`Daemon log scan failed, scanning the document instead: ${e}`);
 			}
+		}
 
-			line_num += 1;
+		if (matches === undefined) {
+			matches = scanLogText(document.getText());
 		}
 
+		collection.delete(document.uri);
+
+		let diags: Array<vscode.Diagnostic> = matches.map((m) => {
+			return {
+				code: '',
+				message: m.message,
+				range: new vscode.Range(new vscode.Position(m.line, m.column), new vscode.Position(m.line, m.column + m.length)),
+				severity: vscode.DiagnosticSeverity.Error,
+				source: 'mongodev'
+			};
+		});
+
 		if (diags.length > 0) {
 			collection.set(document.uri, diags);
 		}
 
-		return first_line_num || 0;
+		return matches.length > 0 ? matches[0].line : 0;
 	}
 
 	return 0;
@@ -165,6 +199,15 @@ function getPythonScriptsDir() {
 	return path.join(extensionPath, "python");
 }
 
+function getDaemon() {
+	if (daemon === undefined) {
+		const python3 = vscode.workspace.getConfiguration("mongodev").get(CONFIG_PYTHON3) as string;
+		daemon = new MongodevDaemon(python3, getPythonScriptsDir(), mongodbRoot);
+	}
+
+	return daemon;
+}
+
 
 function wrapWithMrlogArray(cmd: string, args: string[]): string[] {
 	const mrlog = vscode.workspace.getConfiguration("mongodev").get(CONFIG_MRLOG) as string;
@@ -251,8 +294,10 @@ function getCommandForTask(taskName: string): vscode.ShellExecution {
 
 			const cmd = wrapWithMrlogFile("/bin/bash", `${python_scripts_dir}/run_virtualenv.sh ${python_scripts_dir}/run_resmoke.sh ${python3} ${mongodbRoot}/buildscripts/resmoke.py 0 \${file}`, testFile);
 
+			// run_resmoke.sh asks the daemon for the suite
 			return new vscode.ShellExecution(cmd, {
 				cwd: cwd,
+				env: { MONGODEV_DAEMON: "1" },
 			});
 		}
 
@@ -383,7 +428,7 @@ class CustomBuildTaskTerminal implements vscode.Pseudoterminal {
 		const python_scripts_dir = getPythonScriptsDir();
 		const python3 = vscode.workspace.getConfiguration("mongodev").get(CONFIG_PYTHON3) as string;
 
-		const args = wrapWithMrlogArray("/bin/bash", ['-c', `${python_scripts_dir}/run_virtualenv.sh ${python_scripts_dir}/run_resmoke.sh ${python3} ${mongodbRoot}/buildscripts/resmoke.py 1 ${test_file}`]);
+		const args = wrapWithMrlogArray("/bin/bash", ['-c', `MONGODEV_DAEMON=1 ${python_scripts_dir}/run_virtualenv.sh ${python_scripts_dir}/run_resmoke.sh ${python3} ${mongodbRoot}/buildscripts/resmoke.py 1 ${test_file}`]);
 		this.writeEmitter.fire(`Args: ${JSON.stringify(args)}\r\n`);
 
 
@@ -672,9 +717,9 @@ function registerTaskProviderAndListeners(collection: vscode.DiagnosticCollectio
 
 				var openPath = vscode.Uri.file(testFile);
 				vscode.workspace.openTextDocument(openPath).then(doc => {
-					return vscode.window.showTextDocument(doc).then(() => {
+					return vscode.window.showTextDocument(doc).then(async () => {
 						// Update the diagnostics now that we done with the task
-						let first_line = updateDiagnostics(doc, collection);
+						let first_line = await updateDiagnostics(doc, collection);
 						mlog("update diagnostics for mongodb test log file: " + testFile);
 
 						// Scroll the hight highlighted - 5 lines
@@ -853,7 +898,14 @@ function loadNinjaCache(): Thenable<Map<string, string>> {
 	// TODO - test for file exists and warn user
 	mlog("Loading Ninja file: " + ninjaFile);
 
-	return parseNinjaFile(ninjaFile);
+	return getDaemon().call<{ [test: string]: string }>("ninja.lookup", { ninja_file: ninjaFile }).then(
+		(index) => new Map<string, string>(Object.entries(index)),
+		(e) => {
+			mlog(`Daemon ninja lookup failed, loading the index instead: ${e}`);
+
+			const python3 = vscode.workspace.getConfiguration("mongodev").get(CONFIG_PYTHON3) as string;
+			return loadNinjaIndex(python3, getPythonScriptsDir(), ninjaFile);
+		});
 }
 
 /**
@@ -1029,11 +1081,22 @@ class ProcessItem implements vscode.QuickPickItem {
 	}
 }
 
+async function listMongoProcesses(): Promise<MongoProceses> {
+	try {
+		return await getDaemon().call<MongoProceses>("process.list");
+	} catch (e) {
+		mlog(`Daemon process list failed, running mongo_process.py instead: ${e}`);
+	}
+
+	const python3 = vscode.workspace.getConfiguration("mongodev").get(CONFIG_PYTHON3) as string;
+	return mongoProcessList(python3, getPythonScriptsDir());
+}
+
 /**
  * Shows a pick list using window.showQuickPick().
  */
 export async function pickMongoDProcess(): Promise<string> {
-	let mp = await mongoProcessList();
+	let mp = await listMongoProcesses();
 
 	const options = mp.mongod.map((item) => {
 		return new ProcessItem(item.pid.toString(), getMongoDFriendlyName(item));
@@ -1053,7 +1116,7 @@ export async function pickMongoDProcess(): Promise<string> {
 }
 
 export async function pickMongoSProcess(): Promise<string> {
-	let mp = await mongoProcessList();
+	let mp = await listMongoProcesses();
 
 	const options = mp.mongos.map((item) => {
 		return new ProcessItem(item.pid.toString(), getMongoSFriendlyName(item));
@@ -1105,7 +1168,7 @@ function getMongoDFriendlyName(m: MongoDProcess): string {
 }
 
 export async function debugAllMongoD() {
-	let mp = await mongoProcessList();
+	let mp = await listMongoProcesses();
 
 	for (const mongod of mp.mongod) {
 		console.log("Attaching to: " + mongod);
@@ -1119,7 +1182,7 @@ function getMongoSFriendlyName(m: MongoSProcess): string {
 }
 
 export async function debugAllMongoS() {
-	let mp = await mongoProcessList();
+	let mp = await listMongoProcesses();
 
 	for (const mongos of mp.mongos) {
 		console.log("Attaching to: " + mongos);
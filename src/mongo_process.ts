@@ -1,7 +1,8 @@
 'use strict';
 
 const util = require('node:util');
-const exec = util.promisify(require('node:child_process').exec);
+const path = require('node:path');
+const execFile = util.promisify(require('node:child_process').execFile);
 
 export interface MongoDProcess {
     pid: number,
@@ -23,17 +24,18 @@ export interface MongoProceses {
     shell: Array<number>,
 }
 
-async function mongoProcessPS(): Promise<string> {
-    // TODO
-    const { stdout, stderr } = await exec('/home/mark/bin/mpf');
+async function mongoProcessPS(python3: string, pythonScriptsDir: string): Promise<string> {
+    // Reads /proc directly, see python/mongo_process.py
+    const script = path.join(pythonScriptsDir, "mongo_process.py");
+    const { stdout, stderr } = await execFile(python3, [script]);
     //   console.log('stdout:', stdout);
     //   console.error('stderr:', stderr);
 
     return stdout;
 }
 
-export async function mongoProcessList(): Promise<MongoProceses> {
-    let output = await mongoProcessPS();
+export async function mongoProcessList(python3: string, pythonScriptsDir: string): Promise<MongoProceses> {
+    let output = await mongoProcessPS(python3, pythonScriptsDir);
 
     let obj = JSON.parse(output);
     let struct: MongoProceses = obj;
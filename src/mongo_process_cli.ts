@@ -1,11 +1,12 @@
 'use strict';
 
+import * as path from 'path';
 import { mongoProcessList } from './mongo_process';
 
 async function main(argv: string[]) {
     // let ninjaFile = argv[2];
 
-    console.log("PROCS: " + JSON.stringify(await mongoProcessList()));
+    console.log("PROCS: " + JSON.stringify(await mongoProcessList("python3", path.join(__dirname, "..", "python"))));
     console.log("Done loading processes");
 
 }
@@ -0,0 +1,112 @@
+'use strict';
+
+import * as net from 'net';
+import * as path from 'path';
+import { execFile } from 'child_process';
+
+// Client of python/mongodev_daemon.py
+//
+// The daemon keeps the suite index, the ninja indexes, scanned logs and the known processes in
+// memory between calls. It listens on a Unix socket per scripts dir and venv, shared with the
+// shell scripts that call it, and exits when idle. A call that finds it gone starts it again.
+
+// Milliseconds to wait for a response, building the suite index of a mongo repo can take a while
+const REQUEST_TIMEOUT_MS = 60000;
+
+class DaemonTimeoutError extends Error { }
+
+export class MongodevDaemon {
+    private socketPath: Promise<string> | undefined;
+    private nextId = 1;
+
+    /**
+     * @param python3 python to start the daemon with, inside the venv of cwd if it has one
+     * @param pythonScriptsDir directory of mongodev_daemon.py
+     * @param cwd mongo repo, relative paths in params are relative to it
+     */
+    constructor(private python3: string, private pythonScriptsDir: string, private cwd: string) { }
+
+    /**
+     * Call a method on the daemon, starting it if needed.
+     */
+    async call<T>(method: string, params: object = {}): Promise<T> {
+        const request = { jsonrpc: "2.0", id: this.nextId++, method: method, params: { cwd: this.cwd, ...params } };
+
+        let response;
+        try {
+            response = await this.send(await this.start(), request);
+        } catch (e) {
+            // A daemon that is busy or hung would not answer a second request either
+            if (e instanceof DaemonTimeoutError) {
+                throw e;
+            }
+
+            // The daemon exited since it was started, start it again
+            this.socketPath = undefined;
+            response = await this.send(await this.start(), request);
+        }
+
+        if (response.error) {
+            throw new Error(`mongodev_daemon ${method}: ${response.error.message}`);
+        }
+        return response.result as T;
+    }
+
+    /**
+     * Start the daemon if it is not running, returns its socket.
+     */
+    private start(): Promise<string> {
+        if (this.socketPath === undefined) {
+            const script = path.join(this.pythonScriptsDir, "mongodev_daemon.py");
+            const activate = path.join(this.pythonScriptsDir, "run_virtualenv.sh");
+
+            this.socketPath = new Promise<string>((resolve, reject) => {
+                execFile("/bin/bash", [activate, this.python3, script, "start"], { cwd: this.cwd }, (error, stdout, stderr) => {
+                    if (error) {
+                        reject(new Error(`mongodev_daemon start failed: ${error} ${stderr}`));
+                        return;
+                    }
+
+                    // run_virtualenv.sh prints which venv it activated first
+                    const lines = stdout.trim().split("\n");
+                    resolve(lines[lines.length - 1]);
+                });
+            });
+
+            this.socketPath.catch(() => { this.socketPath = undefined; });
+        }
+
+        return this.socketPath;
+    }
+
+    private send(socketPath: string, request: object): Promise<any> {
+        return new Promise((resolve, reject) => {
+            const socket = net.createConnection(socketPath);
+            let data = "";
+
+            const timer = setTimeout(() => {
+                reject(new DaemonTimeoutError(`mongodev_daemon did not answer within ${REQUEST_TIMEOUT_MS} ms`));
+                socket.destroy();
+            }, REQUEST_TIMEOUT_MS);
+            socket.on("close", () => clearTimeout(timer));
+
+            socket.setEncoding("utf8");
+            socket.on("connect", () => socket.write(JSON.stringify(request) + "\n"));
+            socket.on("data", (chunk: string) => {
+                data += chunk;
+
+                const end = data.indexOf("\n");
+                if (end !== -1) {
+                    socket.end();
+                    try {
+                        resolve(JSON.parse(data.substring(0, end)));
+                    } catch (e) {
+                        reject(e);
+                    }
+                }
+            });
+            socket.on("error", reject);
+            socket.on("close", () => reject(new Error("The daemon closed the connection")));
+        });
+    }
+}
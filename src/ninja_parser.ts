@@ -1,5 +1,7 @@
 import * as readline from 'readline';
 import * as fs from 'fs';
+import * as path from 'path';
+import { execFile } from 'child_process';
 
 // There are two types of ninja file generators
 //
@@ -146,6 +148,37 @@ export function parseNinjaFile(ninjaFile: string): Thenable<Map<string, string>>
     });
 }
 
+/**
+ * Load the test name to executable mapping from the persistent index built by ninja_index.py.
+ *
+ * Falls back to parsing the ninja file if the index cannot be loaded.
+ */
+export function loadNinjaIndex(python3: string, pythonScriptsDir: string, ninjaFile: string): Thenable<Map<string, string>> {
+
+    return new Promise<Map<string, string>>((resolve, reject) => {
+        const script = path.join(pythonScriptsDir, "ninja_index.py");
+
+        execFile(python3, [script, "--json", ninjaFile], { maxBuffer: 256 * 1024 * 1024 }, (error, stdout, stderr) => {
+            if (error) {
+                console.log(`ninja_index.py failed, parsing ninja file instead: ${error} ${stderr}`);
+                parseNinjaFile(ninjaFile).then(resolve, reject);
+                return;
+            }
+
+            let index;
+            try {
+                index = JSON.parse(stdout);
+            } catch (e) {
+                console.log(`ninja_index.py returned bad JSON, parsing ninja file instead: ${e}`);
+                parseNinjaFile(ninjaFile).then(resolve, reject);
+                return;
+            }
+
+            resolve(new Map<string, string>(Object.entries(index)));
+        });
+    });
+}
+
 /*
 let ninjaFile = "/home/mark/mongo/linux-clang-local.ninja";
 parseNinjaFile(ninjaFile).then((x) => {